@@ -0,0 +1,57 @@
+from collections import OrderedDict
+from functools import wraps
+import threading
+import numpy as np
+
+
+DEFAULT_MAX_ENTRIES = 512
+
+
+class ArtifactCache():
+    # LRU cache of things derived from filter parameters (lookup tables, kernels,
+    # matrices), keyed on the builder and the exact parameter tuple
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        # shared by the GUI thread, the render worker and tile threads
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, builder, params):
+        key = (builder.__module__, builder.__qualname__, params)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+
+        value = builder(*params)
+        # callers share the cached array, so it must never be modified in place
+        if isinstance(value, np.ndarray):
+            value.setflags(write=False)
+
+        with self.lock:
+            self.entries[key] = value
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+artifact_cache = ArtifactCache()
+
+
+def cached_artifact(builder):
+    # memoizes builder in the shared artifact cache, its arguments have to be hashable
+    @wraps(builder)
+    def get_artifact(*params):
+        return artifact_cache.get(builder, params)
+    return get_artifact
@@ -0,0 +1,155 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import cv2
+
+from filter_io import load_filters
+from pipeline import build_plan, apply_plan, describe_plan, optimize_chain
+from tiling import parallelize_plan
+from image_io import is_image_file, read_image, write_image_atomic
+from mapped_image import get_plan_halo, stream_image
+from filter_cache import FilterCache
+from disk_cache import DiskCache, get_default_directory
+
+
+# execution plan of the filter chain, built once per worker process
+worker_plan = None
+worker_out_of_core = False
+worker_disk_cache = None
+
+
+def init_worker(chain_path, fuse_linear, parallel, out_of_core=False, cache_dir=None, cache_size=None):
+    global worker_plan, worker_out_of_core, worker_disk_cache
+    worker_plan = build_plan(load_filters(chain_path), fuse_linear)
+    worker_out_of_core = out_of_core
+    if cache_dir is not None:
+        worker_disk_cache = DiskCache(cache_dir, cache_size)
+    if parallel:
+        # a single worker splits each image across the cores instead
+        worker_plan = parallelize_plan(worker_plan, group_stages=True)
+    else:
+        # one process per core already, avoid oversubscribing with OpenCV's own threads
+        cv2.setNumThreads(1)
+
+
+def process_file(input_path, output_path):
+    start = time.perf_counter()
+    try:
+        if worker_out_of_core:
+            megapixels = stream_image(input_path, output_path, worker_plan) / 1e6
+            return input_path, output_path, time.perf_counter() - start, megapixels, None
+        img = read_image(input_path)
+        megapixels = img.shape[0] * img.shape[1] / 1e6
+        if worker_disk_cache is not None:
+            # resumes from the longest prefix of the chain cached by any earlier run
+            img = FilterCache(disk_cache=worker_disk_cache).apply(img, worker_plan)
+        else:
+            img = apply_plan(img, worker_plan)
+        write_image_atomic(output_path, img)
+        return input_path, output_path, time.perf_counter() - start, megapixels, None
+    except Exception as error:
+        return input_path, output_path, time.perf_counter() - start, 0, str(error)
+
+
+def get_output_path(input_path, input_dir, output_dir, extension):
+    relative_path = os.path.relpath(input_path, input_dir)
+    if extension is not None:
+        relative_path = os.path.splitext(relative_path)[0] + '.' + extension.lstrip('.')
+    return os.path.join(output_dir, relative_path)
+
+
+def find_tasks(input_dir, output_dir, extension, recursive, overwrite, stats):
+    # generator so the directory is walked lazily as workers free up
+    for directory, subdirectories, file_names in os.walk(input_dir):
+        if not recursive:
+            subdirectories.clear()
+        if os.path.abspath(directory) == os.path.abspath(output_dir):
+            continue
+        subdirectories[:] = [name for name in subdirectories
+            if os.path.abspath(os.path.join(directory, name)) != os.path.abspath(output_dir)]
+        for file_name in sorted(file_names):
+            input_path = os.path.join(directory, file_name)
+            if not is_image_file(input_path):
+                continue
+            output_path = get_output_path(input_path, input_dir, output_dir, extension)
+            if not overwrite and os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(input_path):
+                stats["skipped"] += 1
+                continue
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            yield input_path, output_path
+
+
+def run_batch(chain_path, input_dir, output_dir, extension=None, workers=None, recursive=False, overwrite=False, fuse_linear=False, out_of_core=False, cache_dir=None, cache_size=None, out=sys.stdout):
+    workers = workers or os.cpu_count() or 1
+    stats = {"processed": 0, "skipped": 0, "failed": 0, "megapixels": 0}
+    tasks = find_tasks(input_dir, output_dir, extension, recursive, overwrite, stats)
+    # bounded number of in-flight files keeps memory flat for any directory size
+    max_pending = workers * 2
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(chain_path, fuse_linear, workers == 1, out_of_core, cache_dir, cache_size)) as executor:
+        pending = set()
+        tasks_left = True
+        while tasks_left or pending:
+            while tasks_left and len(pending) < max_pending:
+                task = next(tasks, None)
+                if task is None:
+                    tasks_left = False
+                else:
+                    pending.add(executor.submit(process_file, *task))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                input_path, output_path, seconds, megapixels, error = future.result()
+                if error is not None:
+                    stats["failed"] += 1
+                    print("FAILED " + input_path + ": " + error, file=out)
+                else:
+                    stats["processed"] += 1
+                    stats["megapixels"] += megapixels
+                    print("{} -> {}  {:.3f} s  {:.1f} MP/s".format(
+                        input_path, output_path, seconds, megapixels / seconds if seconds > 0 else 0), file=out)
+
+    elapsed = time.perf_counter() - start
+    print("Processed {} files ({} skipped, {} failed) in {:.2f} s, {:.2f} files/s, {:.1f} MP/s".format(
+        stats["processed"], stats["skipped"], stats["failed"], elapsed,
+        stats["processed"] / elapsed if elapsed > 0 else 0,
+        stats["megapixels"] / elapsed if elapsed > 0 else 0), file=out)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a saved filter chain to every image in a directory.")
+    parser.add_argument("chain", help="filter chain saved from File > Save Filters")
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("-e", "--extension", help="output file extension, defaults to the input's")
+    parser.add_argument("-j", "--workers", type=int, help="number of worker processes, defaults to the number of cores")
+    parser.add_argument("-r", "--recursive", action="store_true", help="also process subdirectories")
+    parser.add_argument("--overwrite", action="store_true", help="reprocess files that already have an up to date output")
+    parser.add_argument("--fuse-linear", action="store_true", help="convolve adjacent linear filters into one kernel and resample adjacent warps once, changes the result")
+    parser.add_argument("--out-of-core", action="store_true", help="stream images through the chain in strips, for images larger than memory")
+    parser.add_argument("--cache", nargs="?", const="", metavar="DIR", help="reuse filter outputs cached on disk by earlier runs and the GUI, in DIR or the default cache directory")
+    parser.add_argument("--cache-size", type=int, default=4096, help="disk cache size limit in MB")
+    args = parser.parse_args(argv)
+
+    # fail early on a bad chain instead of once per file
+    filters = load_filters(args.chain)
+    plan = build_plan(filters, args.fuse_linear)
+    if args.out_of_core and get_plan_halo(plan) is None:
+        parser.error("--out-of-core needs a chain of filters that only use nearby pixels")
+    print("Execution plan:")
+    for line in describe_plan(plan, optimize_chain(filters)[1]):
+        print("    " + line)
+    stats = run_batch(args.chain, args.input_dir, args.output_dir, args.extension, args.workers, args.recursive, args.overwrite, args.fuse_linear, args.out_of_core,
+        None if args.cache is None else args.cache or get_default_directory(), args.cache_size * 1024 * 1024)
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == '__main__':
+
+    sys.exit(main())
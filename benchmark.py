@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from filters import filter_classes
+from filter_io import set_param_value
+
+
+BENCHMARK_VERSION = 1
+
+# (width, height) of the benchmarked images, from VGA up to 50 MP
+IMAGE_SIZES = {
+    "vga": (640, 480),
+    "1080p": (1920, 1080),
+    "12mp": (4000, 3000),
+    "50mp": (8192, 6144),
+}
+CHANNEL_COUNTS = [1, 3]
+
+# parameter values worth comparing for the filters whose speed depends on them,
+# every other filter runs with its defaults
+FILTER_PARAMS = {
+    "FilterThresholdAdaptive": [{"block_size": 3}, {"block_size": 51}],
+    "FilterBoxBlur": [{"kernel_width": 3, "kernel_height": 3}, {"kernel_width": 31, "kernel_height": 31}],
+    "FilterMedianBlur": [{"ksize": 3}, {"ksize": 5}, {"ksize": 15}, {"ksize": 61}],
+    "FilterGaussianBlur": [{"kernel_width": 3, "kernel_height": 3}, {"kernel_width": 31, "kernel_height": 31}],
+    "FilterErode": [
+        {"kernel_width": 3, "kernel_height": 3},
+        {"kernel_width": 31, "kernel_height": 31},
+        {"kernel_width": 31, "kernel_height": 31, "iterations": 10},
+        {"kernel_type": "MORPH_ELLIPSE", "kernel_width": 63, "kernel_height": 63},
+        {"kernel_type": "MORPH_ELLIPSE", "kernel_width": 63, "kernel_height": 63, "approximate_ellipse": True},
+    ],
+    "FilterDilate": [
+        {"kernel_width": 3, "kernel_height": 3},
+        {"kernel_width": 31, "kernel_height": 31},
+        {"kernel_width": 31, "kernel_height": 31, "iterations": 10},
+        {"kernel_type": "MORPH_ELLIPSE", "kernel_width": 63, "kernel_height": 63},
+        {"kernel_type": "MORPH_ELLIPSE", "kernel_width": 63, "kernel_height": 63, "approximate_ellipse": True},
+    ],
+    "FilterMorphologyEx": [
+        {"kernel_width": 3, "kernel_height": 3},
+        {"kernel_width": 31, "kernel_height": 31},
+        {"kernel_width": 31, "kernel_height": 31, "iterations": 10},
+        {"kernel_type": "MORPH_ELLIPSE", "kernel_width": 63, "kernel_height": 63},
+        {"kernel_type": "MORPH_ELLIPSE", "kernel_width": 63, "kernel_height": 63, "approximate_ellipse": True},
+    ],
+    "WarpRotate": [{"theta": 30}],
+    "WarpPolar": [{"max_radius": 512}],
+}
+
+DEFAULT_MIN_TIME = 0.5
+DEFAULT_THRESHOLD = 0.1
+
+
+def make_image(width, height, channels):
+    # smooth noise, flat images make some filters unrealistically fast
+    shape = (height, width, channels) if channels > 1 else (height, width)
+    return cv2.blur(np.random.default_rng(0).integers(0, 256, shape, np.uint8), (5, 5))
+
+
+def get_case_key(result):
+    params = ",".join("{}={}".format(param, value) for param, value in sorted(result["params"].items()))
+    return "{}[{}] {}x{}x{}".format(result["filter"], params, result["width"], result["height"], result["channels"])
+
+
+def measure_peak_allocation(filter, img):
+    # bytes allocated on top of what was already in use, numpy and OpenCV outputs are traced
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        filter.apply(img)
+        return tracemalloc.get_traced_memory()[1] - start_bytes
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_filter(filter_class, params, img, min_time=DEFAULT_MIN_TIME):
+    filter = filter_class()
+    for param, value in params.items():
+        set_param_value(filter, param, value)
+    result = {
+        "filter": filter_class.__name__,
+        "params": params,
+        "width": img.shape[1],
+        "height": img.shape[0],
+        "channels": 1 if img.ndim == 2 else img.shape[2],
+    }
+    try:
+        # the first run builds lookup tables and kernels, it isn't timed
+        filter.apply(img)
+        result["peak_bytes"] = measure_peak_allocation(filter, img)
+        times = []
+        total_start = time.perf_counter()
+        while len(times) < 3 or time.perf_counter() - total_start < min_time:
+            start = time.perf_counter()
+            filter.apply(img)
+            times.append(time.perf_counter() - start)
+    except Exception as error:
+        result["error"] = str(error).strip()
+        return result
+
+    seconds = float(np.median(times))
+    result["runs"] = len(times)
+    result["seconds"] = seconds
+    result["ops_per_sec"] = 1 / seconds if seconds > 0 else float('inf')
+    result["megapixels_per_sec"] = img.shape[0] * img.shape[1] / 1e6 * result["ops_per_sec"]
+    return result
+
+
+def run_benchmarks(sizes, channel_counts, filter_names=None, min_time=DEFAULT_MIN_TIME, out=sys.stdout):
+    results = []
+    for size in sizes:
+        width, height = IMAGE_SIZES[size]
+        for channels in channel_counts:
+            img = make_image(width, height, channels)
+            for filter_class in filter_classes:
+                if filter_names and filter_class.__name__ not in filter_names:
+                    continue
+                for params in FILTER_PARAMS.get(filter_class.__name__, [{}]):
+                    result = benchmark_filter(filter_class, params, img, min_time)
+                    results.append(result)
+                    if "error" in result:
+                        print("{:70} unsupported: {}".format(get_case_key(result), result["error"].splitlines()[-1]), file=out)
+                    else:
+                        print("{:70} {:9.1f} ops/s {:9.1f} MP/s {:8.1f} MB peak".format(
+                            get_case_key(result), result["ops_per_sec"], result["megapixels_per_sec"], result["peak_bytes"] / 2**20), file=out)
+    return results
+
+
+def compare_results(baseline, results, threshold=DEFAULT_THRESHOLD):
+    # (case key, baseline ops/s, new ops/s) of every case more than threshold slower
+    baseline_ops = {get_case_key(result): result["ops_per_sec"] for result in baseline["results"] if "error" not in result}
+    regressions = []
+    for result in results:
+        key = get_case_key(result)
+        if key not in baseline_ops or "error" in result:
+            continue
+        if result["ops_per_sec"] < baseline_ops[key] * (1 - threshold):
+            regressions.append((key, baseline_ops[key], result["ops_per_sec"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time every filter over a grid of image sizes, channel counts and parameters.")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("-s", "--sizes", nargs="+", choices=list(IMAGE_SIZES), default=list(IMAGE_SIZES))
+    parser.add_argument("-c", "--channels", nargs="+", type=int, choices=CHANNEL_COUNTS, default=CHANNEL_COUNTS)
+    parser.add_argument("-f", "--filters", nargs="+", help="class names of the filters to run, defaults to all")
+    parser.add_argument("-t", "--min-time", type=float, default=DEFAULT_MIN_TIME, help="seconds spent timing each case")
+    parser.add_argument("--compare", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="fraction of ops/s lost that counts as a regression")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.channels, args.filters, args.min_time)
+    report = {
+        "version": BENCHMARK_VERSION,
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "opencv_threads": cv2.getNumThreads(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare_results(baseline, results, args.threshold)
+        for key, baseline_ops, ops in regressions:
+            print("REGRESSION {}: {:.1f} -> {:.1f} ops/s ({:+.0%})".format(key, baseline_ops, ops, ops / baseline_ops - 1))
+        print("{} regressions over {:.0%} against {}".format(len(regressions), args.threshold, args.compare))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import threading
+import time
+import cv2
+import numpy as np
+
+from artifact_cache import cached_artifact
+
+
+# smaller kernels always run directly, the DFT's fixed cost is too high for them
+MIN_DFT_KERNEL_AREA = 7 * 7
+# OpenCV filters 8-bit images with kernels smaller than this directly, larger ones through
+# its own DFT whose rounding depends on the image size, so strips wouldn't match the whole
+OPENCV_DFT_KERNEL_AREA = 130
+# larger kernels are timed both ways once per kernel shape on a gray 1080p frame, so the
+# choice doesn't depend on the image and the whole image, its strips and proxies match
+CALIBRATION_SHAPE = (1080, 1920)
+# largest kernel magnitude after rounding it to integers, the float64 DFT of a 1080p frame
+# with a 101x101 kernel is then at most 1e-3 from the exact integer correlation
+FIXED_POINT_SCALE = 2 ** 20
+
+# kernel shape: "direct" or "dft", whichever was faster on the calibration image
+calibrated_strategies = {}
+strategy_lock = threading.Lock()
+
+
+def get_separable_kernels(kernel):
+    # (kernel_x, kernel_y) when the kernel is rank 1, None otherwise
+    u, s, vt = np.linalg.svd(kernel)
+    if len(s) > 1 and s[1] > 1e-6 * s[0]:
+        return None
+    scale = np.sqrt(s[0])
+    return np.float32(vt[0] * scale), np.float32(u[:, 0] * scale)
+
+
+@cached_artifact
+def build_kernel_spectrum(kernel_bytes, kernel_shape, dft_shape):
+    # CCS packed DFT of the kernel zero padded to the image's DFT size
+    padded = np.zeros(dft_shape, np.float64)
+    padded[:kernel_shape[0], :kernel_shape[1]] = np.frombuffer(kernel_bytes, np.float64).reshape(kernel_shape)
+    return cv2.dft(padded, nonzeroRows=kernel_shape[0])
+
+
+def dft_filter_2d(img, kernel, anchor, delta=0, border_type=cv2.BORDER_DEFAULT):
+    # cv2.filter2D with ddepth -1 through the DFT, the cost hardly depends on the kernel size,
+    # the kernel is rounded to fixed point and the DFT's result to integers, which gives the
+    # exact correlation, so every pixel comes out the same whatever the image or strip size,
+    # the border is added first so the circular correlation never wraps around
+    kernel = np.float64(kernel)
+    peak = np.abs(kernel).max()
+    scale = FIXED_POINT_SCALE / peak if peak > 0 else 1
+    kernel = np.rint(kernel * scale)
+    rows, cols = img.shape[:2]
+    anchor_x, anchor_y = anchor
+    padded = cv2.copyMakeBorder(img, anchor_y, kernel.shape[0] - 1 - anchor_y, anchor_x, kernel.shape[1] - 1 - anchor_x, border_type & ~cv2.BORDER_ISOLATED)
+    dft_shape = (cv2.getOptimalDFTSize(padded.shape[0]), cv2.getOptimalDFTSize(padded.shape[1]))
+    kernel_spectrum = build_kernel_spectrum(kernel.tobytes(), kernel.shape, dft_shape)
+    channels = [padded] if padded.ndim == 2 else cv2.split(padded)
+    results = []
+    for channel in channels:
+        plane = np.zeros(dft_shape, np.float64)
+        plane[:padded.shape[0], :padded.shape[1]] = channel
+        spectrum = cv2.mulSpectrums(cv2.dft(plane, nonzeroRows=padded.shape[0]), kernel_spectrum, 0, conjB=True)
+        correlation = np.rint(cv2.idft(spectrum, flags=cv2.DFT_SCALE | cv2.DFT_REAL_OUTPUT, nonzeroRows=rows)[:rows, :cols])
+        results.append(np.clip(np.rint(correlation / scale + delta), 0, 255).astype(np.uint8))
+    return results[0] if img.ndim == 2 else cv2.merge(results)
+
+
+def calibrate_strategy(kernel_shape):
+    # the cost only depends on the kernel's shape, not its values, best of two runs each
+    img = np.random.default_rng(0).integers(0, 256, CALIBRATION_SHAPE, np.uint8)
+    kernel = np.ones(kernel_shape, np.float32) / (kernel_shape[0] * kernel_shape[1])
+    anchor = (kernel_shape[1] // 2, kernel_shape[0] // 2)
+    seconds = {}
+    for strategy, run in (("direct", lambda: cv2.filter2D(img, -1, kernel, anchor=anchor)), ("dft", lambda: dft_filter_2d(img, kernel, anchor))):
+        times = []
+        for _ in range(2):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        seconds[strategy] = min(times)
+    return "dft" if seconds["dft"] < seconds["direct"] else "direct"
+
+
+def get_convolution_strategy(kernel):
+    # "separable" for rank 1 kernels, "direct" for small ones, otherwise whichever was faster
+    # for the kernel's shape, measured the first time that shape is used
+    if kernel.shape[0] > 1 and kernel.shape[1] > 1 and get_separable_kernels(kernel) is not None:
+        return "separable"
+    if kernel.size < MIN_DFT_KERNEL_AREA:
+        return "direct"
+    with strategy_lock:
+        if kernel.shape not in calibrated_strategies:
+            calibrated_strategies[kernel.shape] = calibrate_strategy(kernel.shape)
+        return calibrated_strategies[kernel.shape]
+
+
+def is_strip_exact(kernel):
+    # True when filter_2d gives the same rows on a strip with enough halo as on the whole image,
+    # the direct path of large kernels is OpenCV's DFT, which rounds depending on the image size
+    return get_convolution_strategy(np.float32(kernel)) != "direct" or kernel.size < OPENCV_DFT_KERNEL_AREA
+
+
+def filter_2d(img, kernel, anchor, delta=0, border_type=cv2.BORDER_DEFAULT):
+    # cv2.filter2D with ddepth -1 and the anchor inside the kernel, run the fastest way for the kernel
+    kernel = np.float32(kernel)
+    strategy = get_convolution_strategy(kernel)
+    if strategy == "separable":
+        kernel_x, kernel_y = get_separable_kernels(kernel)
+        return cv2.sepFilter2D(img, -1, kernel_x, kernel_y, anchor=anchor, delta=delta, borderType=border_type)
+    if strategy == "dft":
+        return dft_filter_2d(img, kernel, anchor, delta, border_type)
+    return cv2.filter2D(img, -1, kernel, anchor=anchor, delta=delta, borderType=border_type)
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import threading
+import time
+import numpy as np
+
+
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024 * 1024
+# stages quicker than this are recomputed rather than written to disk
+DEFAULT_MIN_SECONDS = 0.05
+
+
+def get_default_directory():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "SimpleImageProcessor")
+
+
+def get_stage_keys(stage):
+    # a tiled stage gives the same result as its stages one after the other
+    if hasattr(stage, "stages"):
+        return [key for inner_stage in stage.stages for key in get_stage_keys(inner_stage)]
+    return [stage.get_key()]
+
+
+class DiskCache():
+    # stage outputs stored on disk under a hash of the input pixels and every filter up to
+    # the stage, shared by the GUI and batch runs. Files are written under a temporary name
+    # and renamed, so processes sharing the directory only ever see complete entries
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES, min_seconds=DEFAULT_MIN_SECONDS):
+        self.directory = directory or get_default_directory()
+        self.max_bytes = max_bytes if max_bytes is not None else DEFAULT_MAX_BYTES
+        self.min_seconds = min_seconds
+        # trimming scans the whole directory, so it only runs after enough new data
+        self.bytes_since_trim = self.max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_image_hash(self, img):
+        image_hash = hashlib.blake2b(digest_size=16)
+        image_hash.update(repr((img.shape, img.dtype.str)).encode())
+        image_hash.update(np.ascontiguousarray(img).data)
+        return image_hash.hexdigest()
+
+    def get_prefix_keys(self, image_hash, stages):
+        # key of the output of every stage, chained so each depends on all filters before it
+        prefix_keys = []
+        prefix_key = image_hash
+        for stage in stages:
+            for key in get_stage_keys(stage):
+                prefix_key = hashlib.blake2b((prefix_key + repr(key)).encode(), digest_size=16).hexdigest()
+            prefix_keys.append(prefix_key)
+        return prefix_keys
+
+    def get_path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".npy")
+
+    def contains(self, key):
+        return os.path.exists(self.get_path(key))
+
+    def get(self, key):
+        path = self.get_path(key)
+        try:
+            img = np.load(path, allow_pickle=False)
+            # modification time is the last use for LRU eviction
+            os.utime(path)
+            return img
+        except (OSError, ValueError, EOFError):
+            # missing, or evicted by another process while reading
+            return None
+
+    def put(self, key, img):
+        path = self.get_path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # threads of one process, e.g. tiled renders and batch workers, can write the same key
+        temp_path = os.path.join(os.path.dirname(path), ".partial-" + str(os.getpid()) + "-" + str(threading.get_ident()) + "-" + key + ".npy")
+        try:
+            np.save(temp_path, img, allow_pickle=False)
+            os.replace(temp_path, path)
+        except OSError:
+            # a full or read only disk only loses the cache entry
+            return
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.bytes_since_trim += img.nbytes
+        if self.bytes_since_trim > self.max_bytes // 16:
+            self.trim()
+
+    def trim(self):
+        # removes the least recently used entries until the cache fits in max_bytes
+        self.bytes_since_trim = 0
+        entries = []
+        for directory, subdirectories, file_names in os.walk(self.directory):
+            for file_name in file_names:
+                if file_name.startswith(".partial-"):
+                    continue
+                path = os.path.join(directory, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total_bytes = sum(size for mtime, size, path in entries)
+        for mtime, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_bytes -= size
+
+    def clear(self):
+        max_bytes = self.max_bytes
+        self.max_bytes = 0
+        self.trim()
+        self.max_bytes = max_bytes if max_bytes is not None else DEFAULT_MAX_BYTES
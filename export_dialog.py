@@ -0,0 +1,69 @@
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QLineEdit, QPushButton, QCheckBox, QFileDialog
+from PyQt5 import QtCore
+import os
+
+from export_queue import encoder_presets, export_scales
+
+
+class ExportDialog(QDialog):
+    # picks the formats and sizes written from the current render
+
+    def __init__(self, parent, main_controller):
+        super(ExportDialog, self).__init__(parent)
+        self.main_controller = main_controller
+
+        self.setWindowTitle("Export")
+        self.setWindowFlags(QtCore.Qt.Window | QtCore.Qt.WindowCloseButtonHint)
+
+        self.layout = QVBoxLayout()
+        self.setLayout(self.layout)
+
+        path_layout = QHBoxLayout()
+        self.path_edit = QLineEdit(os.path.splitext(self.main_controller.file_path)[0] + "_filtered")
+        browse_button = QPushButton("Browse")
+        browse_button.clicked.connect(self.select_path)
+        path_layout.addWidget(QLabel("File:"))
+        path_layout.addWidget(self.path_edit)
+        path_layout.addWidget(browse_button)
+        self.layout.addLayout(path_layout)
+
+        self.layout.addWidget(QLabel("Formats:"))
+        preset_layout = QGridLayout()
+        self.preset_boxes = {}
+        for index, preset in enumerate(encoder_presets):
+            self.preset_boxes[preset] = QCheckBox(preset)
+            preset_layout.addWidget(self.preset_boxes[preset], index // 3, index % 3)
+        self.preset_boxes["PNG (fast)"].setChecked(True)
+        self.layout.addLayout(preset_layout)
+
+        self.layout.addWidget(QLabel("Sizes:"))
+        scale_layout = QHBoxLayout()
+        self.scale_boxes = {}
+        for scale in export_scales:
+            self.scale_boxes[scale] = QCheckBox("{}%".format(round(scale * 100)))
+            scale_layout.addWidget(self.scale_boxes[scale])
+        self.scale_boxes[1].setChecked(True)
+        self.layout.addLayout(scale_layout)
+
+        button_layout = QHBoxLayout()
+        export_button = QPushButton("Export")
+        cancel_button = QPushButton("Cancel")
+        export_button.clicked.connect(self.export)
+        cancel_button.clicked.connect(self.close)
+        button_layout.addWidget(export_button)
+        button_layout.addWidget(cancel_button)
+        self.layout.addLayout(button_layout)
+
+
+    def select_path(self):
+        file_path = QFileDialog.getSaveFileName(self, "Export", self.path_edit.text())[0]
+        if file_path != "":
+            self.path_edit.setText(os.path.splitext(file_path)[0])
+
+
+    def export(self):
+        presets = [preset for preset, box in self.preset_boxes.items() if box.isChecked()]
+        scales = [scale for scale, box in self.scale_boxes.items() if box.isChecked()]
+        if self.path_edit.text() != "" and len(presets) > 0 and len(scales) > 0:
+            self.main_controller.export_image(self.path_edit.text(), presets, scales)
+            self.close()
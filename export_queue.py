@@ -0,0 +1,93 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from image_io import write_image_atomic
+
+
+# name: (extension, file name tag, cv2.imwrite parameters)
+encoder_presets = {
+    "PNG (fast)": ("png", "fast", [cv2.IMWRITE_PNG_COMPRESSION, 1]),
+    "PNG (balanced)": ("png", "balanced", [cv2.IMWRITE_PNG_COMPRESSION, 3]),
+    "PNG (smallest)": ("png", "smallest", [cv2.IMWRITE_PNG_COMPRESSION, 9]),
+    "JPEG (quality 95)": ("jpg", "q95", [cv2.IMWRITE_JPEG_QUALITY, 95]),
+    "JPEG (quality 85)": ("jpg", "q85", [cv2.IMWRITE_JPEG_QUALITY, 85]),
+    "JPEG (quality 70)": ("jpg", "q70", [cv2.IMWRITE_JPEG_QUALITY, 70]),
+    "WebP (quality 90)": ("webp", "q90", [cv2.IMWRITE_WEBP_QUALITY, 90]),
+    "WebP (lossless)": ("webp", "lossless", [cv2.IMWRITE_WEBP_QUALITY, 101]),
+    # TIFF compression codes: 1 none, 5 LZW, 8 deflate
+    "TIFF (uncompressed)": ("tif", "uncompressed", [cv2.IMWRITE_TIFF_COMPRESSION, 1]),
+    "TIFF (LZW)": ("tif", "lzw", [cv2.IMWRITE_TIFF_COMPRESSION, 5]),
+    "TIFF (deflate)": ("tif", "deflate", [cv2.IMWRITE_TIFF_COMPRESSION, 8]),
+}
+
+export_scales = [1, 0.5, 0.25]
+
+
+def get_export_path(base_path, preset, scale, tagged=False):
+    # base_path without extension, e.g. out/image -> out/image_50%.jpg, tagged tells
+    # apart presets with the same extension, out/image_q85_50%.jpg
+    extension, tag = encoder_presets[preset][:2]
+    suffix = "_" + tag if tagged else ""
+    if scale != 1:
+        suffix += "_{}%".format(round(scale * 100))
+    return base_path + suffix + "." + extension
+
+
+def export_image(save_path, img, params=None, scale=1):
+    if scale != 1:
+        size = (max(1, round(img.shape[1] * scale)), max(1, round(img.shape[0] * scale)))
+        img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+    write_image_atomic(save_path, img, params)
+
+
+class ExportQueue(QObject):
+    # writes images on a thread pool so saving never blocks the GUI, several exports of
+    # the same render are encoded in parallel
+
+    # finished, queued, exports since the queue was last idle
+    progressChanged = pyqtSignal(int, int)
+    # path, error message
+    exportFailed = pyqtSignal(str, str)
+    # emitted when the last pending export finishes
+    idle = pyqtSignal()
+
+    def __init__(self, max_workers=None):
+        super(QObject, self).__init__()
+        self.executor = ThreadPoolExecutor(max_workers or os.cpu_count() or 1)
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.finished = 0
+
+    def add(self, save_path, img, params=None, scale=1):
+        # img is never modified by the filters, so it is shared with the writer without a copy
+        with self.lock:
+            self.queued += 1
+            queued, finished = self.queued, self.finished
+        self.progressChanged.emit(finished, queued)
+        future = self.executor.submit(export_image, save_path, img, params, scale)
+        future.add_done_callback(lambda future: self.export_done(save_path, future))
+
+    def export_done(self, save_path, future):
+        # runs on the writing thread, the signals are queued to the GUI thread
+        if future.exception() is not None:
+            self.exportFailed.emit(save_path, str(future.exception()))
+        with self.lock:
+            self.finished += 1
+            queued, finished = self.queued, self.finished
+            if finished == queued:
+                self.queued = 0
+                self.finished = 0
+        self.progressChanged.emit(finished, queued)
+        if finished == queued:
+            self.idle.emit()
+
+    def pending_count(self):
+        with self.lock:
+            return self.queued - self.finished
+
+    def shutdown(self):
+        # waits for every queued write
+        self.executor.shutdown(wait=True)
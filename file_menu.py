@@ -1,5 +1,6 @@
-from PyQt5.QtWidgets import QMenu, QAction, QFileDialog, QMessageBox
+from PyQt5.QtWidgets import QApplication, QMenu, QAction, QFileDialog, QMessageBox
 from quit_dialog import QuitDialog
+from export_dialog import ExportDialog
 
 
 class FileMenu(QMenu):
@@ -7,25 +8,38 @@ class FileMenu(QMenu):
     def __init__(self, parent, main_controller):
         super(QMenu, self).__init__(parent)
         self.main_controller = main_controller
+        # set once quitting waits for the export queue, so idle is only connected once
+        self.waiting_to_quit = False
 
         self.setTitle("&File")
 
         self.open_action = QAction("&Open", self)
         self.save_action = QAction("&Save", self)
+        self.export_action = QAction("&Export", self)
+        self.load_filters_action = QAction("&Load Filters", self)
+        self.save_filters_action = QAction("Save &Filters", self)
         self.quit_action = QAction("Quit", self)
 
         self.open_action.triggered.connect(self.select_file)
         self.save_action.triggered.connect(self.save_file)
+        self.export_action.triggered.connect(self.open_export_dialog)
+        self.load_filters_action.triggered.connect(self.load_filter_chain)
+        self.save_filters_action.triggered.connect(self.save_filter_chain)
         self.quit_action.triggered.connect(self.open_quit_dialog)
 
         self.addAction(self.open_action)
         self.addAction(self.save_action)
+        self.addAction(self.export_action)
+        self.addSeparator()
+        self.addAction(self.load_filters_action)
+        self.addAction(self.save_filters_action)
+        self.addSeparator()
         self.addAction(self.quit_action)
 
 
     def select_file(self):
         try:
-            filters = "Image files (*.bmp *.dib *.jpeg *.jpg *.jpe *.jp2 *.png *.pgm *.ppm *.sr *.ras *tiff *.tif)"
+            filters = "Image files (*.bmp *.dib *.jpeg *.jpg *.jpe *.jp2 *.png *.pgm *.ppm *.sr *.ras *tiff *.tif *.webp)"
             file_path = QFileDialog.getOpenFileName(self, "Open Image", '', filters)[0]
             if file_path != "":
                 self.main_controller.file_path = file_path
@@ -42,7 +56,7 @@ class FileMenu(QMenu):
             save_window = QFileDialog()
             save_window.setDefaultSuffix('.png')
             save_window.setWindowTitle("Save Image")
-            filters = "Image files (*.bmp *.dib *.jpeg *.jpg *.jpe *.jp2 *.png *.pgm *.ppm *.sr *.ras *tiff *.tif)"
+            filters = "Image files (*.bmp *.dib *.jpeg *.jpg *.jpe *.jp2 *.png *.pgm *.ppm *.sr *.ras *tiff *.tif *.webp)"
             save_window.setNameFilter(filters)
             save_window.setAcceptMode(QFileDialog.AcceptSave)
     
@@ -57,6 +71,51 @@ class FileMenu(QMenu):
             error_message.exec()
 
 
+    def load_filter_chain(self):
+        try:
+            file_path = QFileDialog.getOpenFileName(self, "Load Filters", '', "Filter chains (*.json)")[0]
+            if file_path != "":
+                self.main_controller.load_filter_chain(file_path)
+        except:
+            error_message = QMessageBox()
+            error_message.setWindowTitle("Error")
+            error_message.setText("Error: filters " + file_path + " failed to load")
+            error_message.exec()
+
+
+    def save_filter_chain(self):
+        try:
+            file_path = QFileDialog.getSaveFileName(self, "Save Filters", '', "Filter chains (*.json)")[0]
+            if file_path != "":
+                if not file_path.endswith('.json'):
+                    file_path += '.json'
+                self.main_controller.save_filter_chain(file_path)
+        except:
+            error_message = QMessageBox()
+            error_message.setWindowTitle("Error")
+            error_message.setText("Error: filters failed to save")
+            error_message.exec()
+
+
+    def open_export_dialog(self):
+        export_dialog = ExportDialog(self, self.main_controller)
+        export_dialog.open()
+
+
     def open_quit_dialog(self):
         quit_dialog = QuitDialog(self)
         quit_dialog.open()
+
+
+    def quit_application(self):
+        # exports still being written would be left unfinished, idle is connected before
+        # checking so the last export can't finish unnoticed in between, and to this menu
+        # so the quit runs on the GUI thread, not the writer's, saves waiting for a render
+        # are queued before it finishes and go idle after it
+        if not self.waiting_to_quit:
+            self.waiting_to_quit = True
+            self.main_controller.export_queue.idle.connect(self.quit_application)
+        if self.main_controller.export_queue.pending_count() > 0 or len(self.main_controller.image_renderer.waiting_for_render) > 0:
+            self.main_controller.image_path_label.setText("Waiting for exports to finish before quitting")
+        else:
+            QApplication.exit()
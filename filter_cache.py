@@ -0,0 +1,148 @@
+import itertools
+import time
+
+from profiler import profiler, StageTiming
+
+
+DEFAULT_MEMORY_LIMIT = 1024 * 1024 * 1024
+# numbers every base image a cache is used with, shared so keys of different caches never match
+base_ids = itertools.count(1)
+
+
+class RenderCancelled(Exception):
+    pass
+
+
+class FilterCache():
+
+    def __init__(self, memory_limit=DEFAULT_MEMORY_LIMIT, disk_cache=None):
+        # maximum number of bytes held by cached stage outputs
+        self.memory_limit = memory_limit
+        # optional DiskCache, stages missing in memory are looked up there
+        self.disk_cache = disk_cache
+        self.base_image = None
+        self.base_hash = None
+        self.base_id = next(base_ids)
+        # equal for outputs of the same base image and stages, compared instead of the pixels
+        self.output_key = None
+        # [key, image] per stage of the execution plan, image is None once evicted
+        self.stages = []
+        # id: [image, number of stages holding it], inactive filters pass their input through
+        # so an array can be held by several stages, and the bytes of those arrays
+        self.resident = {}
+        self.resident_bytes = 0
+        # StageTiming of every stage in the last apply, only while profiling
+        self.timings = []
+
+    def invalidate(self):
+        self.base_image = None
+        self.base_hash = None
+        self.base_id = next(base_ids)
+        self.stages = []
+        self.resident = {}
+        self.resident_bytes = 0
+
+    def first_changed_index(self, keys):
+        index = 0
+        while index < min(len(keys), len(self.stages)) and self.stages[index][0] == keys[index]:
+            index += 1
+        return index
+
+    def apply(self, base_image, stages, is_cancelled=None):
+        if base_image is not self.base_image:
+            self.invalidate()
+            self.base_image = base_image
+
+        keys = [stage.get_key() for stage in stages]
+        self.output_key = (self.base_id, tuple(keys))
+        start = self.first_changed_index(keys)
+        # resume from the closest resident stage before the first change
+        while start > 0 and self.stages[start-1][1] is None:
+            start -= 1
+        for stage in self.stages[start:]:
+            self.release(stage)
+        del self.stages[start:]
+
+        disk_keys = None
+        if self.disk_cache is not None:
+            if self.base_hash is None:
+                self.base_hash = self.disk_cache.get_image_hash(base_image)
+            disk_keys = self.disk_cache.get_prefix_keys(self.base_hash, stages)
+            start = self.load_from_disk(keys, disk_keys, start)
+
+        img = base_image if start == 0 else self.stages[start-1][1]
+        profiling = profiler.enabled
+        if profiling:
+            self.timings = [StageTiming(stage, "cached", 0, getattr(self.stages[index][1], "shape", None)) for index, stage in enumerate(stages[:start])]
+        try:
+            for index in range(start, len(stages)):
+                # stages finished before a cancel stay cached for the next render
+                if is_cancelled is not None and is_cancelled():
+                    raise RenderCancelled()
+                stage_start = time.perf_counter() if disk_keys is not None else 0
+                if profiling:
+                    result = self.apply_profiled(stages[index], img)
+                else:
+                    result = stages[index].apply(img)
+                # inactive stages pass their input through, and quick ones, the last one included,
+                # are cheaper to rerun than to write and load
+                if disk_keys is not None and result is not img and time.perf_counter() - stage_start >= self.disk_cache.min_seconds:
+                    self.disk_cache.put(disk_keys[index], result)
+                img = result
+                self.add_stage(keys[index], img)
+        finally:
+            self.enforce_memory_limit()
+        return img
+
+    def load_from_disk(self, keys, disk_keys, start):
+        # resumes from the longest prefix of the chain on disk when it is past start
+        for index in range(len(keys), start, -1):
+            if not self.disk_cache.contains(disk_keys[index-1]):
+                continue
+            img = self.disk_cache.get(disk_keys[index-1])
+            if img is None:
+                continue
+            # the stages before it aren't loaded, they stay evicted
+            self.stages += [[key, None] for key in keys[start:index-1]]
+            self.add_stage(keys[index-1], img)
+            return index
+        return start
+
+    def apply_profiled(self, stage, img):
+        start = time.perf_counter()
+        result = stage.apply(img)
+        seconds = time.perf_counter() - start
+        status = "run" if any(filter.active for filter in stage.filters) else "skipped"
+        self.timings.append(StageTiming(stage, status, seconds, result.shape))
+        profiler.record(stage.name, start, seconds, args={"status": status, "output": "x".join(str(size) for size in result.shape)})
+        return result
+
+    def add_stage(self, key, img):
+        self.stages.append([key, img])
+        if id(img) in self.resident:
+            self.resident[id(img)][1] += 1
+        else:
+            self.resident[id(img)] = [img, 1]
+            self.resident_bytes += img.nbytes
+
+    def release(self, stage):
+        # drops the stage's image, its bytes are freed once no other stage holds it
+        if stage[1] is None:
+            return
+        entry = self.resident[id(stage[1])]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self.resident[id(stage[1])]
+            self.resident_bytes -= stage[1].nbytes
+        stage[1] = None
+
+    def memory_usage(self):
+        return self.resident_bytes
+
+    def enforce_memory_limit(self):
+        # evict from the front, the final output and the stages closest to it
+        # are the ones needed when editing the end of the chain
+        for stage in self.stages[:-1]:
+            if self.resident_bytes <= self.memory_limit:
+                break
+            self.release(stage)
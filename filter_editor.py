@@ -1,7 +1,8 @@
-from PyQt5.QtWidgets import QWidget, QListWidget, QComboBox, QSlider, QPushButton, QHBoxLayout, QVBoxLayout, QSpinBox, QLabel, QGridLayout, QDoubleSpinBox, QCheckBox
+from PyQt5.QtWidgets import QWidget, QListWidget, QComboBox, QSlider, QPushButton, QHBoxLayout, QVBoxLayout, QSpinBox, QLabel, QGridLayout, QDoubleSpinBox, QCheckBox, QTableWidget, QTableWidgetItem
 from PyQt5.QtCore import Qt, QCoreApplication, QEvent, pyqtSignal
 from PyQt5.QtGui import QKeyEvent
-from filters import filter_classes
+import json
+from filter_registry import filter_names, get_filter_class, get_filter_schema
 
 class FilterEditor(QWidget):
     
@@ -19,14 +20,14 @@ class FilterEditor(QWidget):
         self.prev_index = -1
 
         self.filters_select = QComboBox()
-        for filter in filter_classes:
-            self.filters_select.addItem(filter.name)
+        for class_name, name in filter_names:
+            self.filters_select.addItem(name)
         self.filters_select.setMaxVisibleItems(20)
 
         self.add_filter_button = QPushButton()
         self.add_filter_button.setText("Add Filter")
         self.add_filter_button.clicked.connect(lambda: self.main_controller.add_filter(
-            filter_classes[self.filters_select.currentIndex()]))
+            get_filter_class(filter_names[self.filters_select.currentIndex()][0])))
         self.remove_filter_button = QPushButton()
         self.remove_filter_button.setText("Remove Filter")
         self.remove_filter_button.clicked.connect(self.main_controller.remove_filter)
@@ -45,6 +46,12 @@ class FilterEditor(QWidget):
                 self.filters_list.currentRow(), str1, str2
             ) 
         )
+        self.config_panel.paramDragged.connect(
+            lambda str1, str2: 
+            self.main_controller.update_argument_value(
+                self.filters_list.currentRow(), str1, str2, True
+            ) 
+        )
 
         self.layout.addWidget(self.remove_filter_button)
         self.layout.addWidget(self.up_button)
@@ -68,10 +75,36 @@ class FilterEditor(QWidget):
             # load filter's config widgets
             self.config_panel.load_filter_config(self.main_controller.current_filters[index])
 
+    def show_stage_timings(self, timings):
+        # time of the stage each filter ran in, filters fused into one stage share it
+        # and the ones left out of the plan aren't in any stage, only shown after a render
+        from pipeline import optimize_chain
+        filters = self.main_controller.current_filters
+        removed = [removal[0] for removal in optimize_chain(filters)[1]]
+        indices = [index for index in range(len(filters)) if index not in removed]
+        for index in removed:
+            if index < self.filters_list.count():
+                self.filters_list.item(index).setText(filters[index].name + "  removed")
+        for timing in timings:
+            for i in range(timing.filter_count):
+                if len(indices) > 0:
+                    index = indices.pop(0)
+                    if index < self.filters_list.count():
+                        text = filters[index].name + "  " + timing.describe()
+                        if timing.filter_count > 1:
+                            text += " (fused)"
+                        self.filters_list.item(index).setText(text)
+
+    def clear_stage_timings(self):
+        for index, filter in enumerate(self.main_controller.current_filters[:self.filters_list.count()]):
+            self.filters_list.item(index).setText(filter.name)
+
 
 class ConfigPanel(QWidget):
 
     paramChanged = pyqtSignal(str, str)
+    # intermediate values while a slider is dragged
+    paramDragged = pyqtSignal(str, str)
 
     def __init__(self):
         super(QWidget, self).__init__()
@@ -82,15 +115,19 @@ class ConfigPanel(QWidget):
     def load_filter_config(self, filter):
         self.remove_all_configs()
 
-        for param, param_type in filter.params.items():
+        # editors as described by the filter's schema, holding the filter's current values
+        for param, spec in get_filter_schema(type(filter).__name__)[1].items():
+            param_type = spec[0]
             if param_type == "BoundedInteger":
                 param_editor = BoundedIntegerEditor(param, getattr(filter, param))
                 self.layout.addWidget(param_editor)
                 param_editor.valueChanged.connect(lambda value, p=param: self.paramChanged.emit(p, str(value)))
+                param_editor.valueDragged.connect(lambda value, p=param: self.paramDragged.emit(p, str(value)))
             elif param_type == "BoundedDouble":
                 param_editor = BoundedDoubleEditor(param, getattr(filter, param))
                 self.layout.addWidget(param_editor)
                 param_editor.valueChanged.connect(lambda value, p=param: self.paramChanged.emit(p, str(value)))
+                param_editor.valueDragged.connect(lambda value, p=param: self.paramDragged.emit(p, str(value)))
             elif param_type == "RadioSelect":
                 param_editor = RadioSelectEditor(param, getattr(filter, param))
                 self.layout.addWidget(param_editor)
@@ -99,6 +136,10 @@ class ConfigPanel(QWidget):
                 param_editor = BooleanEditor(param, getattr(filter, param))
                 self.layout.addWidget(param_editor)
                 param_editor.valueChanged.connect(lambda value, p=param: self.paramChanged.emit(p, value))
+            elif param_type == "Matrix":
+                param_editor = MatrixEditor(param, getattr(filter, param))
+                self.layout.addWidget(param_editor)
+                param_editor.valueChanged.connect(lambda value, p=param: self.paramChanged.emit(p, value))
 
 
     def remove_all_configs(self):
@@ -115,6 +156,8 @@ class ConfigPanel(QWidget):
 class BoundedIntegerEditor(QWidget):
 
     valueChanged = pyqtSignal(int)
+    # emitted while the slider is dragged, valueChanged follows on release
+    valueDragged = pyqtSignal(int)
 
     def __init__(self, label, BI):
         super(QWidget, self).__init__()
@@ -138,6 +181,7 @@ class BoundedIntegerEditor(QWidget):
         self.slider.setValue(BI.value)
         self.spinbox.editingFinished.connect(self.spinbox_change)
         self.slider.valueChanged.connect(self.slider_move)
+        self.slider.sliderReleased.connect(self.spinbox_change)
 
         self.layout.addWidget(self.label, 0, 0)
         self.layout.addWidget(self.spinbox, 0, 1)
@@ -154,6 +198,9 @@ class BoundedIntegerEditor(QWidget):
 
     def slider_move(self):
         self.spinbox.setValue(self.slider.value())
+        if self.slider.isSliderDown():
+            self.valueDragged.emit(self.spinbox.value())
+            return
         # will fire off spinbox event
         keyEvent = QKeyEvent(QEvent.KeyPress, Qt.Key_Return, Qt.NoModifier)
         QCoreApplication.postEvent(self.spinbox, keyEvent)
@@ -167,6 +214,8 @@ class BoundedIntegerEditor(QWidget):
 class BoundedDoubleEditor(QWidget):
 
     valueChanged = pyqtSignal(float)
+    # emitted while the slider is dragged, valueChanged follows on release
+    valueDragged = pyqtSignal(float)
 
     def __init__(self, label, BD):
         super(QWidget, self).__init__()
@@ -190,6 +239,7 @@ class BoundedDoubleEditor(QWidget):
         self.slider.setValue(BD.value * 100)
         self.spinbox.editingFinished.connect(self.spinbox_change)
         self.slider.valueChanged.connect(self.slider_move)
+        self.slider.sliderReleased.connect(self.spinbox_change)
 
         self.layout.addWidget(self.label, 0, 0)
         self.layout.addWidget(self.spinbox, 0, 1)
@@ -206,6 +256,9 @@ class BoundedDoubleEditor(QWidget):
 
     def slider_move(self):
         self.spinbox.setValue(self.slider.value() / 100)
+        if self.slider.isSliderDown():
+            self.valueDragged.emit(self.spinbox.value())
+            return
         # will fire off spinbox event
         keyEvent = QKeyEvent(QEvent.KeyPress, Qt.Key_Return, Qt.NoModifier)
         QCoreApplication.postEvent(self.spinbox, keyEvent)
@@ -259,4 +312,82 @@ class BooleanEditor(QWidget):
         self.layout.addWidget(self.checkbox)
 
         # checkbox emits 0 for unchecked, 2 for checked
-        self.checkbox.stateChanged.connect(lambda value: self.valueChanged.emit(str(value)))
\ No newline at end of file
+        self.checkbox.stateChanged.connect(lambda value: self.valueChanged.emit(str(value)))
+
+
+class MatrixEditor(QWidget):
+
+    # the matrix as a JSON list of rows
+    valueChanged = pyqtSignal(str)
+
+    def __init__(self, label, M):
+        super(QWidget, self).__init__()
+
+        self.layout = QGridLayout()
+        self.setLayout(self.layout)
+        self.layout.setContentsMargins(0, 0, 0, 0)
+
+        self.label = QLabel(label)
+        self.rows_spinbox = QSpinBox()
+        self.rows_spinbox.setRange(1, M.max_size)
+        self.rows_spinbox.setValue(M.shape[0])
+        self.cols_spinbox = QSpinBox()
+        self.cols_spinbox.setRange(1, M.max_size)
+        self.cols_spinbox.setValue(M.shape[1])
+        self.table = QTableWidget()
+        self.table.horizontalHeader().setDefaultSectionSize(48)
+        self.set_table_values(M.value)
+        self.rows_spinbox.editingFinished.connect(self.resize_matrix)
+        self.cols_spinbox.editingFinished.connect(self.resize_matrix)
+        self.table.cellChanged.connect(self.cell_change)
+
+        self.layout.addWidget(self.label, 0, 0)
+        self.layout.addWidget(QLabel("rows"), 1, 0)
+        self.layout.addWidget(self.rows_spinbox, 1, 1)
+        self.layout.addWidget(QLabel("columns"), 2, 0)
+        self.layout.addWidget(self.cols_spinbox, 2, 1)
+        self.layout.addWidget(self.table, 3, 0, 1, 2)
+
+    def set_table_values(self, values):
+        # filling the table would emit cellChanged for every cell
+        self.table.blockSignals(True)
+        self.table.setRowCount(len(values))
+        self.table.setColumnCount(len(values[0]))
+        for row, row_values in enumerate(values):
+            for col, value in enumerate(row_values):
+                self.table.setItem(row, col, QTableWidgetItem("{:g}".format(value)))
+        self.table.blockSignals(False)
+
+    def get_table_values(self):
+        values = []
+        for row in range(self.table.rowCount()):
+            values.append([])
+            for col in range(self.table.columnCount()):
+                try:
+                    values[row].append(float(self.table.item(row, col).text()))
+                except (AttributeError, ValueError):
+                    values[row].append(0.0)
+        return values
+
+    def resize_matrix(self):
+        # keeps the cells that are still inside, new ones are 0
+        rows = self.rows_spinbox.value()
+        cols = self.cols_spinbox.value()
+        if (rows, cols) == (self.table.rowCount(), self.table.columnCount()):
+            return
+        old_values = self.get_table_values()
+        values = [[old_values[row][col] if row < len(old_values) and col < len(old_values[0]) else 0.0 for col in range(cols)] for row in range(rows)]
+        self.set_table_values(values)
+        self.valueChanged.emit(json.dumps(values))
+
+    def cell_change(self, row, col):
+        # text that isn't a number counts as 0
+        item = self.table.item(row, col)
+        try:
+            value = float(item.text())
+        except ValueError:
+            value = 0.0
+        self.table.blockSignals(True)
+        item.setText("{:g}".format(value))
+        self.table.blockSignals(False)
+        self.valueChanged.emit(json.dumps(self.get_table_values()))
@@ -0,0 +1,67 @@
+import json
+from filter_registry import get_filter_class
+
+
+# 2: FilterConvolve takes a kernel matrix instead of the nine cells M11..M33
+FORMAT_VERSION = 2
+
+
+def set_param_value(filter, param, value):
+    param_type = filter.params[param]
+    if param_type == "BoundedInteger":
+        getattr(filter, param).value = int(value)
+    elif param_type == "BoundedDouble":
+        getattr(filter, param).value = float(value)
+    elif param_type == "RadioSelect":
+        if value not in getattr(filter, param).settings:
+            raise ValueError("Invalid value " + str(value) + " for " + param)
+        getattr(filter, param).value = value
+    elif param_type == "Boolean":
+        setattr(filter, param, bool(value))
+    elif param_type == "Matrix":
+        getattr(filter, param).value = value
+
+
+def upgrade_params(filter_name, params, version):
+    # parameters saved by older format versions, renamed to the current ones
+    if version < 2 and filter_name == "FilterConvolve":
+        params = dict(params)
+        cells = [[params.pop("M{}{}".format(row, col), 1 if row == col == 2 else 0) for col in range(1, 4)] for row in range(1, 4)]
+        params["kernel"] = cells
+    return params
+
+
+def filter_to_dict(filter):
+    params = dict(zip(filter.params.keys(), filter.get_param_values()))
+    return {"filter": type(filter).__name__, "params": params}
+
+
+def filter_from_dict(data, version=FORMAT_VERSION):
+    filter = get_filter_class(data["filter"])()
+    for param, value in upgrade_params(data["filter"], data.get("params", {}), version).items():
+        if param not in filter.params:
+            raise ValueError("Unknown parameter " + param + " for " + data["filter"])
+        set_param_value(filter, param, value)
+    return filter
+
+
+def filters_to_json(filters):
+    return json.dumps({"version": FORMAT_VERSION, "filters": [filter_to_dict(filter) for filter in filters]}, indent=4)
+
+
+def filters_from_json(text):
+    data = json.loads(text)
+    version = data.get("version", 1)
+    if version > FORMAT_VERSION:
+        raise ValueError("Filters saved by a newer version, format " + str(version))
+    return [filter_from_dict(filter_data, version) for filter_data in data["filters"]]
+
+
+def save_filters(filters, path):
+    with open(path, 'w') as file:
+        file.write(filters_to_json(filters))
+
+
+def load_filters(path):
+    with open(path, 'r') as file:
+        return filters_from_json(file.read())
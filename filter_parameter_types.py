@@ -77,4 +77,42 @@ class RadioSelect():
     def _get_value(self):
         return self._value
 
-    value = property(_get_value, _set_value)
\ No newline at end of file
+    value = property(_get_value, _set_value)
+
+
+class Matrix():
+
+    def __init__(self, value, min, max, max_size=101):
+        self._min = min
+        self._max = max
+        # largest number of rows and columns
+        self._max_size = max_size
+        self._set_value(value)
+
+    def _get_value(self):
+        # tuple of row tuples, hashable so it can be part of a filter's cache key
+        return self._value
+
+    def _set_value(self, value):
+        rows = [tuple(clamp(self._min, float(cell), self._max) for cell in row) for row in value]
+        if not 0 < len(rows) <= self._max_size or not 0 < len(rows[0]) <= self._max_size or any(len(row) != len(rows[0]) for row in rows):
+            raise ValueError("Matrix has to be rectangular with 1 to " + str(self._max_size) + " rows and columns")
+        self._value = tuple(rows)
+
+    def _get_min(self):
+        return self._min
+
+    def _get_max(self):
+        return self._max
+
+    def _get_max_size(self):
+        return self._max_size
+
+    def _get_shape(self):
+        return (len(self._value), len(self._value[0]))
+
+    value = property(_get_value, _set_value)
+    min = property(_get_min)
+    max = property(_get_max)
+    max_size = property(_get_max_size)
+    shape = property(_get_shape)
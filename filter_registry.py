@@ -0,0 +1,125 @@
+from filter_parameter_types import BoundedInteger, BoundedDouble, RadioSelect, Matrix
+
+
+# names and parameters of every filter in filters.py in the order they're offered, so the
+# editor can list them and build their editors before the filters and OpenCV are imported,
+# the filter classes take their name and parameters from here
+
+BorderTypes = ["BORDER_CONSTANT", "BORDER_REPLICATE", "BORDER_REFLECT", "BORDER_WRAP", "BORDER_REFLECT_101", "BORDER_TRANSPARENT", "BORDER_ISOLATED"]
+MorphShapes = ["MORPH_RECT", "MORPH_CROSS", "MORPH_ELLIPSE"]
+MorphTypes = ["MORPH_OPEN", "MORPH_CLOSE", "MORPH_GRADIENT", "MORPH_TOPHAT", "MORPH_BLACKHAT"]
+InterpolationFlags = ["INTER_NEAREST", "INTER_LINEAR", "INTER_CUBIC", "INTER_AREA", "INTER_LANCZOS4", "INTER_NEAREST_EXACT", "INTER_MAX", "WARP_FILL_OUTLIERS", "WARP_INVERSE_MAP"]
+ConvolvePresets = ["SHARPEN", "EDGE_DETECT", "EMBOSS_TL_BR", "TOP_SOBEL", "LEFT_SOBEL", "OUTLINE", "EXTREME_OUTLINE"]
+# the border types a filter doesn't support left out
+FilterBorderTypes = [border_type for border_type in BorderTypes if border_type not in ("BORDER_WRAP", "BORDER_TRANSPARENT")]
+PolarFlags = [flag for flag in InterpolationFlags if flag not in ("INTER_NEAREST_EXACT", "INTER_MAX")]
+
+# a parameter is (type, default) for Boolean, (type, default, min, max[, step]) for
+# BoundedInteger and BoundedDouble, (type, values[, default]) for RadioSelect and
+# (type, default, min, max, max size) for Matrix
+ACTIVE = {"active": ("Boolean", True)}
+ERODE_PARAMS = dict(ACTIVE, **{
+    "kernel_type": ("RadioSelect", MorphShapes),
+    "kernel_width": ("BoundedInteger", 3, 1, 255),
+    "kernel_height": ("BoundedInteger", 3, 1, 255),
+    "iterations": ("BoundedInteger", 1, 1, 255),
+    "border_type": ("RadioSelect", FilterBorderTypes, "BORDER_CONSTANT"),
+    # ellipses as octagons of lines, much faster for large kernels but not exact
+    "approximate_ellipse": ("Boolean", False),
+})
+MATRIX_PARAMS = {
+    "M" + str(row) + str(col): ("BoundedDouble", 1 if row == col else 0, -10, 10) for row in range(1, 4) for col in range(1, 4)
+}
+
+filter_schemas = [
+    ("FilterInvert", "Invert", ACTIVE),
+    ("FilterSplitChannel", "Split Channel", dict(ACTIVE, channel=("RadioSelect", ["Red", "Green", "Blue"]))),
+    ("FilterGrayscale", "Grayscale", ACTIVE),
+    ("FilterGammaCorrect", "Gamma Correct", dict(ACTIVE, gamma=("BoundedDouble", 1, 0, 10))),
+    ("FilterThreshold", "Threshold", dict(ACTIVE,
+        threshold=("BoundedInteger", 0, 0, 255),
+        max_value=("BoundedInteger", 255, 0, 255))),
+    ("FilterThresholdToZero", "Threshold to Zero", dict(ACTIVE, threshold=("BoundedInteger", 0, 0, 255))),
+    ("FilterThresholdAdaptive", "Adaptive Threshold", dict(ACTIVE,
+        max_value=("BoundedInteger", 255, 0, 255),
+        adaptive_method=("RadioSelect", ["ADAPTIVE_THRESH_MEAN_C", "ADAPTIVE_THRESH_GAUSSIAN_C"]),
+        threshold_type=("RadioSelect", ["THRESH_BINARY", "THRESH_BINARY_INV"]),
+        block_size=("BoundedInteger", 3, 3, 255),
+        constant=("BoundedInteger", 0, -64, 64))),
+    ("FilterThresholdOtsuGauss", "Otsu's Binarization Threshold", dict(ACTIVE, max_value=("BoundedInteger", 255, 0, 255))),
+    ("FilterThresholdRange", "Range Threshold", dict(ACTIVE,
+        rLeft=("BoundedInteger", 0, 0, 255),
+        rRight=("BoundedInteger", 0, 0, 256),
+        gLeft=("BoundedInteger", 0, 0, 255),
+        gRight=("BoundedInteger", 0, 0, 256),
+        bLeft=("BoundedInteger", 0, 0, 255),
+        bRight=("BoundedInteger", 0, 0, 256),
+        invert=("Boolean", False))),
+    ("FilterBoxBlur", "Box Blur", dict(ACTIVE,
+        kernel_width=("BoundedInteger", 3, 1, 255),
+        kernel_height=("BoundedInteger", 3, 1, 255),
+        border_type=("RadioSelect", FilterBorderTypes, "BORDER_DEFAULT"))),
+    ("FilterMedianBlur", "Median Blur", dict(ACTIVE, ksize=("BoundedInteger", 3, 1, 255, 2))),
+    ("FilterGaussianBlur", "Gaussian Blur", dict(ACTIVE,
+        kernel_width=("BoundedInteger", 3, 1, 255, 2),
+        kernel_height=("BoundedInteger", 3, 1, 255, 2),
+        sigma_x=("BoundedDouble", 0, 0, 63),
+        sigma_y=("BoundedDouble", 0, 0, 63),
+        border_type=("RadioSelect", FilterBorderTypes, "BORDER_DEFAULT"))),
+    ("FilterErode", "Erode", ERODE_PARAMS),
+    ("FilterDilate", "Dilate", ERODE_PARAMS),
+    ("FilterMorphologyEx", "Morphological Transformation", dict(ERODE_PARAMS, operation=("RadioSelect", MorphTypes))),
+    ("WarpRotate", "Rotate", dict(ACTIVE, theta=("BoundedDouble", 0, -360, 360))),
+    ("WarpAffine", "Affine", dict(ACTIVE, **{param: spec for param, spec in MATRIX_PARAMS.items() if param[1] != "3"},
+        flags=("RadioSelect", InterpolationFlags, "INTER_LINEAR"),
+        border_mode=("RadioSelect", BorderTypes, "BORDER_CONSTANT"))),
+    ("WarpPerspective", "Perspective", dict(ACTIVE, **MATRIX_PARAMS,
+        flags=("RadioSelect", InterpolationFlags, "INTER_LINEAR"),
+        border_mode=("RadioSelect", BorderTypes, "BORDER_CONSTANT"))),
+    ("WarpPolar", "Warp Polar", dict(ACTIVE,
+        max_radius=("BoundedInteger", 1, 0, 8192),
+        flags=("RadioSelect", PolarFlags),
+        POLAR_LOG=("Boolean", False),
+        INVERSE_MAP=("Boolean", False))),
+    ("FilterConvolvePresets", "Convolve Presets", dict(ACTIVE, preset=("RadioSelect", ConvolvePresets))),
+    ("FilterConvolve", "Convolve", dict(ACTIVE,
+        kernel=("Matrix", ((0, 0, 0), (0, 1, 0), (0, 0, 0)), -255, 255, 101),
+        anchor_x=("BoundedInteger", -1, -1, 100),
+        anchor_y=("BoundedInteger", -1, -1, 100),
+        delta=("BoundedInteger", 0, -255, 255),
+        border_type=("RadioSelect", FilterBorderTypes, "BORDER_DEFAULT"))),
+]
+
+# (class name, display name) of every filter
+filter_names = [(class_name, name) for class_name, name, params in filter_schemas]
+schemas_by_class = {class_name: (name, params) for class_name, name, params in filter_schemas}
+
+
+def get_filter_schema(class_name):
+    # (display name, {parameter: spec}) of the filter
+    if class_name not in schemas_by_class:
+        raise ValueError("Unknown filter: " + class_name)
+    return schemas_by_class[class_name]
+
+
+def build_parameter(spec):
+    # the value a filter holds for a parameter, Booleans are plain bools
+    param_type = spec[0]
+    if param_type == "Boolean":
+        return spec[1]
+    if param_type == "BoundedInteger":
+        return BoundedInteger(*spec[1:])
+    if param_type == "BoundedDouble":
+        return BoundedDouble(*spec[1:])
+    if param_type == "RadioSelect":
+        return RadioSelect(*spec[1:])
+    if param_type == "Matrix":
+        return Matrix(*spec[1:])
+    raise ValueError("Unknown parameter type: " + param_type)
+
+
+def get_filter_class(class_name):
+    get_filter_schema(class_name)
+    # filters.py is only imported once a filter is first added or loaded
+    import filters
+    return getattr(filters, class_name)
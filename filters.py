@@ -1,22 +1,203 @@
+import copy
 import cv2
 import numpy as np
 from abc import ABC, abstractmethod
 from filter_parameter_types import *
+from artifact_cache import cached_artifact
+from convolution import filter_2d, is_strip_exact
+from filter_registry import filter_names, get_filter_schema, build_parameter, BorderTypes
+import morphology
+
+
+IdentityLUT = np.arange(256, dtype=np.uint8).reshape(1, 256)
+IdentityLUT.setflags(write=False)
+ConvolvePresetKernels = {
+    "SHARPEN": [
+        [0, -1, 0],
+        [-1, 5, -1],
+        [0, -1, 0]
+    ],
+    "EDGE_DETECT": [
+        [-1, -1, -1],
+        [-1, 8, -1],
+        [-1, -1, -1]
+    ],
+    "EMBOSS_TL_BR": [
+        [-2, -1, 0],
+        [-1, 1, 1],
+        [0, 1, 2]
+    ],
+    "TOP_SOBEL": [
+        [1, 2, 1],
+        [0, 0, 0],
+        [-1, -2, -1]
+    ],
+    "LEFT_SOBEL": [
+        [1, 0, -1],
+        [2, 0, -2],
+        [1, 0, -1]
+    ],
+    "OUTLINE": [
+        [-1, -1, -1],
+        [-1, 8, -1],
+        [-1, -1, -1]
+    ],
+    "EXTREME_OUTLINE": [
+        [0, -256, 0],
+        [-256, 1024, -256],
+        [0, -256, 0]
+    ],
+}
+
+
+# Builders for the lookup tables, kernels and matrices derived from filter parameters,
+# memoized on their exact arguments so re-renders only redo the pixel work
+
+@cached_artifact
+def build_invert_lut():
+    return 255 - IdentityLUT
+
+
+@cached_artifact
+def build_gamma_lut(gamma):
+    return np.clip(np.power(IdentityLUT / 255.0, gamma) * 255.0, 0, 255).astype(np.uint8)
+
+
+@cached_artifact
+def build_threshold_lut(threshold, max_value):
+    return np.where(IdentityLUT > threshold, max_value, 0).astype(np.uint8)
+
+
+@cached_artifact
+def build_threshold_to_zero_lut(threshold):
+    return np.where(IdentityLUT > threshold, IdentityLUT, 0).astype(np.uint8)
+
+
+@cached_artifact
+def build_range_lut(b_range, g_range, r_range, invert):
+    # per channel table, 255 inside [left, right) of each channel's range
+    LUT = np.zeros((1, 256, 3), np.uint8)
+    for channel, (left, right) in enumerate((b_range, g_range, r_range)):
+        LUT[0, left:right, channel] = 255
+    if invert:
+        LUT = 255 - LUT
+    return LUT
+
+
+@cached_artifact
+def build_box_kernel(width, height):
+    return np.ones((height, width)) / (width * height)
+
+
+@cached_artifact
+def build_gaussian_kernel(width, height, sigma_x, sigma_y):
+    # same kernel as GaussianBlur builds, sigma_y defaults to sigma_x
+    kernel_x = cv2.getGaussianKernel(width, sigma_x)
+    kernel_y = cv2.getGaussianKernel(height, sigma_y if sigma_y > 0 else sigma_x)
+    return kernel_y @ kernel_x.T
+
+
+@cached_artifact
+def build_preset_kernel(preset):
+    return np.array(ConvolvePresetKernels[preset])
+
+
+@cached_artifact
+def build_rotation_matrix(rows, cols, theta):
+    return cv2.getRotationMatrix2D(((cols-1)/2.0, (rows-1)/2.0), theta, 1)
+
 
+@cached_artifact
+def build_float32_matrix(*rows):
+    return np.float32(rows)
+
+
+def to_gray(img):
+    # gray images stay 1 channel through the chain, only converted when a filter needs color
+    if img.ndim == 2:
+        return img
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-BorderTypes = ["BORDER_CONSTANT", "BORDER_REPLICATE", "BORDER_REFLECT", "BORDER_WRAP", "BORDER_REFLECT_101", "BORDER_TRANSPARENT", "BORDER_ISOLATED"]
-MorphShapes = ["MORPH_RECT", "MORPH_CROSS", "MORPH_ELLIPSE"]
-MorphTypes = ["MORPH_OPEN", "MORPH_CLOSE", "MORPH_GRADIENT", "MORPH_TOPHAT", "MORPH_BLACKHAT"]
-InterpolationFlags = ["INTER_NEAREST", "INTER_LINEAR", "INTER_CUBIC", "INTER_AREA", "INTER_LANCZOS4", "INTER_NEAREST_EXACT", "INTER_MAX", "WARP_FILL_OUTLIERS", "WARP_INVERSE_MAP"]
+
+def to_bgr(img):
+    if img.ndim == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    return img
 
 
 class Filter(ABC):
 
-    name = "Filter"
-    params = {"active": "Boolean"}
+
+    def __init_subclass__(cls, **kwargs):
+        # the display name and parameter types come from the registry
+        super().__init_subclass__(**kwargs)
+        name, params = get_filter_schema(cls.__name__)
+        cls.name = name
+        cls.params = {param: spec[0] for param, spec in params.items()}
 
     def __init__(self):
-        self.active = True
+        for param, spec in get_filter_schema(type(self).__name__)[1].items():
+            setattr(self, param, build_parameter(spec))
+
+    def get_param_values(self):
+        values = []
+        for param, param_type in self.params.items():
+            if param_type == "Boolean":
+                values.append(getattr(self, param))
+            else:
+                values.append(getattr(self, param).value)
+        return tuple(values)
+
+    def get_key(self):
+        # identifies the filter's output for a given input, used for caching
+        return (type(self).__name__, self.get_param_values())
+
+    def get_footprint(self):
+        # how many pixels around an output pixel its value depends on, 0 for point-wise
+        # filters and None when it can depend on the whole image
+        if not self.active or self.get_lut() is not None:
+            return 0
+        return None
+
+    def get_lut(self):
+        # lookup table giving the same result as apply for point-wise uint8 filters,
+        # (1, 256) for all channels or (1, 256, 3) per channel, None for other filters
+        return None
+
+    def get_linear_kernel(self):
+        # (kernel, anchor, delta, border type) for filters that are a single linear
+        # filter of a uint8 image, None for other filters
+        return None
+
+    def get_warp_flags(self):
+        # (interpolation, border mode) for filters that are a single warp by a 3x3 matrix
+        # returned by get_warp_matrix, None for other filters
+        return None
+
+    def get_warp_matrix(self, shape):
+        # matrix mapping input to output pixel coordinates for an input of the given shape
+        return None
+
+    def scaled(self, factor):
+        # copy of the filter for an image resized by factor, parameters measured in
+        # pixels are scaled so the result looks like a resized full resolution one
+        return copy.deepcopy(self)
+
+    def is_identity(self):
+        # True when apply returns its input unchanged, these are left out of the execution plan,
+        # a per channel table isn't one since it turns gray images into color
+        if not self.active:
+            return True
+        lut = self.get_lut()
+        return lut is not None and lut.ndim == 2 and np.array_equal(lut, IdentityLUT)
+
+    def is_idempotent(self):
+        # True when applying the filter twice gives the same result as once
+        return False
+
+    def cancels(self, other):
+        # True when applying this filter after other gives back other's input
+        return False
 
     @abstractmethod
     def apply(self, img):
@@ -25,7 +206,15 @@ class Filter(ABC):
 
 class FilterInvert(Filter):
 
-    name = "Invert"
+
+    def get_lut(self):
+        if self.active:
+            return build_invert_lut()
+        else:
+            return IdentityLUT
+
+    def cancels(self, other):
+        return self.active and isinstance(other, FilterInvert) and other.active
 
     def apply(self, img):
         if self.active:
@@ -36,15 +225,16 @@ class FilterInvert(Filter):
 
 class FilterSplitChannel(Filter):
 
-    name = "Split Channel"
-    params = {"active": "Boolean", "channel": "RadioSelect"}
 
-    def __init__(self):
-        super().__init__()
-        self.channel = RadioSelect(["Red", "Green", "Blue"])
+    def get_footprint(self):
+        return 0
+
+    def is_idempotent(self):
+        return True
 
     def apply(self, img):
         if self.active:
+            img = to_bgr(img)
             zero = np.zeros_like(img[:,:,0])
             if (self.channel.value == "Red"):
                 return np.dstack((zero, zero, img[:,:,2]))
@@ -58,49 +248,44 @@ class FilterSplitChannel(Filter):
 
 class FilterGrayscale(Filter):
 
-    name = "Grayscale"
-    params = {"active": "Boolean"}
 
-    def __init__(self):
-        super().__init__()
+    def get_footprint(self):
+        return 0
+
+    def is_idempotent(self):
+        return True
 
     def apply(self, img):
         if self.active:
-            img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            return cv2.cvtColor(img_gray, cv2.COLOR_GRAY2BGR)
+            return to_gray(img)
         else:
             return img
 
 
 class FilterGammaCorrect(Filter):
 
-    name = "Gamma Correct"
-    params = {"active": "Boolean", "gamma": "BoundedDouble"}
 
-    def __init__(self):
-        super().__init__()
-        self.gamma = BoundedDouble(1, 0, 10)
+    def get_lut(self):
+        if self.active:
+            return build_gamma_lut(self.gamma.value)
+        else:
+            return IdentityLUT
 
     def apply(self, img):
         if self.active:
-            LUT = np.empty((1, 256), np.uint8)
-            for i in range(256):
-                LUT[0, i] = np.clip(pow(i/255.0, self.gamma.value) * 255.0, 0, 255)
-
-            return cv2.LUT(img, LUT)
+            return cv2.LUT(img, self.get_lut())
         else:
             return img
 
 
 class FilterThreshold(Filter):
 
-    name = "Threshold"
-    params = {"active": "Boolean", "threshold": "BoundedInteger", "max_value": "BoundedInteger"}
 
-    def __init__(self):
-        super().__init__()
-        self.threshold = BoundedInteger(0, 0, 255)
-        self.max_value = BoundedInteger(255, 0, 255)
+    def get_lut(self):
+        if self.active:
+            return build_threshold_lut(self.threshold.value, self.max_value.value)
+        else:
+            return IdentityLUT
 
     def apply(self, img):
         if self.active:
@@ -111,12 +296,12 @@ class FilterThreshold(Filter):
 
 class FilterThresholdToZero(Filter):
 
-    name = "Threshold to Zero"
-    params = {"active": "Boolean", "threshold": "BoundedInteger"}
 
-    def __init__(self):
-        super().__init__()
-        self.threshold = BoundedInteger(0, 0, 255)
+    def get_lut(self):
+        if self.active:
+            return build_threshold_to_zero_lut(self.threshold.value)
+        else:
+            return IdentityLUT
 
     def apply(self, img):
         if self.active:
@@ -127,30 +312,22 @@ class FilterThresholdToZero(Filter):
 
 class FilterThresholdAdaptive(Filter):
 
-    name = "Adaptive Threshold"
-    params = {
-        "active": "Boolean",
-        "max_value": "BoundedInteger",
-        "adaptive_method": "RadioSelect",
-        "threshold_type": "RadioSelect",
-        "block_size": "BoundedInteger",
-        "constant": "BoundedInteger"}
 
-    def __init__(self):
-        super().__init__()
-        self.max_value = BoundedInteger(255, 0, 255)
-        self.adaptive_method = RadioSelect(["ADAPTIVE_THRESH_MEAN_C", "ADAPTIVE_THRESH_GAUSSIAN_C"])
-        self.threshold_type = RadioSelect(["THRESH_BINARY", "THRESH_BINARY_INV"])
-        self.block_size = BoundedInteger(3, 3, 255)
-        self.constant = BoundedInteger(0, -64, 64)
+    def get_footprint(self):
+        return self.block_size.value // 2 + 1 if self.active else 0
+
+    def scaled(self, factor):
+        filter = super().scaled(factor)
+        filter.block_size.value = scale_size(self.block_size.value, factor, True, 3)
+        return filter
 
     def apply(self, img):
         if self.active:
-            img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            img_gray = to_gray(img)
             parsed_block = self.block_size.value
             if parsed_block != 0 and parsed_block % 2 == 0:
                 parsed_block += 1
-            filtered_img = cv2.adaptiveThreshold(
+            return cv2.adaptiveThreshold(
                 img_gray, 
                 self.max_value.value, 
                 getattr(cv2, self.adaptive_method.value), 
@@ -158,89 +335,60 @@ class FilterThresholdAdaptive(Filter):
                 parsed_block, 
                 self.constant.value
             )
-            return cv2.cvtColor(filtered_img, cv2.COLOR_GRAY2BGR)
         else:
             return img
 
 
 class FilterThresholdOtsuGauss(Filter):
 
-    name = "Otsu's Binarization Threshold"
-    params = {"active": "Boolean", "max_value": "BoundedInteger"}
-
-    def __init__(self):
-        super().__init__()
-        self.max_value = BoundedInteger(255, 0, 255)
 
     def apply(self, img):
         if self.active:
-            img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            filtered_img = cv2.threshold(img_gray, 0, self.max_value.value, cv2.THRESH_BINARY+cv2.THRESH_OTSU)[1]
-            return cv2.cvtColor(filtered_img, cv2.COLOR_GRAY2BGR)
+            return cv2.threshold(to_gray(img), 0, self.max_value.value, cv2.THRESH_BINARY+cv2.THRESH_OTSU)[1]
         else:
             return img
 
 
 class FilterThresholdRange(Filter):
 
-    name = "Range Threshold"
-    params = {
-        "active": "Boolean",
-        "rLeft": "BoundedInteger",
-        "rRight": "BoundedInteger",
-        "gLeft": "BoundedInteger",
-        "gRight": "BoundedInteger",
-        "bLeft": "BoundedInteger",
-        "bRight": "BoundedInteger",
-        "invert": "Boolean"
-    }
 
-    def __init__(self):
-        super().__init__()
-        self.rLeft = BoundedInteger(0, 0, 255)
-        self.rRight = BoundedInteger(0, 0, 256)
-        self.gLeft = BoundedInteger(0, 0, 255)
-        self.gRight = BoundedInteger(0, 0, 256)
-        self.bLeft = BoundedInteger(0, 0, 255)
-        self.bRight = BoundedInteger(0, 0, 256)
-        self.invert = False
+    def get_lut(self):
+        if self.active:
+            return build_range_lut(
+                (self.bLeft.value, self.bRight.value), 
+                (self.gLeft.value, self.gRight.value), 
+                (self.rLeft.value, self.rRight.value), 
+                self.invert
+            )
+        else:
+            return IdentityLUT
 
     def apply(self, img):
         if self.active:
-            rLUT = np.zeros((1, 256), np.uint8)
-            rLUT[0][self.rLeft.value:self.rRight.value] = 255
-            gLUT = np.zeros((1, 256), np.uint8)
-            gLUT[0][self.gLeft.value:self.gRight.value] = 255
-            bLUT = np.zeros((1, 256), np.uint8)
-            bLUT[0][self.bLeft.value:self.bRight.value] = 255
-
-            if self.invert:
-                rLUT[0] = [255 - i for i in rLUT[0]]
-                gLUT[0] = [255 - i for i in gLUT[0]]
-                bLUT[0] = [255 - i for i in bLUT[0]]
-
-            rThres = cv2.LUT(img[:,:,2], rLUT)
-            gThres = cv2.LUT(img[:,:,1], gLUT)
-            bThres = cv2.LUT(img[:,:,0], bLUT)
-
-            return np.dstack((bThres, gThres, rThres))
+            # ranges are per channel, so a gray image becomes color
+            return cv2.LUT(to_bgr(img), self.get_lut())
         else:
             return img
 
 
 class FilterBoxBlur(Filter):
 
-    name = "Box Blur"
-    params = {"active": "Boolean", "kernel_width": "BoundedInteger", "kernel_height": "BoundedInteger", "border_type": "RadioSelect"}
 
-    def __init__(self):
-        super().__init__()
-        self.kernel_width = BoundedInteger(3, 1, 255)
-        self.kernel_height = BoundedInteger(3, 1, 255)
-        valid_border_types = BorderTypes.copy()
-        valid_border_types.remove("BORDER_WRAP")
-        valid_border_types.remove("BORDER_TRANSPARENT")
-        self.border_type = RadioSelect(valid_border_types, "BORDER_DEFAULT")
+    def get_linear_kernel(self):
+        if self.active:
+            kernel = build_box_kernel(self.kernel_width.value, self.kernel_height.value)
+            return kernel, get_kernel_anchor(kernel, (-1, -1)), 0, getattr(cv2, self.border_type.value)
+        else:
+            return None
+
+    def get_footprint(self):
+        return max(self.kernel_width.value, self.kernel_height.value) // 2 if self.active else 0
+
+    def scaled(self, factor):
+        filter = super().scaled(factor)
+        filter.kernel_width.value = scale_size(self.kernel_width.value, factor)
+        filter.kernel_height.value = scale_size(self.kernel_height.value, factor)
+        return filter
 
     def apply(self, img):
         if self.active:
@@ -251,12 +399,14 @@ class FilterBoxBlur(Filter):
 
 class FilterMedianBlur(Filter):
 
-    name = "Median Blur"
-    params = {"active": "Boolean", "ksize": "BoundedInteger"}
 
-    def __init__(self):
-        super().__init__()
-        self.ksize = BoundedInteger(3, 1, 255, 2)
+    def get_footprint(self):
+        return self.ksize.value // 2 if self.active else 0
+
+    def scaled(self, factor):
+        filter = super().scaled(factor)
+        filter.ksize.value = scale_size(self.ksize.value, factor, True)
+        return filter
 
     def apply(self, img):
         if self.active:
@@ -267,26 +417,24 @@ class FilterMedianBlur(Filter):
 
 class FilterGaussianBlur(Filter):
 
-    name = "Gaussian Blur"
-    params = {
-        "active": "Boolean", 
-        "kernel_width": "BoundedInteger", 
-        "kernel_height": "BoundedInteger", 
-        "sigma_x": "BoundedDouble", 
-        "sigma_y": "BoundedDouble", 
-        "border_type": "RadioSelect"
-    }
 
-    def __init__(self):
-        super().__init__()
-        self.kernel_width = BoundedInteger(3, 1, 255, 2)
-        self.kernel_height = BoundedInteger(3, 1, 255, 2)
-        self.sigma_x = BoundedDouble(0, 0, 63)
-        self.sigma_y = BoundedDouble(0, 0, 63)
-        valid_border_types = BorderTypes.copy()
-        valid_border_types.remove("BORDER_WRAP")
-        valid_border_types.remove("BORDER_TRANSPARENT")
-        self.border_type = RadioSelect(valid_border_types, "BORDER_DEFAULT")
+    def get_linear_kernel(self):
+        if self.active:
+            kernel = build_gaussian_kernel(self.kernel_width.value, self.kernel_height.value, self.sigma_x.value, self.sigma_y.value)
+            return kernel, get_kernel_anchor(kernel, (-1, -1)), 0, getattr(cv2, self.border_type.value)
+        else:
+            return None
+
+    def get_footprint(self):
+        return max(self.kernel_width.value, self.kernel_height.value) // 2 if self.active else 0
+
+    def scaled(self, factor):
+        filter = super().scaled(factor)
+        filter.kernel_width.value = scale_size(self.kernel_width.value, factor, True)
+        filter.kernel_height.value = scale_size(self.kernel_height.value, factor, True)
+        filter.sigma_x.value = self.sigma_x.value * factor
+        filter.sigma_y.value = self.sigma_y.value * factor
+        return filter
 
     def apply(self, img):
         if self.active:
@@ -294,8 +442,8 @@ class FilterGaussianBlur(Filter):
                 img, 
                 (self.kernel_width.value, self.kernel_height.value), 
                 self.sigma_x.value, 
-                self.sigma_y.value, 
-                getattr(cv2, self.border_type.value)
+                sigmaY=self.sigma_y.value, 
+                borderType=getattr(cv2, self.border_type.value)
             )
         else:
             return img
@@ -303,102 +451,111 @@ class FilterGaussianBlur(Filter):
 
 class FilterErode(Filter):
 
-    name = "Erode"
-    params = {
-        "active": "Boolean", 
-        "kernel_type": "RadioSelect", 
-        "kernel_width": "BoundedInteger", 
-        "kernel_height": "BoundedInteger", 
-        "iterations": "BoundedInteger", 
-        "border_type": "RadioSelect"
-    }
 
-    def __init__(self):
-        super().__init__()
-        self.kernel_type = RadioSelect(MorphShapes)
-        self.kernel_width = BoundedInteger(3, 1, 255)
-        self.kernel_height = BoundedInteger(3, 1, 255)
-        self.iterations = BoundedInteger(1, 1, 255)
-        valid_border_types = BorderTypes.copy()
-        valid_border_types.remove("BORDER_WRAP")
-        valid_border_types.remove("BORDER_TRANSPARENT")
-        self.border_type = RadioSelect(valid_border_types, "BORDER_CONSTANT")
+    def get_footprint(self):
+        if self.active:
+            return max(self.kernel_width.value, self.kernel_height.value) // 2 * self.iterations.value
+        else:
+            return 0
+
+    def scaled(self, factor):
+        filter = super().scaled(factor)
+        filter.kernel_width.value = scale_size(self.kernel_width.value, factor)
+        filter.kernel_height.value = scale_size(self.kernel_height.value, factor)
+        return filter
+
+    def get_morphology_args(self):
+        return (
+            getattr(cv2, self.kernel_type.value), 
+            self.kernel_width.value, 
+            self.kernel_height.value, 
+            self.iterations.value, 
+            getattr(cv2, self.border_type.value), 
+            self.approximate_ellipse
+        )
 
     def apply(self, img):
         if self.active:
-            kernel = cv2.getStructuringElement(
-                getattr(cv2, self.kernel_type.value), 
-                (self.kernel_width.value, self.kernel_height.value)
-            )
-            return cv2.erode(img, kernel, 
-                iterations=self.iterations.value, 
-                borderType=getattr(cv2, self.border_type.value)
-            )
+            return morphology.erode(img, *self.get_morphology_args())
         else:
             return img
 
 
 class FilterDilate(FilterErode):
 
-    name = "Dilate"
-
-    def __init__(self):
-        super().__init__()
 
     def apply(self, img):
         if self.active:
-            kernel = cv2.getStructuringElement(
-                getattr(cv2, self.kernel_type.value), 
-                (self.kernel_width.value, self.kernel_height.value)
-            )
-            return cv2.dilate(img, kernel, 
-                iterations=self.iterations.value, 
-                borderType=getattr(cv2, self.border_type.value)
-            )
+            return morphology.dilate(img, *self.get_morphology_args())
         else:
             return img
 
 
 class FilterMorphologyEx(FilterErode):
 
-    name = "Morphological Transformation"
-    params = FilterErode.params.copy()
-    params["operation"] = "RadioSelect"
 
-    def __init__(self):
-        super().__init__()
-        self.operation = RadioSelect(MorphTypes)
+    def get_footprint(self):
+        # opening and closing erode then dilate, iterations times each
+        return 2 * super().get_footprint()
 
     def apply(self, img):
         if self.active:
-            kernel = cv2.getStructuringElement(
-                getattr(cv2, self.kernel_type.value), 
-                (self.kernel_width.value, self.kernel_height.value)
-            )
-            return cv2.morphologyEx(
-                img, 
-                getattr(cv2, self.operation.value), 
-                kernel, 
-                iterations=self.iterations.value, 
-                borderType=getattr(cv2, self.border_type.value)
-            )
+            return morphology.morphology_ex(img, getattr(cv2, self.operation.value), *self.get_morphology_args())
         else:
             return img
 
 
+def get_kernel_anchor(kernel, anchor):
+    # (-1, -1) is the kernel center, as in OpenCV, so is a coordinate outside a kernel that was shrunk
+    rows, cols = kernel.shape[:2]
+    return (cols // 2 if not 0 <= anchor[0] < cols else anchor[0], rows // 2 if not 0 <= anchor[1] < rows else anchor[1])
+
+
+def scale_size(size, factor, odd=False, minimum=1):
+    # kernel size for an image resized by factor, odd sizes stay odd
+    size = max(minimum, int(round(size * factor)))
+    if odd and size % 2 == 0:
+        size += 1
+    return size
+
+
+def get_homography_warp_flags(flags, border_mode):
+    # warps that map pixels by a plain matrix, the other flags aren't a homography
+    interpolation = getattr(cv2, flags) & ~cv2.WARP_INVERSE_MAP
+    if interpolation not in (cv2.INTER_NEAREST, cv2.INTER_LINEAR, cv2.INTER_CUBIC, cv2.INTER_LANCZOS4):
+        return None
+    return interpolation, getattr(cv2, border_mode)
+
+
+def get_forward_matrix(mat, flags):
+    mat = np.float64(mat)
+    if getattr(cv2, flags) & cv2.WARP_INVERSE_MAP:
+        return np.linalg.inv(mat)
+    return mat
+
+
 class WarpRotate(Filter):
 
-    name = "Rotate"
-    params = {"active": "Boolean", "theta": "BoundedDouble"}
 
-    def __init__(self):
-        super().__init__()
-        self.theta = BoundedDouble(0, -360, 360)
+    def get_matrix(self, shape):
+        return build_rotation_matrix(shape[0], shape[1], self.theta.value)
+
+    def get_warp_flags(self):
+        if self.active:
+            return cv2.INTER_LINEAR, cv2.BORDER_CONSTANT
+        else:
+            return None
+
+    def get_warp_matrix(self, shape):
+        return np.vstack((self.get_matrix(shape), [0, 0, 1]))
+
+    def is_identity(self):
+        return not self.active or self.theta.value % 360 == 0
 
     def apply(self, img):
         if self.active:
-            rows, cols, channels = img.shape
-            mat = cv2.getRotationMatrix2D(((cols-1)/2.0, (rows-1)/2.0), self.theta.value, 1)
+            rows, cols = img.shape[:2]
+            mat = self.get_matrix(img.shape)
             return cv2.warpAffine(img, mat, (cols,rows))
         else:
             return img
@@ -406,34 +563,33 @@ class WarpRotate(Filter):
 
 class WarpAffine(Filter):
 
-    name = "Affine"
-    params = {
-        "active": "Boolean", 
-        "M11": "BoundedDouble", 
-        "M12": "BoundedDouble", 
-        "M13": "BoundedDouble", 
-        "M21": "BoundedDouble", 
-        "M22": "BoundedDouble", 
-        "M23": "BoundedDouble", 
-        "flags": "RadioSelect",
-        "border_mode": "RadioSelect"
-        }
 
-    def __init__(self):
-        super().__init__()
-        self.M11 = BoundedDouble(1, -10, 10)
-        self.M12 = BoundedDouble(0, -10, 10)
-        self.M13 = BoundedDouble(0, -10, 10)
-        self.M21 = BoundedDouble(0, -10, 10)
-        self.M22 = BoundedDouble(1, -10, 10)
-        self.M23 = BoundedDouble(0, -10, 10)
-        self.flags = RadioSelect(InterpolationFlags, "INTER_LINEAR")
-        self.border_mode = RadioSelect(BorderTypes, "BORDER_CONSTANT")
+    def get_matrix(self, shape):
+        return build_float32_matrix((self.M11.value, self.M12.value, self.M13.value), (self.M21.value, self.M22.value, self.M23.value))
+
+    def get_warp_flags(self):
+        if self.active:
+            return get_homography_warp_flags(self.flags.value, self.border_mode.value)
+        else:
+            return None
+
+    def get_warp_matrix(self, shape):
+        return get_forward_matrix(np.vstack((self.get_matrix(shape), [0, 0, 1])), self.flags.value)
+
+    def is_identity(self):
+        return not self.active or np.array_equal(self.get_matrix(None), np.eye(2, 3))
+
+    def scaled(self, factor):
+        # only the translation is in pixels
+        filter = super().scaled(factor)
+        filter.M13.value = self.M13.value * factor
+        filter.M23.value = self.M23.value * factor
+        return filter
 
     def apply(self, img):
         if self.active:
-            rows, cols, channels = img.shape
-            mat = np.float32([[self.M11.value, self.M12.value, self.M13.value], [self.M21.value, self.M22.value, self.M23.value]])
+            rows, cols = img.shape[:2]
+            mat = self.get_matrix(img.shape)
             return cv2.warpAffine(img, mat, (cols, rows), 
                 getattr(cv2, self.flags.value), 
                 getattr(cv2, self.border_mode.value)
@@ -443,45 +599,43 @@ class WarpAffine(Filter):
 
 class WarpPerspective(Filter):
 
-    name = "Perspective"
-    params = {
-        "active": "Boolean", 
-        "M11": "BoundedDouble", 
-        "M12": "BoundedDouble", 
-        "M13": "BoundedDouble", 
-        "M21": "BoundedDouble", 
-        "M22": "BoundedDouble", 
-        "M23": "BoundedDouble", 
-        "M31": "BoundedDouble", 
-        "M32": "BoundedDouble", 
-        "M33": "BoundedDouble", 
-        "flags": "RadioSelect",
-        "border_mode": "RadioSelect"
-        }
 
     def __init__(self):
         super().__init__()
-        self.M11 = BoundedDouble(1, -10, 10)
-        self.M12 = BoundedDouble(0, -10, 10)
-        self.M13 = BoundedDouble(0, -10, 10)
-        self.M21 = BoundedDouble(0, -10, 10)
-        self.M22 = BoundedDouble(1, -10, 10)
-        self.M23 = BoundedDouble(0, -10, 10)
-        self.M31 = BoundedDouble(0, -10, 10)
-        self.M32 = BoundedDouble(0, -10, 10)
-        self.M33 = BoundedDouble(1, -10, 10)
-        self.flags = RadioSelect(InterpolationFlags, "INTER_LINEAR")
-        self.border_mode = RadioSelect(BorderTypes, "BORDER_CONSTANT")
         self.border_value = BoundedInteger(0, 0, 255)
 
+    def get_matrix(self, shape):
+        return build_float32_matrix(
+            (self.M11.value, self.M12.value, self.M13.value), 
+            (self.M21.value, self.M22.value, self.M23.value), 
+            (self.M31.value, self.M32.value, self.M33.value)
+        )
+
+    def get_warp_flags(self):
+        if self.active:
+            return get_homography_warp_flags(self.flags.value, self.border_mode.value)
+        else:
+            return None
+
+    def get_warp_matrix(self, shape):
+        return get_forward_matrix(self.get_matrix(shape), self.flags.value)
+
+    def is_identity(self):
+        return not self.active or np.array_equal(self.get_matrix(None), np.eye(3))
+
+    def scaled(self, factor):
+        # S @ M @ S^-1 with S scaling by factor
+        filter = super().scaled(factor)
+        filter.M13.value = self.M13.value * factor
+        filter.M23.value = self.M23.value * factor
+        filter.M31.value = self.M31.value / factor
+        filter.M32.value = self.M32.value / factor
+        return filter
+
     def apply(self, img):
         if self.active:
-            rows, cols, channels = img.shape
-            mat = np.float32([
-                [self.M11.value, self.M12.value, self.M13.value], 
-                [self.M21.value, self.M22.value, self.M23.value], 
-                [self.M31.value, self.M32.value, self.M33.value]
-            ])
+            rows, cols = img.shape[:2]
+            mat = self.get_matrix(img.shape)
             return cv2.warpPerspective(img, mat, (cols, rows), 
                 getattr(cv2, self.flags.value), 
                 getattr(cv2, self.border_mode.value)
@@ -491,18 +645,11 @@ class WarpPerspective(Filter):
 
 class WarpPolar(Filter):
 
-    name = "Warp Polar"
-    params = {"active": "Boolean", "max_radius": "BoundedInteger", "flags": "RadioSelect", "POLAR_LOG": "Boolean", "INVERSE_MAP": "Boolean"}
 
-    def __init__(self):
-        super().__init__()
-        self.max_radius = BoundedInteger(1, 0, 8192)
-        valid_flags = InterpolationFlags.copy()
-        valid_flags.remove("INTER_NEAREST_EXACT")
-        valid_flags.remove("INTER_MAX")
-        self.flags = RadioSelect(valid_flags)
-        self.POLAR_LOG = False
-        self.INVERSE_MAP = False
+    def scaled(self, factor):
+        filter = super().scaled(factor)
+        filter.max_radius.value = max(0, int(round(self.max_radius.value * factor)))
+        return filter
 
     def apply(self, img):
         if self.active:
@@ -511,7 +658,7 @@ class WarpPolar(Filter):
                 flag += cv2.WARP_POLAR_LOG
             if self.INVERSE_MAP:
                 flag += cv2.WARP_INVERSE_MAP
-            rows, cols, channels = img.shape
+            rows, cols = img.shape[:2]
             return cv2.warpPolar(img, (cols, rows), ((cols-1)/2.0, (rows-1)/2.0), self.max_radius.value, flag)
         else:
             return img
@@ -519,61 +666,28 @@ class WarpPolar(Filter):
 
 class FilterConvolvePresets(Filter):
 
-    name = "Convolve Presets"
-    params = {"active": "Boolean", "preset": "RadioSelect"}
-
     def __init__(self):
         super().__init__()
-        self.preset = RadioSelect(["SHARPEN", "EDGE_DETECT", "EMBOSS_TL_BR", "TOP_SOBEL", "LEFT_SOBEL", "OUTLINE", "EXTREME_OUTLINE"])
-        valid_border_types = BorderTypes.copy()
-        valid_border_types.remove("BORDER_WRAP")
-        self.border_type = RadioSelect(valid_border_types, "BORDER_DEFAULT")
+        # not offered in the editor
+        self.border_type = RadioSelect([border_type for border_type in BorderTypes if border_type != "BORDER_WRAP"], "BORDER_DEFAULT")
 
-    def apply(self, img):
+
+    def get_kernel(self):
+        return build_preset_kernel(self.preset.value)
+
+    def get_linear_kernel(self):
         if self.active:
-            if self.preset.value == "SHARPEN":
-                kernel = np.array([
-                    [0, -1, 0],
-                    [-1, 5, -1],
-                    [0, -1, 0]
-                    ])
-            elif self.preset.value == "EDGE_DETECT":
-                kernel = np.array([
-                    [-1, -1, -1],
-                    [-1, 8, -1],
-                    [-1, -1, -1]
-                    ])
-            elif self.preset.value == "EMBOSS_TL_BR":
-                kernel = np.array([
-                    [-2, -1, 0],
-                    [-1, 1, 1],
-                    [0, 1, 2]
-                ])
-            elif self.preset.value == "TOP_SOBEL":
-                kernel = np.array([
-                    [1, 2, 1],
-                    [0, 0, 0],
-                    [-1, -2, -1]
-                ])
-            elif self.preset.value == "LEFT_SOBEL":
-                kernel = np.array([
-                    [1, 0, -1],
-                    [2, 0, -2],
-                    [1, 0, -1]
-                ])
-            elif self.preset.value == "OUTLINE":
-                kernel = np.array([
-                    [-1, -1, -1],
-                    [-1, 8, -1],
-                    [-1, -1, -1]
-                ])
-            elif self.preset.value == "EXTREME_OUTLINE":
-                kernel = np.array([
-                    [0, -256, 0],
-                    [-256, 1024, -256],
-                    [0, -256, 0]
-                ])
+            kernel = self.get_kernel()
+            return kernel, get_kernel_anchor(kernel, (-1, -1)), 0, getattr(cv2, self.border_type.value)
+        else:
+            return None
+
+    def get_footprint(self):
+        return max(self.get_kernel().shape) // 2 if self.active else 0
 
+    def apply(self, img):
+        if self.active:
+            kernel = self.get_kernel()
             return cv2.filter2D(img, -1, kernel, borderType=getattr(cv2, self.border_type.value))
         else:
             return img
@@ -581,71 +695,46 @@ class FilterConvolvePresets(Filter):
 
 class FilterConvolve(Filter):
 
-    name = "Convolve"
-    params = {
-        "active": "Boolean", 
-        "M11": "BoundedDouble", 
-        "M12": "BoundedDouble", 
-        "M13": "BoundedDouble", 
-        "M21": "BoundedDouble", 
-        "M22": "BoundedDouble", 
-        "M23": "BoundedDouble", 
-        "M31": "BoundedDouble", 
-        "M32": "BoundedDouble", 
-        "M33": "BoundedDouble",
-        "anchor_x": "BoundedInteger",
-        "anchor_y": "BoundedInteger",
-        "delta": "BoundedInteger",
-        "border_type": "RadioSelect"
-        }
 
-    def __init__(self):
-        super().__init__()
-        self.M11 = BoundedDouble(0, -3, 3)
-        self.M12 = BoundedDouble(0, -3, 3)
-        self.M13 = BoundedDouble(0, -3, 3)
-        self.M21 = BoundedDouble(0, -3, 3)
-        self.M22 = BoundedDouble(1, -3, 3)
-        self.M23 = BoundedDouble(0, -3, 3)
-        self.M31 = BoundedDouble(0, -3, 3)
-        self.M32 = BoundedDouble(0, -3, 3)
-        self.M33 = BoundedDouble(0, -3, 3)
-        self.anchor_x = BoundedInteger(-1, -1, 3)
-        self.anchor_y = BoundedInteger(-1, -1, 3)
-        self.delta = BoundedInteger(0, -255, 255)
-        valid_border_types = BorderTypes.copy()
-        valid_border_types.remove("BORDER_WRAP")
-        valid_border_types.remove("BORDER_TRANSPARENT")
-        self.border_type = RadioSelect(valid_border_types, "BORDER_DEFAULT")
+    def get_kernel(self):
+        return build_float32_matrix(*self.kernel.value)
+
+    def get_anchor(self):
+        return get_kernel_anchor(self.get_kernel(), (self.anchor_x.value, self.anchor_y.value))
+
+    def get_linear_kernel(self):
+        if self.active:
+            return self.get_kernel(), self.get_anchor(), self.delta.value, getattr(cv2, self.border_type.value)
+        else:
+            return None
+
+    def get_footprint(self):
+        if self.active:
+            kernel = self.get_kernel()
+            # strips would round differently from the whole image
+            if not is_strip_exact(kernel):
+                return None
+            anchor_x, anchor_y = self.get_anchor()
+            return max(anchor_x, kernel.shape[1] - 1 - anchor_x, anchor_y, kernel.shape[0] - 1 - anchor_y)
+        else:
+            return 0
+
+    def is_identity(self):
+        # a single 1 at the anchor copies every pixel
+        if not self.active:
+            return True
+        kernel = self.get_kernel()
+        anchor = self.get_anchor()
+        if self.delta.value != 0 or kernel[anchor[1], anchor[0]] != 1:
+            return False
+        return np.count_nonzero(kernel) == 1
 
     def apply(self, img):
         if self.active:
-            kernel = np.float32([[self.M11.value, self.M12.value, self.M13.value], [self.M21.value, self.M22.value, self.M23.value], [self.M31.value, self.M32.value, self.M33.value]])
-            return cv2.filter2D(img, -1, kernel, anchor=(self.anchor_x.value, self.anchor_y.value), delta=self.delta.value, borderType=getattr(cv2, self.border_type.value))
+            # separable, direct or through the DFT depending on the kernel
+            return filter_2d(img, self.get_kernel(), self.get_anchor(), self.delta.value, getattr(cv2, self.border_type.value))
         else:
             return img
 
 
-filter_classes = [
-    FilterInvert, 
-    FilterSplitChannel,
-    FilterGrayscale,
-    FilterGammaCorrect,
-    FilterThreshold,
-    FilterThresholdToZero,
-    FilterThresholdAdaptive,
-    FilterThresholdOtsuGauss,
-    FilterThresholdRange,
-    FilterBoxBlur,
-    FilterMedianBlur,
-    FilterGaussianBlur,
-    FilterErode,
-    FilterDilate,
-    FilterMorphologyEx,
-    WarpRotate,
-    WarpAffine,
-    WarpPerspective,
-    WarpPolar,
-    FilterConvolvePresets,
-    FilterConvolve,
-]
\ No newline at end of file
+filter_classes = [globals()[class_name] for class_name, name in filter_names]
@@ -0,0 +1,100 @@
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel
+from PyQt5.QtGui import QPainter, QColor, QPolygonF
+from PyQt5.QtCore import QPointF
+
+from image_stats import StatsWorker
+
+
+# BGR channel order of cv2 images
+channel_colors = {1: [QColor(80, 80, 80)], 3: [QColor(0, 0, 255), QColor(0, 160, 0), QColor(255, 0, 0)]}
+channel_names = {1: ["Gray"], 3: ["B", "G", "R"]}
+
+
+class HistogramView(QWidget):
+
+    def __init__(self):
+        super(QWidget, self).__init__()
+        self.stats = None
+        self.setMinimumSize(200, 100)
+
+    def set_stats(self, stats):
+        self.stats = stats
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(255, 255, 255))
+        if self.stats is None:
+            return
+        painter.setRenderHint(QPainter.Antialiasing)
+        # scaled to the highest bin between the ends, so clipped pixels don't flatten the rest
+        peak = max(max(channel.hist[1:255].max(), 1) for channel in self.stats)
+        width = self.width() - 1
+        height = self.height() - 1
+        colors = channel_colors.get(len(self.stats), channel_colors[3])
+        for channel, color in zip(self.stats, colors):
+            polygon = QPolygonF([QPointF(index * width / 255, height - min(count / peak, 1) * height) for index, count in enumerate(channel.hist)])
+            painter.setPen(color)
+            painter.drawPolyline(polygon)
+        painter.end()
+
+
+class HistogramPanel(QWidget):
+    # histograms and statistics of the input and output, updated after renders off the GUI thread
+
+    def __init__(self, controller):
+        super(QWidget, self).__init__()
+        self.main_controller = controller
+        self.main_controller.histogram_panel = self
+        self.filtered_source = None
+
+        self.stats_worker = StatsWorker()
+        self.stats_worker.statsFinished.connect(self.show_stats)
+
+        self.layout = QVBoxLayout()
+        self.setLayout(self.layout)
+
+        self.base_view = HistogramView()
+        self.base_label = QLabel()
+        self.base_label.setWordWrap(True)
+        self.filtered_view = HistogramView()
+        self.filtered_label = QLabel()
+        self.filtered_label.setWordWrap(True)
+
+        self.layout.addWidget(QLabel("Input"))
+        self.layout.addWidget(self.base_view)
+        self.layout.addWidget(self.base_label)
+        self.layout.addWidget(QLabel("Output"))
+        self.layout.addWidget(self.filtered_view)
+        self.layout.addWidget(self.filtered_label)
+        self.layout.addStretch()
+
+    def update_images(self, base_image, filtered_image, subsample=False):
+        # only new render output is counted, and nothing while the panel is hidden
+        if filtered_image is self.filtered_source or not self.isVisible():
+            return
+        self.filtered_source = filtered_image
+        self.stats_worker.request_stats(base_image, filtered_image, subsample)
+
+    def showEvent(self, event):
+        self.update_images(self.main_controller.base_image, self.main_controller.filtered_image)
+        super().showEvent(event)
+
+    def show_stats(self, generation, base_stats, filtered_stats):
+        if generation != self.stats_worker.generation:
+            return
+        self.base_view.set_stats(base_stats)
+        self.base_label.setText(self.describe_stats(base_stats))
+        self.filtered_view.set_stats(filtered_stats)
+        self.filtered_label.setText(self.describe_stats(filtered_stats))
+
+    def describe_stats(self, stats):
+        names = channel_names.get(len(stats), [str(index) for index in range(len(stats))])
+        lines = []
+        for name, channel in zip(names, stats):
+            lines.append("{}: min {}, max {}, mean {:.1f}, clipped {:.1%} black, {:.1%} white".format(
+                name, channel.min, channel.max, channel.mean, channel.clipped_low, channel.clipped_high))
+        return "\n".join(lines)
+
+    def stop_worker(self):
+        self.stats_worker.stop()
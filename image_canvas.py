@@ -0,0 +1,99 @@
+from collections import OrderedDict
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtGui import QPainter
+import numpy as np
+
+from opencv_processing import convert_cv_qimage
+from zoom_pyramid import ZoomPyramid
+
+
+# size of a tile in screen pixels
+TILE_SIZE = 256
+# 128 tiles of 256x256 BGR is 24 MB
+MAX_TILES = 128
+
+
+class ImageCanvas(QWidget):
+    # Paints only the tiles of the zoomed image that are exposed in the scroll area's
+    # viewport, so memory and paint time depend on the screen size, not the zoom
+
+    def __init__(self):
+        super(QWidget, self).__init__()
+        # full resolution cv2 image, tiles are sampled from it on demand
+        self.image = None
+        # (width, height) of the full resolution image, a proxy image is stretched to it
+        self.image_size = None
+        self.scale_factor = 1
+        self.tiles = OrderedDict()
+        # zoomed out tiles are sampled from a downscaled level instead of the full image
+        self.pyramid = ZoomPyramid()
+        self.pyramid.levelBuilt.connect(self.level_built)
+
+    def set_image(self, image, image_size=None, key=None):
+        image_size = image_size or (image.shape[1], image.shape[0])
+        # renders that didn't change the output keep the tiles and pyramid levels
+        if not self.pyramid.set_image(image, key) and image_size == self.image_size:
+            self.image = image
+            return
+        self.image = image
+        self.image_size = image_size
+        self.tiles.clear()
+        self.update_size()
+        self.update()
+
+    def set_scale(self, scale_factor):
+        self.scale_factor = scale_factor
+        self.tiles.clear()
+        self.update_size()
+        self.update()
+
+    def level_built(self, generation):
+        # tiles sampled from a larger level until now are redrawn from the new one
+        if generation == self.pyramid.generation:
+            self.tiles.clear()
+            self.update()
+
+    def update_size(self):
+        if self.image is not None:
+            self.resize(int(self.image_size[0] * self.scale_factor), int(self.image_size[1] * self.scale_factor))
+
+    def get_tile(self, tile_x, tile_y):
+        key = (tile_x, tile_y)
+        if key in self.tiles:
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+
+        left = tile_x * TILE_SIZE
+        top = tile_y * TILE_SIZE
+        width = min(TILE_SIZE, self.width() - left)
+        height = min(TILE_SIZE, self.height() - top)
+        if self.scale_factor == 1 and self.image_size == (self.image.shape[1], self.image.shape[0]):
+            # shares the image's buffer, no copy at all
+            tile = convert_cv_qimage(self.image[top:top+height, left:left+width])
+        else:
+            # nearest neighbour source pixel of every screen pixel in the tile, the same
+            # mapping is used for every tile so there are no seams between them, zoomed
+            # out it is taken from a level less than twice the displayed size so it isn't aliased
+            level = self.pyramid.get_level(self.scale_factor * self.image_size[0] / self.image.shape[1])
+            scale_y = self.scale_factor * self.image_size[1] / level.shape[0]
+            scale_x = self.scale_factor * self.image_size[0] / level.shape[1]
+            rows = np.minimum(((top + np.arange(height)) / scale_y).astype(np.intp), level.shape[0] - 1)
+            cols = np.minimum(((left + np.arange(width)) / scale_x).astype(np.intp), level.shape[1] - 1)
+            tile = convert_cv_qimage(level[rows[:, None], cols])
+
+        self.tiles[key] = tile
+        if len(self.tiles) > MAX_TILES:
+            self.tiles.popitem(last=False)
+        return tile
+
+    def paintEvent(self, event):
+        if self.image is None:
+            return
+        rect = event.rect().intersected(self.rect())
+        if rect.isEmpty():
+            return
+        painter = QPainter(self)
+        for tile_y in range(rect.top() // TILE_SIZE, rect.bottom() // TILE_SIZE + 1):
+            for tile_x in range(rect.left() // TILE_SIZE, rect.right() // TILE_SIZE + 1):
+                painter.drawImage(tile_x * TILE_SIZE, tile_y * TILE_SIZE, self.get_tile(tile_x, tile_y))
+        painter.end()
@@ -0,0 +1,51 @@
+import os
+import threading
+import cv2
+
+
+image_extensions = ["bmp", "dib", "jpeg", "jpg", "jpe", "jp2", "png", "pgm", "ppm", "sr", "ras", "tiff", "tif", "webp"]
+
+
+def is_image_file(path):
+    return path.split('.')[-1].lower() in image_extensions
+
+
+def read_image(path):
+    # gray files are kept 1 channel, everything else is 8 bit BGR
+    img = cv2.imread(path, cv2.IMREAD_ANYCOLOR)
+    if img is None:
+        raise IOError("Error: file " + path + " failed to open")
+    return img
+
+
+def write_image(save_path, img, params=None):
+    # params are cv2.imwrite encoder parameters, PNGs default to the smallest file
+    extension = save_path.split('.')[-1].lower()
+    if params is not None:
+        if extension == 'pgm' and img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        elif extension == 'ppm' and img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        success = cv2.imwrite(save_path, img, params)
+    elif extension == 'pgm':
+        success = cv2.imwrite(save_path, img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+    elif extension == 'ppm' and img.ndim == 2:
+        success = cv2.imwrite(save_path, cv2.cvtColor(img, cv2.COLOR_GRAY2BGR))
+    elif extension == 'png':
+        success = cv2.imwrite(save_path, img, [cv2.IMWRITE_PNG_COMPRESSION, 9])
+    else:
+        success = cv2.imwrite(save_path, img)
+    if not success:
+        raise IOError("Error: file " + save_path + " failed to save")
+
+
+def write_image_atomic(save_path, img, params=None):
+    # write next to the target then rename, so a partial file is never seen as finished
+    directory, file_name = os.path.split(save_path)
+    temp_path = os.path.join(directory, ".partial-" + str(os.getpid()) + "-" + str(threading.get_ident()) + "-" + file_name)
+    try:
+        write_image(temp_path, img, params)
+        os.replace(temp_path, save_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,93 @@
+import os
+import threading
+import cv2
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+from image_io import read_image
+
+
+# files smaller than this decode fast enough that a preview would only flicker
+PREVIEW_MIN_BYTES = 4 * 1024 * 1024
+# the preview is 1/PREVIEW_FACTOR of the full size
+PREVIEW_FACTOR = 8
+
+jpeg_extensions = ["jpeg", "jpg", "jpe"]
+
+
+def read_preview(path):
+    # quick reduced resolution decode, None for formats that can't do better than a full decode
+    extension = path.split('.')[-1].lower()
+    if extension in jpeg_extensions:
+        # libjpeg scales while decoding, so this skips most of the work
+        return cv2.imread(path, cv2.IMREAD_REDUCED_COLOR_8)
+    # imported on the first load, it brings in the filter pipeline
+    from mapped_image import open_mapped_image
+    mapped_image = open_mapped_image(path)
+    if hasattr(mapped_image, "read_preview"):
+        return mapped_image.read_preview(PREVIEW_FACTOR)
+    return None
+
+
+class ImageLoader(QObject):
+    # decodes images off the GUI thread, a preview first for large files, only the
+    # newest request is loaded and results of older ones are dropped
+
+    # generation, path, preview image
+    previewLoaded = pyqtSignal(int, str, object)
+    # generation, path, full resolution image
+    imageLoaded = pyqtSignal(int, str, object)
+    # generation, path, error message
+    loadFailed = pyqtSignal(int, str, str)
+    loadRequested = pyqtSignal()
+
+    def __init__(self):
+        super(QObject, self).__init__()
+        self.lock = threading.Lock()
+        self.pending = None
+        self.generation = 0
+
+        self.thread = QThread()
+        self.moveToThread(self.thread)
+        self.loadRequested.connect(self.load_pending)
+        self.thread.start()
+
+    def request_load(self, path):
+        with self.lock:
+            self.generation += 1
+            self.pending = (self.generation, path)
+            generation = self.generation
+        self.loadRequested.emit()
+        return generation
+
+    def is_cancelled(self, generation):
+        return generation != self.generation
+
+    def load_pending(self):
+        with self.lock:
+            job = self.pending
+            self.pending = None
+        if job is None:
+            return
+        generation, path = job
+        try:
+            if os.path.getsize(path) >= PREVIEW_MIN_BYTES:
+                preview = read_preview(path)
+                if preview is not None and not self.is_cancelled(generation):
+                    self.previewLoaded.emit(generation, path, preview)
+            # a newer request replaced this one while the preview decoded
+            if self.is_cancelled(generation):
+                return
+            img = read_image(path)
+        except Exception as error:
+            if not self.is_cancelled(generation):
+                self.loadFailed.emit(generation, path, str(error))
+            return
+        if not self.is_cancelled(generation):
+            self.imageLoaded.emit(generation, path, img)
+
+    def stop(self):
+        with self.lock:
+            self.generation += 1
+            self.pending = None
+        self.thread.quit()
+        self.thread.wait()
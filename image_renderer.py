@@ -1,9 +1,19 @@
-from PyQt5.QtWidgets import QApplication, QLabel, QSizePolicy, QScrollArea, QAction, QMenu
+from PyQt5.QtWidgets import QApplication, QScrollArea, QAction, QMenu, QMessageBox
 from PyQt5.QtGui import QCursor
-from PyQt5.QtCore import Qt, QPoint
+from PyQt5.QtCore import Qt, QPoint, QTimer
 import numpy as np
 
-from opencv_processing import convert_cv_qt
+from opencv_processing import convert_cv_qimage
+from image_canvas import ImageCanvas
+from filter_cache import FilterCache
+from render_worker import RenderWorker
+from image_loader import ImageLoader, PREVIEW_FACTOR
+
+
+# a proxy is only worth it when it has a lot fewer pixels than the image
+MAX_PROXY_SCALE = 0.75
+# a slider held still this long gets the full resolution render without waiting for the release
+REFINE_DELAY_MS = 300
 
 
 class ImageRenderer(QScrollArea):
@@ -13,21 +23,47 @@ class ImageRenderer(QScrollArea):
         self.main_controller = main_controller
         main_controller.image_renderer = self
 
-        self.image_area = QLabel()
-        self.image_area.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored);
-        self.image_area.setScaledContents(False)
+        self.image_area = ImageCanvas()
 
         self.setWidget(self.image_area)
 
+        # holds the output of each filter so edits only rerun the filters after the change
+        self.filter_cache = FilterCache()
+        # filters are applied off the GUI thread, only the newest result is painted
+        self.render_worker = RenderWorker(self.filter_cache)
+        self.render_worker.renderFinished.connect(self.render_finished)
+        self.render_worker.stageTimings.connect(self.show_stage_timings)
+        self.painted_generation = 0
+        self.refine_timer = QTimer(self)
+        self.refine_timer.setSingleShot(True)
+        self.refine_timer.setInterval(REFINE_DELAY_MS)
+        self.refine_timer.timeout.connect(lambda: self.apply_filters(self.main_controller.current_filters))
+        # QImage sharing filtered_image's buffer, converted once per filtered_image
+        self.display_image = None
+        self.display_source = None
+        # files are decoded off the GUI thread, opening another file drops the pending one
+        self.image_loader = ImageLoader()
+        self.image_loader.previewLoaded.connect(self.preview_loaded)
+        self.image_loader.imageLoaded.connect(self.image_loaded)
+        self.image_loader.loadFailed.connect(self.load_failed)
+        # preview of the file being loaded while it is on screen, edits are rendered on it
+        self.preview = None
+        self.preview_generation = 0
+        self.loading = False
+        # generation of the render in filtered_image, and (generation, callback) of the saves
+        # waiting for filtered_image to catch up with the filters and file they were made with
+        self.rendered_generation = 0
+        self.waiting_for_render = []
+        # the workers live on their own threads, stopped from here so they aren't waited on from themselves
+        QApplication.instance().aboutToQuit.connect(self.stop_workers)
+
         # startup gradient image displayed
-        self.main_controller.base_image = np.zeros((1080, 1920, 3), np.uint8)
-        self.main_controller.base_image[:] = [[int(i/1920 * 255)] * 3 for i in range(0, 1920)]
+        gradient_row = np.repeat(np.uint8(np.arange(1920) / 1920 * 255), 3).reshape(1, 1920, 3)
+        self.main_controller.base_image = np.repeat(gradient_row, 1080, axis=0)
         self.main_controller.filtered_image = self.main_controller.base_image
 
-        self.image_area.setPixmap(convert_cv_qt(self.main_controller.filtered_image))
-
         self.scale_factor = 1
-        self.image_area.resize(self.main_controller.base_image.shape[1], self.main_controller.base_image.shape[0])
+        self.image_area.set_image(self.main_controller.filtered_image)
 
         self.mouse_pos = QPoint(0, 0)
         # need both scroll area and image label tracking for panning
@@ -43,29 +79,143 @@ class ImageRenderer(QScrollArea):
         context_menu.popup(QCursor.pos())
 
 
-    def load_image(self, img):
+    def stop_workers(self):
+        self.render_worker.stop()
+        self.image_loader.stop()
+        self.image_area.pyramid.stop()
+
+
+    def load_image(self, img, generation=None):
         self.main_controller.base_image = img
         self.main_controller.filtered_image = self.main_controller.base_image
+        # unfiltered until the render requested for the new image, saves wait for that one
+        self.rendered_generation = -1
+        if self.preview is not None and self.preview_generation == generation:
+            # the filtered preview stays on screen until the full resolution render replaces it,
+            # renders still in flight are of the preview and can be painted
+            self.preview = None
+            return
+        self.preview = None
+        # renders of the previous image still in flight are stale
+        self.painted_generation = self.render_worker.generation
         self.scale_factor = 1
-        self.image_area.resize(self.main_controller.filtered_image.shape[1], self.main_controller.filtered_image.shape[0])
-        self.image_area.setPixmap(convert_cv_qt(self.main_controller.filtered_image))
+        self.image_area.set_scale(self.scale_factor)
+        self.image_area.set_image(self.main_controller.filtered_image)
 
-    def apply_filters(self, filters_list):
-        self.main_controller.filtered_image = self.main_controller.base_image
-        for filter in filters_list:
-            self.main_controller.filtered_image = filter.apply(self.main_controller.filtered_image)
-        rows, cols, channels = self.main_controller.filtered_image.shape
-        self.image_area.setPixmap(convert_cv_qt(self.main_controller.filtered_image).scaled(cols*self.scale_factor, rows*self.scale_factor, Qt.IgnoreAspectRatio, Qt.FastTransformation))
+    def load_file(self, path):
+        self.loading = True
+        self.image_loader.request_load(path)
+
+    def preview_loaded(self, generation, path, preview):
+        if generation != self.image_loader.generation:
+            return
+        self.preview = preview
+        self.preview_generation = generation
+        # shown at the full image's size until the full resolution decode replaces it
+        self.painted_generation = self.render_worker.generation
+        self.scale_factor = 1
+        self.image_area.set_scale(self.scale_factor)
+        self.image_area.set_image(preview, (preview.shape[1] * PREVIEW_FACTOR, preview.shape[0] * PREVIEW_FACTOR))
+        self.apply_filters(self.main_controller.current_filters)
+
+    def image_loaded(self, generation, path, img):
+        if generation != self.image_loader.generation:
+            return
+        self.loading = False
+        self.load_image(img, generation)
+        self.main_controller.file_loaded(path)
+
+    def load_failed(self, generation, path, error):
+        # a newer request replaced this one, its failure doesn't matter anymore
+        if generation != self.image_loader.generation:
+            return
+        self.loading = False
+        if self.preview is not None:
+            # back to the image that is still loaded
+            self.preview = None
+            self.painted_generation = self.render_worker.generation
+            self.image_area.set_image(self.main_controller.filtered_image)
+            # edits made on the preview haven't been rendered on the image yet
+            self.apply_filters(self.main_controller.current_filters)
+        error_message = QMessageBox()
+        error_message.setWindowTitle("Error")
+        error_message.setText("Error: file " + path + " failed to open\n" + error)
+        error_message.exec()
+        self.run_waiting_for_render()
+
+    def apply_filters(self, filters_list, interactive=False, refresh=False):
+        if self.preview is not None:
+            # base_image is still the previous file, the edit is shown on the preview until it loads
+            self.refine_timer.stop()
+            self.render_worker.request_render(self.preview, filters_list,
+                self.main_controller.fuse_linear_filters, 1 / PREVIEW_FACTOR, prescaled=True)
+            return
+        # interactive edits render a proxy the size of the viewport first
+        proxy_scale = self.get_proxy_scale() if interactive else None
+        if proxy_scale is not None:
+            self.refine_timer.start()
+        else:
+            self.refine_timer.stop()
+        self.render_worker.request_render(self.main_controller.base_image, filters_list, self.main_controller.fuse_linear_filters, proxy_scale, refresh)
+
+    def get_proxy_scale(self):
+        # the image scaled to fill the viewport, or to the zoom when zoomed out further, None when
+        # that is close to full resolution, zoomed in closer the drag preview is softer than the
+        # screen until the full resolution render replaces it, but keeps the cost of a viewport
+        rows, cols = self.main_controller.base_image.shape[:2]
+        viewport = self.viewport().size()
+        proxy_scale = min(self.scale_factor, max(viewport.width() / cols, viewport.height() / rows))
+        if proxy_scale > MAX_PROXY_SCALE:
+            return None
+        return proxy_scale
+
+    def render_finished(self, generation, img, proxy, key):
+        # results can arrive out of order, never replace a newer image with an older one
+        if generation <= self.painted_generation:
+            return
+        self.painted_generation = generation
+        if proxy:
+            # only displayed, filtered_image stays the last full resolution result
+            self.image_area.set_image(img, self.image_area.image_size, key)
+            self.update_histogram(img, True)
+            return
+        self.main_controller.filtered_image = img
+        self.rendered_generation = generation
+        self.image_area.set_image(self.main_controller.filtered_image, key=key)
+        self.update_histogram(img, False)
+        self.run_waiting_for_render()
+
+    def when_rendered(self, callback):
+        # runs callback once filtered_image is the full resolution render of the file and filters
+        # as they are now, right away unless a load or a newer render is still pending, a render
+        # replaced by an even newer one is waited for too
+        self.waiting_for_render.append((self.render_worker.generation, callback))
+        self.run_waiting_for_render()
+
+    def run_waiting_for_render(self):
+        if self.loading:
+            return
+        waiting = self.waiting_for_render
+        self.waiting_for_render = [(generation, callback) for generation, callback in waiting if generation > self.rendered_generation]
+        for generation, callback in waiting:
+            if generation <= self.rendered_generation:
+                callback()
+
+    def update_histogram(self, img, proxy):
+        if self.main_controller.histogram_panel is not None:
+            self.main_controller.histogram_panel.update_images(self.main_controller.base_image, img, proxy)
+
+    def show_stage_timings(self, generation, timings):
+        # timings of an outdated render would be shown against the wrong filters
+        if generation == self.render_worker.generation:
+            self.main_controller.filter_editor.show_stage_timings(timings)
 
     def scale_image(self, factor):
-        # scales image, then resizes image label to get correct scrollbars
-        # uses a ton of memory to hold scaled image, rework later
+        # resizes the canvas to get correct scrollbars, only visible tiles are scaled when painted
         self.scale_factor *= factor
-        rows, cols, channels = self.main_controller.filtered_image.shape
-        self.image_area.setPixmap(convert_cv_qt(self.main_controller.filtered_image).scaled(cols*self.scale_factor, rows*self.scale_factor, Qt.IgnoreAspectRatio, Qt.FastTransformation))
-        self.image_area.resize(cols*self.scale_factor, rows*self.scale_factor)
-        self.horizontalScrollBar().setValue((self.horizontalScrollBar().value()+self.mouse_pos.x()) * factor - self.mouse_pos.x())
-        self.verticalScrollBar().setValue((self.verticalScrollBar().value()+self.mouse_pos.y()) * factor - self.mouse_pos.y())
+        self.image_area.set_scale(self.scale_factor)
+        self.horizontalScrollBar().setValue(int((self.horizontalScrollBar().value()+self.mouse_pos.x()) * factor - self.mouse_pos.x()))
+        self.verticalScrollBar().setValue(int((self.verticalScrollBar().value()+self.mouse_pos.y()) * factor - self.mouse_pos.y()))
 
 
     def mouseMoveEvent(self, mouse_event):
@@ -101,5 +251,12 @@ class ImageRenderer(QScrollArea):
             return super().wheelEvent(wheel_event)
 
 
+    def get_display_image(self):
+        if self.display_source is not self.main_controller.filtered_image:
+            self.display_source = self.main_controller.filtered_image
+            self.display_image = convert_cv_qimage(self.display_source)
+        return self.display_image
+
     def copy_to_clipboard(self):
-        QApplication.clipboard().setPixmap(convert_cv_qt(self.main_controller.filtered_image))
\ No newline at end of file
+        # the clipboard outlives filtered_image, give it its own copy of the pixels
+        QApplication.clipboard().setImage(self.get_display_image().copy())
\ No newline at end of file
@@ -0,0 +1,101 @@
+import math
+import threading
+import cv2
+import numpy as np
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+
+# while dragging, images are subsampled to about this many pixels
+MAX_DRAG_PIXELS = 512 * 512
+
+
+class ChannelStats():
+
+    def __init__(self, hist):
+        # 256 bin histogram of one channel, everything else is derived from it
+        self.hist = hist
+        count = hist.sum()
+        levels = np.nonzero(hist)[0]
+        self.min = int(levels[0]) if len(levels) > 0 else 0
+        self.max = int(levels[-1]) if len(levels) > 0 else 0
+        self.mean = float(np.dot(hist, np.arange(256)) / count) if count > 0 else 0
+        # fraction of pixels at 0 and at 255
+        self.clipped_low = float(hist[0] / count) if count > 0 else 0
+        self.clipped_high = float(hist[255] / count) if count > 0 else 0
+
+
+def get_subsample_step(img, max_pixels):
+    return max(1, math.ceil(math.sqrt(img.shape[0] * img.shape[1] / max_pixels)))
+
+
+def compute_stats(img, step=1):
+    # ChannelStats per channel, every step-th pixel of every step-th row
+    if step > 1:
+        img = img[::step, ::step]
+    if img.dtype != np.uint8:
+        img = cv2.convertScaleAbs(img)
+    channels = 1 if img.ndim == 2 else img.shape[2]
+    return [ChannelStats(cv2.calcHist([img], [channel], None, [256], [0, 256]).ravel()) for channel in range(channels)]
+
+
+class StatsWorker(QObject):
+    # histograms of the base and filtered images on a low priority thread, so they never slow
+    # down rendering, only the newest request is computed
+
+    # generation, ChannelStats of the base image, ChannelStats of the filtered image
+    statsFinished = pyqtSignal(int, object, object)
+    statsRequested = pyqtSignal()
+
+    def __init__(self):
+        super(QObject, self).__init__()
+        self.lock = threading.Lock()
+        self.pending = None
+        self.generation = 0
+        # the base image rarely changes, its full resolution stats are kept
+        self.base_source = None
+        self.base_stats = None
+
+        self.thread = QThread()
+        self.moveToThread(self.thread)
+        self.statsRequested.connect(self.compute_pending)
+        self.thread.start(QThread.LowPriority)
+
+    def request_stats(self, base_image, filtered_image, subsample=False):
+        # subsample is for renders while dragging, they are replaced quickly
+        with self.lock:
+            self.generation += 1
+            self.pending = (self.generation, base_image, filtered_image, subsample)
+            generation = self.generation
+        self.statsRequested.emit()
+        return generation
+
+    def is_cancelled(self, generation):
+        return generation != self.generation
+
+    def compute_pending(self):
+        with self.lock:
+            job = self.pending
+            self.pending = None
+        if job is None:
+            return
+        generation, base_image, filtered_image, subsample = job
+        if base_image is self.base_source:
+            base_stats = self.base_stats
+        elif subsample:
+            base_stats = compute_stats(base_image, get_subsample_step(base_image, MAX_DRAG_PIXELS))
+        else:
+            base_stats = self.base_stats = compute_stats(base_image)
+            self.base_source = base_image
+        if self.is_cancelled(generation):
+            return
+        step = get_subsample_step(filtered_image, MAX_DRAG_PIXELS) if subsample else 1
+        filtered_stats = compute_stats(filtered_image, step)
+        if not self.is_cancelled(generation):
+            self.statsFinished.emit(generation, base_stats, filtered_stats)
+
+    def stop(self):
+        with self.lock:
+            self.generation += 1
+            self.pending = None
+        self.thread.quit()
+        self.thread.wait()
@@ -1,4 +1,9 @@
-import cv2
+import json
+
+from filter_io import save_filters, load_filters
+from profiler import profiler
+from disk_cache import DiskCache
+from export_queue import encoder_presets, get_export_path
 
 
 class MainController():
@@ -9,6 +14,8 @@ class MainController():
         self.image_path_label = None
         self.image_renderer = None
         self.filter_editor = None
+        self.histogram_panel = None
+        self.export_queue = None
 
         # data
         self.file_path = ""
@@ -18,22 +25,53 @@ class MainController():
         self.filtered_image = self.base_image
 
         self.current_filters = []
+        # convolve adjacent linear filters into one kernel, slightly changes the result
+        self.fuse_linear_filters = False
+        # keep stage outputs on disk between sessions, shared with batch runs
+        self.use_disk_cache = False
 
 
     def load_file(self):
-        self.image_renderer.load_image(cv2.imread(self.file_path))
-        self.image_path_label.setText("File: " + self.file_path)
+        # decoded in the background, file_loaded is called once the full image is shown
+        self.image_renderer.load_file(self.file_path)
+
+
+    def file_loaded(self, file_path):
+        self.image_path_label.setText("File: " + file_path)
         self.image_renderer.apply_filters(self.current_filters)
 
 
     def write_file(self, save_path):
-        extension = save_path.split('.')[-1]
-        if extension == 'pgm':
-            cv2.imwrite(save_path, cv2.cvtColor(self.filtered_image, cv2.COLOR_RGB2GRAY))
-        elif extension == 'png':
-            cv2.imwrite(save_path, self.filtered_image, [cv2.IMWRITE_PNG_COMPRESSION, 9])
-        else:
-            cv2.imwrite(save_path, self.filtered_image)
+        # written in the background once the pending load and render are done, filtered_image
+        # is replaced by the next render, never modified
+        self.image_renderer.when_rendered(lambda: self.export_queue.add(save_path, self.filtered_image))
+
+
+    def export_image(self, base_path, presets, scales):
+        self.image_renderer.when_rendered(lambda: self.export_rendered_image(base_path, presets, scales))
+
+
+    def export_rendered_image(self, base_path, presets, scales):
+        # every format at every size, encoded in parallel
+        extensions = [encoder_presets[preset][0] for preset in presets]
+        for preset in presets:
+            tagged = extensions.count(encoder_presets[preset][0]) > 1
+            for scale in scales:
+                self.export_queue.add(get_export_path(base_path, preset, scale, tagged), self.filtered_image, encoder_presets[preset][2], scale)
+
+
+    def save_filter_chain(self, save_path):
+        save_filters(self.current_filters, save_path)
+
+
+    def load_filter_chain(self, load_path):
+        self.current_filters = load_filters(load_path)
+        self.filter_editor.filters_list.clear()
+        for filter in self.current_filters:
+            self.filter_editor.filters_list.addItem(filter.name)
+        self.filter_editor.prev_index = -1
+        self.filter_editor.config_panel.remove_all_configs()
+        self.image_renderer.apply_filters(self.current_filters)
 
 
     def add_filter(self, filter_class):
@@ -79,7 +117,7 @@ class MainController():
             self.image_renderer.apply_filters(self.current_filters)
 
 
-    def update_argument_value(self, filter_index, param, arg):
+    def update_argument_value(self, filter_index, param, arg, dragging=False):
         filter = self.current_filters[filter_index]
         if filter.params[param] == "BoundedInteger":
             getattr(filter, param).value = int(arg)
@@ -89,4 +127,41 @@ class MainController():
             getattr(filter, param).value = arg
         elif filter.params[param] == "Boolean":
             setattr(filter, param, (True if int(arg) == 2 else False))
-        self.image_renderer.apply_filters(self.current_filters)
\ No newline at end of file
+        elif filter.params[param] == "Matrix":
+            getattr(filter, param).value = json.loads(arg)
+        # a low resolution preview keeps up with a dragged slider
+        self.image_renderer.apply_filters(self.current_filters, dragging)
+
+
+    def set_fuse_linear_filters(self, fuse_linear):
+        self.fuse_linear_filters = fuse_linear
+        self.image_renderer.apply_filters(self.current_filters)
+
+
+    def describe_execution_plan(self):
+        from pipeline import build_plan, describe_plan, optimize_chain
+        return describe_plan(build_plan(self.current_filters, self.fuse_linear_filters), optimize_chain(self.current_filters)[1])
+
+
+    def set_profiling(self, profiling):
+        profiler.set_enabled(profiling)
+        if profiling:
+            # rerun every stage so all of them get a time
+            self.image_renderer.apply_filters(self.current_filters, refresh=True)
+        else:
+            self.filter_editor.clear_stage_timings()
+
+
+    def export_trace(self, save_path):
+        profiler.export_trace(save_path)
+
+
+    def clear_trace(self):
+        profiler.clear()
+
+
+    def set_use_disk_cache(self, use_disk_cache):
+        self.use_disk_cache = use_disk_cache
+        # picked up by the render worker at its next render
+        self.image_renderer.render_worker.disk_cache = DiskCache() if use_disk_cache else None
+        self.image_renderer.apply_filters(self.current_filters)
@@ -1,19 +1,26 @@
-from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QHBoxLayout, QVBoxLayout, QWidget, QMenuBar
+from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QHBoxLayout, QVBoxLayout, QWidget, QMenuBar, QProgressBar, QMessageBox
 
 from image_renderer import ImageRenderer
 from file_menu import FileMenu
+from pipeline_menu import PipelineMenu
+from view_menu import ViewMenu
 from filter_editor import FilterEditor
+from histogram_panel import HistogramPanel
+from export_queue import ExportQueue
 
 
-app = QApplication([])
-win = QMainWindow()
-
 class MainWindow(QMainWindow):
 
     def __init__(self, controller, *args, **kwargs):
         super(MainWindow, self).__init__(*args, **kwargs)
         self.main_controller = controller
         self.setWindowTitle("Simple Image Processor")
+
+        self.export_queue = ExportQueue()
+        self.main_controller.export_queue = self.export_queue
+        self.export_queue.progressChanged.connect(self.show_export_progress)
+        self.export_queue.exportFailed.connect(self.show_export_error)
+        QApplication.instance().aboutToQuit.connect(self.export_queue.shutdown)
         
         self.central_widget = QWidget(self)
         self.setCentralWidget(self.central_widget)
@@ -24,6 +31,10 @@ class MainWindow(QMainWindow):
         self.menu_bar = QMenuBar(self)
         self.file_menu = FileMenu(self, self.main_controller)
         self.menu_bar.addMenu(self.file_menu)
+        self.pipeline_menu = PipelineMenu(self, self.main_controller)
+        self.menu_bar.addMenu(self.pipeline_menu)
+        self.view_menu = ViewMenu(self, self.main_controller)
+        self.menu_bar.addMenu(self.view_menu)
         self.setMenuBar(self.menu_bar)
 
         self.image_path_label = QLabel("File: ")
@@ -39,6 +50,37 @@ class MainWindow(QMainWindow):
 
         self.outer_layout.addLayout(self.image_layout, 4)
 
+        self.histogram_panel = HistogramPanel(self.main_controller)
+        self.histogram_panel.setMaximumWidth(320)
+        self.histogram_panel.hide()
+        self.outer_layout.addWidget(self.histogram_panel, 1)
+        QApplication.instance().aboutToQuit.connect(self.histogram_panel.stop_worker)
+
+        self.export_label = QLabel()
+        self.export_progress = QProgressBar()
+        self.export_progress.setMaximumWidth(200)
+        self.statusBar().addPermanentWidget(self.export_label)
+        self.statusBar().addPermanentWidget(self.export_progress)
+        self.export_label.hide()
+        self.export_progress.hide()
+
+    def show_export_progress(self, finished, queued):
+        if finished == queued:
+            self.export_label.hide()
+            self.export_progress.hide()
+            return
+        self.export_label.setText("Exporting {}/{}".format(finished + 1, queued))
+        self.export_progress.setMaximum(queued)
+        self.export_progress.setValue(finished)
+        self.export_label.show()
+        self.export_progress.show()
+
+    def show_export_error(self, save_path, message):
+        error_message = QMessageBox()
+        error_message.setWindowTitle("Error")
+        error_message.setText("Error: file " + save_path + " failed to save")
+        error_message.exec()
+
     def closeEvent(self, event):
         self.filter_editor = 0
         self.file_menu.open_quit_dialog()
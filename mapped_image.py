@@ -0,0 +1,361 @@
+import os
+import struct
+import cv2
+import numpy as np
+
+from image_io import read_image, write_image
+from pipeline import apply_plan
+from tiling import get_strips
+
+
+# images read and written a band of rows at a time, so only the rows in use are in memory
+
+
+def to_cv_layout(img):
+    # same layout as read_image gives, gray stays 1 channel and RGB becomes BGR
+    if img.ndim == 2 or img.shape[2] == 1:
+        return np.array(img.reshape(img.shape[:2]))
+    if img.shape[2] == 4:
+        return cv2.cvtColor(img, cv2.COLOR_RGBA2BGR)
+    return cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+
+
+class RawImage():
+    # uint8 pixels stored row after row, mapped with numpy.memmap so reading rows
+    # only pages in those rows
+
+    def __init__(self, path, rows, cols, channels=3, offset=0, rgb=False):
+        self.path = path
+        self.shape = (rows, cols) if channels == 1 else (rows, cols, 3)
+        self.rgb = rgb
+        self.pixels = np.memmap(path, np.uint8, 'r', offset, (rows, cols, channels))
+
+    def read_rows(self, start, end):
+        band = self.pixels[start:end]
+        if self.rgb or band.shape[2] != 3:
+            return to_cv_layout(band)
+        return np.array(band)
+
+    def read_preview(self, step):
+        # every step-th pixel of every step-th row, only those rows are paged in
+        band = self.pixels[::step, ::step]
+        if self.rgb or band.shape[2] != 3:
+            return to_cv_layout(band)
+        return np.array(band)
+
+
+class PNMImage(RawImage):
+    # binary PGM (P5) and PPM (P6) with 8 bit samples
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            header = file.read(1024)
+        magic, cols, rows, max_value, offset = parse_pnm_header(header)
+        if magic not in (b'P5', b'P6') or max_value > 255:
+            raise ValueError("unsupported PNM file " + path)
+        super().__init__(path, rows, cols, 1 if magic == b'P5' else 3, offset, True)
+
+
+def parse_pnm_header(header):
+    # magic, width, height and maxval separated by whitespace and comments, then a single
+    # whitespace byte before the pixels
+    fields = []
+    position = 0
+    while len(fields) < 4:
+        while header[position:position+1].isspace():
+            position += 1
+        if header[position:position+1] == b'#':
+            position = header.index(b'\n', position)
+            continue
+        end = position
+        while end < len(header) and not header[end:end+1].isspace():
+            end += 1
+        if end == len(header):
+            raise ValueError("truncated PNM header")
+        fields.append(header[position:end])
+        position = end
+    return fields[0], int(fields[1]), int(fields[2]), int(fields[3]), position + 1
+
+
+# TIFF tags used by the reader and writer
+TIFF_IMAGE_WIDTH = 256
+TIFF_IMAGE_LENGTH = 257
+TIFF_BITS_PER_SAMPLE = 258
+TIFF_COMPRESSION = 259
+TIFF_PHOTOMETRIC = 262
+TIFF_STRIP_OFFSETS = 273
+TIFF_SAMPLES_PER_PIXEL = 277
+TIFF_ROWS_PER_STRIP = 278
+TIFF_STRIP_BYTE_COUNTS = 279
+TIFF_PLANAR_CONFIG = 284
+
+# sizes of the TIFF field types BYTE, ASCII, SHORT, LONG and RATIONAL
+TIFF_TYPE_FORMATS = {1: 'B', 2: 'c', 3: 'H', 4: 'I', 5: 'II'}
+
+
+class TIFFImage():
+    # uncompressed 8 bit strip TIFF, only the strips overlapping the requested rows are read
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            tags = read_tiff_tags(file)
+        cols = tags[TIFF_IMAGE_WIDTH][0]
+        rows = tags[TIFF_IMAGE_LENGTH][0]
+        self.channels = tags.get(TIFF_SAMPLES_PER_PIXEL, [1])[0]
+        if (tags.get(TIFF_COMPRESSION, [1])[0] != 1 or any(bits != 8 for bits in tags.get(TIFF_BITS_PER_SAMPLE, [1]))
+                or tags.get(TIFF_PLANAR_CONFIG, [1])[0] != 1 or TIFF_STRIP_OFFSETS not in tags):
+            raise ValueError("unsupported TIFF file " + path)
+        # only black is zero and RGB are plain samples
+        if tags.get(TIFF_PHOTOMETRIC, [1])[0] not in (1, 2):
+            raise ValueError("unsupported TIFF file " + path)
+        # gray, RGB or RGBA, to_cv_layout has no conversion for the others
+        if self.channels not in (1, 3, 4):
+            raise ValueError("unsupported TIFF file " + path)
+        self.shape = (rows, cols) if self.channels == 1 else (rows, cols, 3)
+        self.rows_per_strip = min(rows, tags.get(TIFF_ROWS_PER_STRIP, [rows])[0])
+        self.strip_offsets = tags[TIFF_STRIP_OFFSETS]
+        if self.rows_per_strip < 1:
+            raise ValueError("unsupported TIFF file " + path)
+        # every strip has to be there, a truncated file would only fail once its rows are read
+        strip_count = -(-rows // self.rows_per_strip)
+        last_rows = rows - (strip_count - 1) * self.rows_per_strip
+        if len(self.strip_offsets) < strip_count or self.strip_offsets[strip_count - 1] + last_rows * cols * self.channels > os.path.getsize(path):
+            raise ValueError("unsupported TIFF file " + path)
+
+    def read_rows(self, start, end):
+        rows, cols = self.shape[:2]
+        row_bytes = cols * self.channels
+        first_strip = start // self.rows_per_strip
+        last_strip = (end - 1) // self.rows_per_strip
+        band = np.empty(((last_strip - first_strip + 1) * self.rows_per_strip, cols, self.channels), np.uint8)
+        band_rows = 0
+        with open(self.path, 'rb') as file:
+            for strip in range(first_strip, last_strip + 1):
+                strip_rows = min(self.rows_per_strip, rows - strip * self.rows_per_strip)
+                file.seek(self.strip_offsets[strip])
+                data = file.read(strip_rows * row_bytes)
+                band[band_rows:band_rows+strip_rows] = np.frombuffer(data, np.uint8).reshape(strip_rows, cols, self.channels)
+                band_rows += strip_rows
+        offset = start - first_strip * self.rows_per_strip
+        return to_cv_layout(band[offset:offset + end - start])
+
+
+def read_tiff_tags(file):
+    # {tag: [values]} of the first image directory
+    byte_order = file.read(2)
+    if byte_order not in (b'II', b'MM'):
+        raise ValueError("not a TIFF file")
+    endian = '<' if byte_order == b'II' else '>'
+    magic, ifd_offset = struct.unpack(endian + 'HI', file.read(6))
+    if magic != 42:
+        raise ValueError("not a classic TIFF file")
+    file.seek(ifd_offset)
+    entry_count = struct.unpack(endian + 'H', file.read(2))[0]
+    entries = [struct.unpack(endian + 'HHI4s', file.read(12)) for i in range(entry_count)]
+    tags = {}
+    for tag, field_type, count, value in entries:
+        if field_type not in TIFF_TYPE_FORMATS:
+            continue
+        value_format = endian + TIFF_TYPE_FORMATS[field_type] * count
+        size = struct.calcsize(value_format)
+        if size > 4:
+            file.seek(struct.unpack(endian + 'I', value)[0])
+            value = file.read(size)
+        tags[tag] = list(struct.unpack(value_format, value[:size]))
+    return tags
+
+
+def open_mapped_image(path):
+    # reader for formats that can be read a band at a time, None for the others
+    extension = path.split('.')[-1].lower()
+    try:
+        if extension in ('pgm', 'ppm', 'pnm'):
+            return PNMImage(path)
+        if extension in ('tif', 'tiff'):
+            return TIFFImage(path)
+    except (ValueError, KeyError, IndexError, struct.error, OSError):
+        # truncated or unusual files are left to the normal decoder
+        return None
+    return None
+
+
+class ArrayImage():
+    # an image already in memory, for formats that can only be decoded whole
+
+    def __init__(self, img):
+        self.img = img
+        self.shape = img.shape
+
+    def read_rows(self, start, end):
+        return self.img[start:end]
+
+
+class PNMWriter():
+    # writes PGM or PPM through a memmap of the output file
+
+    def __init__(self, path, rows, cols, gray):
+        self.path = path
+        self.gray = gray
+        header = "{}\n{} {}\n255\n".format("P5" if gray else "P6", cols, rows).encode()
+        channels = 1 if gray else 3
+        with open(path, 'wb') as file:
+            file.write(header)
+            file.truncate(len(header) + rows * cols * channels)
+        self.pixels = np.memmap(path, np.uint8, 'r+', len(header), (rows, cols, channels))
+
+    def write_rows(self, start, img):
+        if self.gray:
+            self.pixels[start:start+img.shape[0], :, 0] = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        else:
+            self.pixels[start:start+img.shape[0]] = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB if img.ndim == 2 else cv2.COLOR_BGR2RGB)
+
+    def close(self):
+        self.pixels.flush()
+        del self.pixels
+
+
+class TIFFWriter():
+    # writes an uncompressed gray or RGB TIFF, one strip per band of rows written in order
+
+    def __init__(self, path, rows, cols):
+        self.path = path
+        self.shape = (rows, cols)
+        self.file = open(path, 'wb')
+        # image directory offset is filled in by close
+        self.file.write(b'II*\0\0\0\0\0')
+        self.strip_offsets = []
+        self.strip_byte_counts = []
+        self.rows_per_strip = None
+        # 1 or 3, set by the first band
+        self.channels = None
+        self.rows_written = 0
+
+    def write_rows(self, start, img):
+        if start != self.rows_written:
+            raise ValueError("TIFF rows have to be written in order")
+        # every strip but the last has the same number of rows
+        if self.rows_per_strip is None:
+            self.rows_per_strip = img.shape[0]
+            self.channels = 1 if img.ndim == 2 else 3
+        elif self.strip_byte_counts[-1] != self.rows_per_strip * self.shape[1] * self.channels:
+            raise ValueError("only the last TIFF strip can be shorter")
+        if self.channels == 1:
+            data = (img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)).tobytes()
+        else:
+            data = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB if img.ndim == 2 else cv2.COLOR_BGR2RGB).tobytes()
+        self.strip_offsets.append(self.file.tell())
+        self.strip_byte_counts.append(len(data))
+        self.file.write(data)
+        self.rows_written += img.shape[0]
+
+    def close(self):
+        rows, cols = self.shape
+        if len(self.strip_offsets) == 0:
+            self.file.close()
+            raise IOError("Error: file " + self.path + " has no rows written")
+        # arrays that don't fit in an entry go after the directory
+        ifd_offset = self.file.tell() + self.file.tell() % 2
+        entry_count = 10
+        extra_offset = ifd_offset + 2 + entry_count * 12 + 4
+        extra = b''
+
+        def entry(tag, field_type, values):
+            nonlocal extra
+            data = struct.pack('<' + TIFF_TYPE_FORMATS[field_type] * len(values), *values)
+            if len(data) <= 4:
+                return struct.pack('<HHI', tag, field_type, len(values)) + data.ljust(4, b'\0')
+            offset = extra_offset + len(extra)
+            extra += data
+            return struct.pack('<HHII', tag, field_type, len(values), offset)
+
+        entries = [
+            entry(TIFF_IMAGE_WIDTH, 4, [cols]),
+            entry(TIFF_IMAGE_LENGTH, 4, [rows]),
+            entry(TIFF_BITS_PER_SAMPLE, 3, [8] * self.channels),
+            entry(TIFF_COMPRESSION, 3, [1]),
+            entry(TIFF_PHOTOMETRIC, 3, [1 if self.channels == 1 else 2]),
+            entry(TIFF_STRIP_OFFSETS, 4, self.strip_offsets),
+            entry(TIFF_SAMPLES_PER_PIXEL, 3, [self.channels]),
+            entry(TIFF_ROWS_PER_STRIP, 4, [self.rows_per_strip or rows]),
+            entry(TIFF_STRIP_BYTE_COUNTS, 4, self.strip_byte_counts),
+            entry(TIFF_PLANAR_CONFIG, 3, [1]),
+        ]
+        if extra_offset + len(extra) >= 2 ** 32:
+            self.file.close()
+            raise IOError("Error: file " + self.path + " is too large for TIFF")
+        self.file.write(b'\0' * (ifd_offset - self.file.tell()))
+        self.file.write(struct.pack('<H', entry_count) + b''.join(entries) + struct.pack('<I', 0) + extra)
+        self.file.seek(4)
+        self.file.write(struct.pack('<I', ifd_offset))
+        self.file.close()
+
+
+class ArrayWriter():
+    # collects the rows in memory and encodes them with OpenCV, for the other formats
+
+    def __init__(self, path, rows, cols):
+        self.path = path
+        self.shape = (rows, cols)
+        self.img = None
+
+    def write_rows(self, start, img):
+        # gray or color depending on the chain's output
+        if self.img is None:
+            self.img = np.empty(self.shape + img.shape[2:], np.uint8)
+        self.img[start:start+img.shape[0]] = img
+
+    def close(self):
+        write_image(self.path, self.img)
+
+
+def create_mapped_writer(path, rows, cols):
+    extension = path.split('.')[-1].lower()
+    if extension in ('pgm', 'ppm', 'pnm'):
+        return PNMWriter(path, rows, cols, extension == 'pgm')
+    if extension in ('tif', 'tiff'):
+        return TIFFWriter(path, rows, cols)
+    return ArrayWriter(path, rows, cols)
+
+
+# rows of output produced per pass through the chain
+DEFAULT_STRIP_ROWS = 256
+
+
+def get_plan_halo(plan):
+    # rows of input needed around a strip for its output to be exact, None when a
+    # stage needs the whole image
+    halo = 0
+    for stage in plan:
+        footprint = stage.get_footprint()
+        if footprint is None:
+            return None
+        halo += footprint
+    return halo
+
+
+def stream_image(input_path, output_path, plan, strip_rows=DEFAULT_STRIP_ROWS):
+    # runs the plan on bands of rows read from and written to disk, memory use depends
+    # on the strip size and the number of stages, not on the image size
+    halo = get_plan_halo(plan)
+    if halo is None:
+        raise ValueError("the filter chain has filters that need the whole image")
+    source = open_mapped_image(input_path)
+    if source is None:
+        source = ArrayImage(read_image(input_path))
+    rows, cols = source.shape[:2]
+
+    # written next to the target then renamed, as with write_image_atomic
+    directory, file_name = os.path.split(output_path)
+    temp_path = os.path.join(directory, ".partial-" + str(os.getpid()) + "-" + file_name)
+    try:
+        writer = create_mapped_writer(temp_path, rows, cols)
+        for (start, end), (halo_start, halo_end) in get_strips(rows, halo, -(-rows // strip_rows), strip_rows):
+            result = apply_plan(source.read_rows(halo_start, halo_end), plan)
+            writer.write_rows(start, result[start-halo_start:end-halo_start])
+        writer.close()
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return rows * cols
@@ -0,0 +1,187 @@
+import cv2
+import numpy as np
+
+from artifact_cache import cached_artifact
+
+
+# lines at least this long run with van Herk/Gil-Werman, about 3 comparisons a pixel whatever
+# the length, shorter ones with OpenCV whose cost grows with it, measured on 1080p frames
+MIN_VHGW_SIZE = 200
+# exact ellipses with fewer pixels a row than this run as one OpenCV kernel, larger ones
+# as a line filter and a shifted extreme per row
+MIN_CHORD_PIXELS_PER_ROW = 16
+
+
+@cached_artifact
+def build_structuring_element(shape, width, height):
+    return cv2.getStructuringElement(shape, (width, height))
+
+
+@cached_artifact
+def get_element_chords(shape, width, height):
+    # (row, left, right) of the run of ones on each row of the element, columns relative
+    # to the anchor, ordered so every run contains the ones before it
+    element = build_structuring_element(shape, width, height)
+    chords = []
+    for row in range(height):
+        columns = np.flatnonzero(element[row])
+        if len(columns):
+            chords.append((row, int(columns[0]) - width // 2, int(columns[-1]) - width // 2))
+    return tuple(sorted(chords, key=lambda chord: chord[2] - chord[1]))
+
+
+@cached_artifact
+def get_octagon_radii(width, height, iterations):
+    # horizontal, vertical and diagonal line radii of the octagon with the ellipse's width
+    # and height, regular for a circle, iterating it is the same as multiplying the radii
+    radius_x = width // 2
+    radius_y = height // 2
+    diagonal = int(round(min(radius_x, radius_y) / (2 + np.sqrt(2))))
+    return ((radius_x - 2 * diagonal) * iterations, (radius_y - 2 * diagonal) * iterations, diagonal * iterations)
+
+
+def add_border(img, top, bottom, left, right, border_type, erode):
+    # constant borders get OpenCV's default morphology border value, which never wins
+    value = 255 if erode else 0
+    return cv2.copyMakeBorder(img, top, bottom, left, right, border_type & ~cv2.BORDER_ISOLATED, value=(value,) * 4)
+
+
+def vhgw_columns(img, size, anchor, erode, border_type):
+    # running min or max down the columns, each output is the extreme of the suffix of one
+    # block of size rows and the prefix of the next
+    op = np.minimum if erode else np.maximum
+    rows = img.shape[0]
+    if anchor >= rows - 1 and size - 1 - anchor >= rows - 1:
+        # every window holds the whole column and border values taken from it
+        return np.repeat(op.reduce(img, axis=0, keepdims=True), rows, axis=0)
+    # the rows padding it to whole blocks never reach the output
+    extra = -(rows + size - 1) % size
+    padded = add_border(img, anchor, size - 1 - anchor + extra, 0, 0, border_type, erode)
+    forward = padded.reshape((padded.shape[0] // size, size) + padded.shape[1:])
+    backward = forward.copy()
+    for index in range(1, size):
+        op(forward[:, index - 1], forward[:, index], out=forward[:, index])
+        op(backward[:, size - index], backward[:, size - index - 1], out=backward[:, size - index - 1])
+    forward = forward.reshape(padded.shape)
+    backward = backward.reshape(padded.shape)
+    return op(backward[:rows], forward[size - 1:size - 1 + rows])
+
+
+def line_extreme(img, size, anchor, axis, erode, border_type):
+    # erode or dilate by a line of size pixels along axis 0 (columns) or 1 (rows)
+    if size == 1:
+        return img
+    if size < MIN_VHGW_SIZE:
+        kernel = np.ones((size, 1) if axis == 0 else (1, size), np.uint8)
+        point = (0, anchor) if axis == 0 else (anchor, 0)
+        return (cv2.erode if erode else cv2.dilate)(img, kernel, anchor=point, borderType=border_type)
+    if axis == 0:
+        return vhgw_columns(img, size, anchor, erode, border_type)
+    # strided passes along the rows are slow, OpenCV transposes faster
+    return cv2.transpose(vhgw_columns(cv2.transpose(img), size, anchor, erode, border_type))
+
+
+def diagonal_extreme(img, radius, direction, erode, border_type):
+    # erode or dilate by the 2 radius + 1 pixels of a diagonal line, down right for a positive
+    # direction and down left otherwise, by doubling the window with two shifted copies
+    op = cv2.min if erode else cv2.max
+    result = add_border(img, radius, radius, radius, radius, border_type, erode)
+    size = 2 * radius + 1
+    window = 1
+    while window < size:
+        step = min(window, size - window)
+        rows, cols = result.shape[:2]
+        if direction > 0:
+            result = op(result[:rows - step, :cols - step], result[step:, step:])
+        else:
+            result = op(result[:rows - step, step:], result[step:, :cols - step])
+        window += step
+    return result
+
+
+def morph_rect(img, width, height, iterations, erode, border_type):
+    # iterating a rectangle is exactly one rectangle that many times as large, as in OpenCV
+    size_x = (width - 1) * iterations + 1
+    size_y = (height - 1) * iterations + 1
+    img = line_extreme(img, size_x, width // 2 * iterations, 1, erode, border_type)
+    return line_extreme(img, size_y, height // 2 * iterations, 0, erode, border_type)
+
+
+def morph_cross(img, width, height, iterations, erode, border_type):
+    # a cross iterated isn't a cross, so each iteration is its row and column lines
+    op = cv2.min if erode else cv2.max
+    for _ in range(iterations):
+        img = op(line_extreme(img, width, width // 2, 1, erode, border_type), line_extreme(img, height, height // 2, 0, erode, border_type))
+    return img
+
+
+def morph_chords(img, shape, width, height, iterations, erode, border_type):
+    # extreme over the element's rows of the image filtered by each row's run and shifted
+    # by its row, the runs are nested so each line filter grows the previous one
+    op = cv2.min if erode else cv2.max
+    rows = img.shape[0]
+    chords = get_element_chords(shape, width, height)
+    for _ in range(iterations):
+        line = add_border(img, height // 2, height - 1 - height // 2, 0, 0, border_type, erode)
+        line_left = line_right = 0
+        result = None
+        for row, left, right in chords:
+            if (left, right) != (line_left, line_right):
+                line = line_extreme(line, right - line_right + line_left - left + 1, line_left - left, 1, erode, border_type)
+                line_left, line_right = left, right
+            result = line[row:row + rows].copy() if result is None else op(result, line[row:row + rows], dst=result)
+        img = result
+    return img
+
+
+def morph_octagon(img, width, height, iterations, erode, border_type):
+    # ellipse approximated by an octagon, the sum of a horizontal, a vertical and two diagonal lines
+    radius_x, radius_y, radius_diagonal = get_octagon_radii(width, height, iterations)
+    img = line_extreme(img, 2 * radius_x + 1, radius_x, 1, erode, border_type)
+    img = line_extreme(img, 2 * radius_y + 1, radius_y, 0, erode, border_type)
+    if radius_diagonal:
+        img = diagonal_extreme(img, radius_diagonal, 1, erode, border_type)
+        img = diagonal_extreme(img, radius_diagonal, -1, erode, border_type)
+    return img
+
+
+def morph(img, shape, width, height, iterations, border_type, erode, approximate=False):
+    # cv2.erode or cv2.dilate of a uint8 image by getStructuringElement(shape, (width, height))
+    # with the default anchor and border value, approximate only changes ellipses
+    element = build_structuring_element(shape, width, height)
+    # OpenCV folds the iterations of every element that's all ones, crosses and ellipses
+    # 1 pixel wide or tall included, and only adds the border once for them
+    if element.all():
+        if max(width - 1, height - 1) * iterations + 1 >= MIN_VHGW_SIZE:
+            return morph_rect(img, width, height, iterations, erode, border_type)
+    elif shape == cv2.MORPH_CROSS and max(width, height) >= MIN_VHGW_SIZE:
+        return morph_cross(img, width, height, iterations, erode, border_type)
+    elif shape == cv2.MORPH_ELLIPSE and approximate:
+        return morph_octagon(img, width, height, iterations, erode, border_type)
+    elif shape == cv2.MORPH_ELLIPSE and np.count_nonzero(element) >= MIN_CHORD_PIXELS_PER_ROW * height:
+        return morph_chords(img, shape, width, height, iterations, erode, border_type)
+    return (cv2.erode if erode else cv2.dilate)(img, element, iterations=iterations, borderType=border_type)
+
+
+def erode(img, shape, width, height, iterations=1, border_type=cv2.BORDER_CONSTANT, approximate=False):
+    return morph(img, shape, width, height, iterations, border_type, True, approximate)
+
+
+def dilate(img, shape, width, height, iterations=1, border_type=cv2.BORDER_CONSTANT, approximate=False):
+    return morph(img, shape, width, height, iterations, border_type, False, approximate)
+
+
+def morphology_ex(img, operation, shape, width, height, iterations=1, border_type=cv2.BORDER_CONSTANT, approximate=False):
+    # cv2.morphologyEx built from the erosions and dilations above, the same way OpenCV does
+    args = (shape, width, height, iterations, border_type, approximate)
+    if operation == cv2.MORPH_OPEN:
+        return dilate(erode(img, *args), *args)
+    if operation == cv2.MORPH_CLOSE:
+        return erode(dilate(img, *args), *args)
+    if operation == cv2.MORPH_GRADIENT:
+        return cv2.subtract(dilate(img, *args), erode(img, *args))
+    if operation == cv2.MORPH_TOPHAT:
+        return cv2.subtract(img, dilate(erode(img, *args), *args))
+    if operation == cv2.MORPH_BLACKHAT:
+        return cv2.subtract(erode(dilate(img, *args), *args), img)
+    return cv2.morphologyEx(img, operation, build_structuring_element(shape, width, height), iterations=iterations, borderType=border_type)
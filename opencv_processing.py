@@ -1,10 +1,25 @@
-import cv2
+import numpy as np
+from PyQt5 import sip
 from PyQt5.QtGui import QPixmap, QImage
 
 
+# cv2 images are BGR(A) in memory, ARGB32 is stored as BGRA on little endian machines
+image_formats = {1: QImage.Format_Grayscale8, 3: QImage.Format_BGR888, 4: QImage.Format_ARGB32}
+
+
+def convert_cv_qimage(cv_img):
+    # Wrap an opencv image in a QImage without copying it, the QImage keeps a reference
+    # to the array so the buffer stays alive as long as the QImage does
+    height, width = cv_img.shape[:2]
+    channels = 1 if cv_img.ndim == 2 else cv_img.shape[2]
+    # QImage allows padded rows but the pixels of a row have to be packed
+    if cv_img.ndim == 3 and cv_img.strides[1:] != (channels, 1) or cv_img.ndim == 2 and cv_img.strides[1] != 1:
+        cv_img = np.ascontiguousarray(cv_img)
+    qimg = QImage(sip.voidptr(cv_img.ctypes.data), width, height, cv_img.strides[0], image_formats[channels])
+    qimg.cv_img = cv_img
+    return qimg
+
+
 def convert_cv_qt(cv_img):
-    # Convert from an opencv image to QPixmap
-    height, width, channels = cv_img.shape
-    bytes_per_line = channels * width
-    qimg = QImage(cv_img.data, width, height, bytes_per_line, QImage.Format_RGB888).rgbSwapped()
-    return QPixmap.fromImage(qimg)
\ No newline at end of file
+    # Convert from an opencv image to QPixmap, copies the pixels once
+    return QPixmap.fromImage(convert_cv_qimage(cv_img))
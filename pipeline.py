@@ -0,0 +1,267 @@
+from itertools import groupby
+import cv2
+import numpy as np
+
+from convolution import get_separable_kernels, filter_2d, is_strip_exact
+
+
+class FilterStage():
+    # runs a single filter as is
+
+    def __init__(self, filter):
+        self.filters = [filter]
+        self.name = filter.name
+
+    def get_key(self):
+        return (type(self).__name__,) + tuple(filter.get_key() for filter in self.filters)
+
+    def get_footprint(self):
+        return self.filters[0].get_footprint()
+
+    def apply(self, img):
+        return self.filters[0].apply(img)
+
+
+class LUTStage(FilterStage):
+    # runs consecutive point-wise filters as one cv2.LUT call
+
+    def __init__(self, filters):
+        self.filters = filters
+        self.name = " + ".join(filter.name for filter in filters) + " (LUT)"
+        self.lut = filters[0].get_lut()
+        for filter in filters[1:]:
+            self.lut = compose_luts(self.lut, filter.get_lut())
+
+    def get_footprint(self):
+        return 0
+
+    def apply(self, img):
+        # a per channel table needs a color image, as its filter would have converted to
+        if self.lut.ndim == 3 and img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        return cv2.LUT(img, self.lut)
+
+
+class WarpStage(FilterStage):
+    # runs consecutive warps as one resampling pass by composing their matrices, only when
+    # fusion is turned on since the result isn't the same as running them one by one
+
+    def __init__(self, filters):
+        self.filters = filters
+        self.name = " + ".join(filter.name for filter in filters) + " (warp)"
+
+    def get_footprint(self):
+        return None
+
+    def apply(self, img):
+        group = []
+        for filter in self.filters:
+            if len(group) > 0 and not can_fuse_warps(group[-1], filter):
+                img = apply_warps(img, group)
+                group = []
+            group.append(filter)
+        return apply_warps(img, group)
+
+
+class LinearStage(FilterStage):
+    # runs consecutive linear filters as one convolution in float32, quantizing once at the end
+
+    def __init__(self, filters):
+        self.filters = filters
+        self.name = " + ".join(filter.name for filter in filters) + " (linear)"
+        # filters with different border types can't share a convolution
+        self.groups = []
+        for border_type, group in groupby(filters, lambda filter: filter.get_linear_kernel()[3]):
+            group = list(group)
+            if len(group) == 1:
+                self.groups.append((group, None))
+                continue
+            kernel, anchor, delta, border_type = group[0].get_linear_kernel()
+            for filter in group[1:]:
+                kernel, anchor, delta = compose_linear_kernels((kernel, anchor, delta), filter.get_linear_kernel())
+            self.groups.append((group, (kernel, anchor, delta, border_type, get_separable_kernels(kernel))))
+
+    def get_footprint(self):
+        footprint = 0
+        for group, fused in self.groups:
+            if fused is None:
+                if group[0].get_footprint() is None:
+                    return None
+                footprint += group[0].get_footprint()
+            else:
+                kernel, (anchor_x, anchor_y) = fused[:2]
+                if fused[4] is None and not is_strip_exact(kernel):
+                    return None
+                footprint += max(anchor_x, kernel.shape[1] - 1 - anchor_x, anchor_y, kernel.shape[0] - 1 - anchor_y)
+        return footprint
+
+    def apply(self, img):
+        for group, fused in self.groups:
+            if fused is None:
+                img = group[0].apply(img)
+                continue
+            kernel, anchor, delta, border_type, separable_kernels = fused
+            if separable_kernels is not None:
+                result = cv2.sepFilter2D(img, cv2.CV_32F, separable_kernels[0], separable_kernels[1], anchor=anchor, delta=delta, borderType=border_type)
+                img = np.clip(np.rint(result), 0, 255).astype(np.uint8)
+            else:
+                # composed kernels grow with every filter, large ones may be faster through the DFT
+                img = filter_2d(img, kernel, anchor, delta, border_type)
+        return img
+
+    def describe(self):
+        lines = []
+        for group, fused in self.groups:
+            if fused is None:
+                lines.append(group[0].name + ": not fused")
+            else:
+                kernel = fused[0]
+                lines.append("{}: fused into one {}x{} {} kernel, {} of {} passes removed".format(
+                    " + ".join(filter.name for filter in group), kernel.shape[1], kernel.shape[0],
+                    "separable" if fused[4] is not None else "2D", len(group) - 1, len(group)))
+        return lines
+
+
+def compose_linear_kernels(first, second):
+    # filter2D correlates, so applying k1 then k2 is one correlation by the full
+    # convolution of k1 and k2 with the anchors added
+    kernel_1, anchor_1, delta_1 = first[:3]
+    kernel_2, anchor_2, delta_2 = second[:3]
+    rows_2, cols_2 = kernel_2.shape
+    # correlating with the flipped kernel convolves, the zero border gives the full size
+    padded = cv2.copyMakeBorder(np.float64(kernel_1), rows_2 - 1, rows_2 - 1, cols_2 - 1, cols_2 - 1, cv2.BORDER_CONSTANT, value=0)
+    kernel = cv2.filter2D(padded, cv2.CV_64F, np.float64(kernel_2[::-1, ::-1]), anchor=(0, 0), borderType=cv2.BORDER_CONSTANT)
+    kernel = kernel[:padded.shape[0] - rows_2 + 1, :padded.shape[1] - cols_2 + 1]
+    anchor = (anchor_1[0] + anchor_2[0], anchor_1[1] + anchor_2[1])
+    return kernel, anchor, delta_1 * kernel_2.sum() + delta_2
+
+
+def can_fuse_warps(first, second):
+    # pixels outside the image are black with BORDER_CONSTANT, so they stay black through the
+    # composed warp, the other border modes depend on the intermediate image, unlike running the
+    # warps one after another the parts the first one moves out of the image aren't lost, e.g.
+    # rotating by 45 and then -45 degrees gives the image back without black corners
+    return first.get_warp_flags() == second.get_warp_flags() and first.get_warp_flags()[1] == cv2.BORDER_CONSTANT
+
+
+def get_lossless_warps(rows, cols):
+    # matrices that move whole pixels, with the exact operation doing the same
+    warps = [
+        (np.eye(3), lambda img: img),
+        (np.float64([[-1, 0, cols-1], [0, 1, 0], [0, 0, 1]]), lambda img: cv2.flip(img, 1)),
+        (np.float64([[1, 0, 0], [0, -1, rows-1], [0, 0, 1]]), lambda img: cv2.flip(img, 0)),
+        (np.float64([[-1, 0, cols-1], [0, -1, rows-1], [0, 0, 1]]), lambda img: cv2.flip(img, -1)),
+    ]
+    # the output has the input's size, so 90 degree turns only fit square images
+    if rows == cols:
+        warps += [
+            (np.float64([[0, 1, 0], [1, 0, 0], [0, 0, 1]]), lambda img: cv2.transpose(img)),
+            (np.float64([[0, -1, rows-1], [1, 0, 0], [0, 0, 1]]), lambda img: cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE)),
+            (np.float64([[0, 1, 0], [-1, 0, cols-1], [0, 0, 1]]), lambda img: cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE)),
+            (np.float64([[0, -1, rows-1], [-1, 0, cols-1], [0, 0, 1]]), lambda img: cv2.flip(cv2.transpose(img), -1)),
+        ]
+    return warps
+
+
+def apply_warps(img, filters):
+    rows, cols = img.shape[:2]
+    try:
+        mat = np.eye(3)
+        for filter in filters:
+            mat = filter.get_warp_matrix(img.shape) @ mat
+        mat = mat / mat[2, 2]
+    except (np.linalg.LinAlgError, ZeroDivisionError, FloatingPointError):
+        mat = None
+    # OpenCV inverts the matrix, a degenerate one can't be fused
+    if mat is None or not np.isfinite(mat).all() or abs(np.linalg.det(mat)) < 1e-12:
+        for filter in filters:
+            img = filter.apply(img)
+        return img
+
+    for lossless_mat, lossless_warp in get_lossless_warps(rows, cols):
+        if np.allclose(mat, lossless_mat, rtol=0, atol=1e-6):
+            return lossless_warp(img)
+    # a single warp runs as is so its result doesn't change
+    if len(filters) == 1:
+        return filters[0].apply(img)
+
+    interpolation, border_mode = filters[0].get_warp_flags()
+    if np.allclose(mat[2], [0, 0, 1], rtol=0, atol=1e-12):
+        return cv2.warpAffine(img, mat[:2], (cols, rows), flags=interpolation, borderMode=border_mode)
+    return cv2.warpPerspective(img, mat, (cols, rows), flags=interpolation, borderMode=border_mode)
+
+
+def compose_luts(first, second):
+    # table giving second[first[x]], per channel when either table is per channel
+    if first.ndim == 2 and second.ndim == 2:
+        return second[0, first]
+    first = first.reshape(1, 256, -1)
+    second = second.reshape(1, 256, -1)
+    channels = max(first.shape[2], second.shape[2])
+    first = np.broadcast_to(first, (1, 256, channels))
+    second = np.broadcast_to(second, (1, 256, channels))
+    return np.ascontiguousarray(np.take_along_axis(second, first.astype(np.intp), axis=1))
+
+
+def get_stage_type(filter, fuse_linear):
+    if filter.get_lut() is not None:
+        return LUTStage
+    if fuse_linear and filter.get_warp_flags() is not None:
+        return WarpStage
+    if fuse_linear and filter.get_linear_kernel() is not None:
+        return LinearStage
+    return FilterStage
+
+
+def optimize_chain(filters):
+    # leaves out filters that don't change the image: no-ops, pairs that cancel out and
+    # repeats of idempotent filters, the result is exactly the same, returns the kept
+    # filters and (index, filter, reason) of every removed one
+    kept = []
+    removed = []
+    for index, filter in enumerate(filters):
+        if filter.is_identity():
+            removed.append((index, filter, "no-op"))
+        elif len(kept) > 0 and filter.cancels(kept[-1][1]):
+            previous_index, previous = kept.pop()
+            removed.append((previous_index, previous, "cancelled by " + filter.name))
+            removed.append((index, filter, "cancels " + previous.name))
+        elif len(kept) > 0 and filter.is_idempotent() and filter.get_key() == kept[-1][1].get_key():
+            removed.append((index, filter, "repeats " + filter.name))
+        else:
+            kept.append((index, filter))
+    removed.sort(key=lambda removal: removal[0])
+    return [filter for index, filter in kept], removed
+
+
+def build_plan(filters, fuse_linear=False):
+    # groups the filter chain into the stages that are actually executed, fusing linear
+    # filters and warps changes the result so it is opt in
+    filters = optimize_chain(filters)[0]
+    plan = []
+    for stage_type, run in groupby(filters, lambda filter: get_stage_type(filter, fuse_linear)):
+        run = list(run)
+        if stage_type is FilterStage or stage_type in (LUTStage, LinearStage) and len(run) == 1:
+            plan += [FilterStage(filter) for filter in run]
+        else:
+            plan.append(stage_type(run))
+    return plan
+
+
+def describe_plan(plan, removed=()):
+    # removed is the list of filters optimize_chain left out
+    lines = []
+    for stage in plan:
+        if isinstance(stage, LinearStage):
+            lines += stage.describe()
+        else:
+            lines.append(stage.name)
+    for index, filter, reason in removed:
+        lines.append("{} (filter {}): removed, {}".format(filter.name, index + 1, reason))
+    return lines
+
+
+def apply_plan(img, plan):
+    for stage in plan:
+        img = stage.apply(img)
+    return img
@@ -0,0 +1,72 @@
+from PyQt5.QtWidgets import QMenu, QAction, QFileDialog, QMessageBox
+
+from profiler import profiler
+
+
+class PipelineMenu(QMenu):
+
+    def __init__(self, parent, main_controller):
+        super(QMenu, self).__init__(parent)
+        self.main_controller = main_controller
+
+        self.setTitle("&Pipeline")
+
+        self.fuse_linear_action = QAction("Fuse &Linear Filters and Warps", self)
+        self.fuse_linear_action.setCheckable(True)
+        self.fuse_linear_action.setChecked(self.main_controller.fuse_linear_filters)
+        self.show_plan_action = QAction("Show Execution &Plan", self)
+        self.disk_cache_action = QAction("Use &Disk Cache", self)
+        self.disk_cache_action.setCheckable(True)
+        self.disk_cache_action.setChecked(self.main_controller.use_disk_cache)
+        self.profile_action = QAction("P&rofile Stages", self)
+        self.profile_action.setCheckable(True)
+        self.profile_action.setChecked(profiler.enabled)
+        self.export_trace_action = QAction("&Export Trace", self)
+        self.clear_trace_action = QAction("&Clear Trace", self)
+
+        self.fuse_linear_action.toggled.connect(self.main_controller.set_fuse_linear_filters)
+        self.show_plan_action.triggered.connect(self.show_execution_plan)
+        self.disk_cache_action.toggled.connect(self.set_use_disk_cache)
+        self.profile_action.toggled.connect(self.main_controller.set_profiling)
+        self.export_trace_action.triggered.connect(self.export_trace)
+        self.clear_trace_action.triggered.connect(self.main_controller.clear_trace)
+
+        self.addAction(self.fuse_linear_action)
+        self.addAction(self.show_plan_action)
+        self.addAction(self.disk_cache_action)
+        self.addSeparator()
+        self.addAction(self.profile_action)
+        self.addAction(self.export_trace_action)
+        self.addAction(self.clear_trace_action)
+
+
+    def show_execution_plan(self):
+        plan_message = QMessageBox(self)
+        plan_message.setWindowTitle("Execution Plan")
+        lines = self.main_controller.describe_execution_plan()
+        plan_message.setText("\n".join(lines) if len(lines) > 0 else "No filters")
+        plan_message.exec()
+
+
+    def export_trace(self):
+        try:
+            file_path = QFileDialog.getSaveFileName(self, "Export Trace", '', "Chrome traces (*.json)")[0]
+            if file_path != "":
+                if not file_path.endswith('.json'):
+                    file_path += '.json'
+                self.main_controller.export_trace(file_path)
+        except:
+            error_message = QMessageBox()
+            error_message.setWindowTitle("Error")
+            error_message.setText("Error: trace failed to save")
+            error_message.exec()
+
+
+    def set_use_disk_cache(self, use_disk_cache):
+        try:
+            self.main_controller.set_use_disk_cache(use_disk_cache)
+        except:
+            error_message = QMessageBox()
+            error_message.setWindowTitle("Error")
+            error_message.setText("Error: disk cache failed to open")
+            error_message.exec()
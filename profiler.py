@@ -0,0 +1,75 @@
+import json
+import os
+import threading
+import time
+
+
+# events kept for a session, the oldest are dropped past this
+MAX_EVENTS = 1000000
+
+
+class Profiler():
+    # records timed stages as Chrome trace events, callers check enabled before timing
+    # anything so there is no cost while it is off
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.events = []
+        self.start_time = time.perf_counter()
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+
+    def record(self, name, start, seconds, category="stage", args=None):
+        # start is a time.perf_counter() value
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start - self.start_time) * 1e6,
+            "dur": seconds * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args or {},
+        }
+        with self.lock:
+            self.events.append(event)
+            if len(self.events) > MAX_EVENTS:
+                del self.events[:len(self.events) - MAX_EVENTS]
+
+    def clear(self):
+        with self.lock:
+            self.events = []
+
+    def export_trace(self, path):
+        # Chrome trace event format, opens in chrome://tracing and ui.perfetto.dev
+        with self.lock:
+            events = list(self.events)
+        thread_names = {threading.main_thread().ident: "GUI"}
+        for thread in threading.enumerate():
+            thread_names.setdefault(thread.ident, thread.name)
+        metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+            for tid, name in thread_names.items()]
+        with open(path, 'w') as file:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, file)
+
+
+profiler = Profiler()
+
+
+class StageTiming():
+    # how a stage of the execution plan was produced in a render
+
+    def __init__(self, stage, status, seconds=0, shape=None):
+        self.name = stage.name
+        self.filter_count = len(stage.filters)
+        # "run", "cached" or "skipped" when all the stage's filters are inactive
+        self.status = status
+        self.seconds = seconds
+        self.shape = shape
+
+    def describe(self):
+        if self.status == "run":
+            return "{:.1f} ms".format(self.seconds * 1000)
+        return self.status
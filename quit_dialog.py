@@ -1,4 +1,4 @@
-from PyQt5.QtWidgets import QApplication, QDialog, QHBoxLayout, QPushButton
+from PyQt5.QtWidgets import QDialog, QHBoxLayout, QPushButton
 from PyQt5 import QtCore
 
 
@@ -17,8 +17,8 @@ class QuitDialog(QDialog):
         cancel_button = QPushButton("Cancel")
 
         save_button.clicked.connect(self.parent().save_file)
-        save_button.clicked.connect(QApplication.exit)
-        no_save_button.clicked.connect(QApplication.exit)
+        save_button.clicked.connect(self.parent().quit_application)
+        no_save_button.clicked.connect(self.parent().quit_application)
         cancel_button.clicked.connect(self.close)
 
         self.layout.addWidget(save_button)
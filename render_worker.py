@@ -0,0 +1,109 @@
+import copy
+import threading
+import time
+import cv2
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+from filter_cache import FilterCache, RenderCancelled
+from profiler import profiler
+
+
+class RenderWorker(QObject):
+
+    # generation, filtered image, True for a low resolution proxy, key equal for equal outputs
+    renderFinished = pyqtSignal(int, object, bool, object)
+    renderRequested = pyqtSignal()
+    # generation, StageTiming per stage of a full resolution render, only while profiling
+    stageTimings = pyqtSignal(int, object)
+
+    def __init__(self, filter_cache):
+        super(QObject, self).__init__()
+        # only used from the worker thread once started
+        self.filter_cache = filter_cache
+        # proxy renders get their own cache so dragging doesn't evict the full resolution stages
+        self.proxy_cache = FilterCache(filter_cache.memory_limit // 4)
+        self.proxy_source = None
+        self.proxy_scale = None
+        self.proxy_base = None
+        # DiskCache for full resolution renders, or None
+        self.disk_cache = None
+
+        self.lock = threading.Lock()
+        self.pending = None
+        self.generation = 0
+
+        self.thread = QThread()
+        self.moveToThread(self.thread)
+        # queued connection, runs render_pending on the worker thread
+        self.renderRequested.connect(self.render_pending)
+        self.thread.start()
+
+    def request_render(self, base_image, filters, fuse_linear=False, proxy_scale=None, refresh=False, prescaled=False):
+        # proxy_scale renders a downscaled copy of base_image, with filter sizes scaled to match,
+        # or base_image itself when it is prescaled, e.g. a preview decoded at reduced size,
+        # refresh reruns every stage instead of using the cached ones
+        if proxy_scale is not None:
+            filters = [filter.scaled(proxy_scale) for filter in filters]
+        else:
+            filters = copy.deepcopy(filters)
+        with self.lock:
+            self.generation += 1
+            # snapshot, the editors keep changing the filters while the render runs
+            self.pending = (self.generation, base_image, filters, fuse_linear, proxy_scale, refresh, prescaled)
+            generation = self.generation
+        self.renderRequested.emit()
+        return generation
+
+    def is_cancelled(self, generation):
+        return generation != self.generation
+
+    def render_pending(self):
+        with self.lock:
+            job = self.pending
+            self.pending = None
+        # a newer request already replaced this one and was rendered
+        if job is None:
+            return
+        generation, base_image, filters, fuse_linear, proxy_scale, refresh, prescaled = job
+        # imported on the first render so the window opens without the pipeline and its filters
+        from pipeline import build_plan
+        from tiling import parallelize_plan
+        filter_cache = self.filter_cache
+        filter_cache.disk_cache = self.disk_cache
+        if proxy_scale is not None:
+            if not prescaled:
+                base_image = self.get_proxy_base(base_image, proxy_scale)
+            filter_cache = self.proxy_cache
+        if refresh:
+            filter_cache.invalidate()
+        profiling = profiler.enabled
+        start = time.perf_counter()
+        try:
+            plan = parallelize_plan(build_plan(filters, fuse_linear))
+            img = filter_cache.apply(base_image, plan, lambda: self.is_cancelled(generation))
+        except RenderCancelled:
+            if profiling:
+                profiler.record("render (cancelled)", start, time.perf_counter() - start, "render", {"generation": generation})
+            return
+        if profiling:
+            profiler.record("render", start, time.perf_counter() - start, "render", {"generation": generation, "proxy": proxy_scale is not None})
+            if proxy_scale is None:
+                self.stageTimings.emit(generation, list(filter_cache.timings))
+        self.renderFinished.emit(generation, img, proxy_scale is not None, filter_cache.output_key)
+
+    def get_proxy_base(self, base_image, proxy_scale):
+        # downscaled once per image and scale, the same array keeps the proxy cache valid
+        if base_image is not self.proxy_source or proxy_scale != self.proxy_scale:
+            rows, cols = base_image.shape[:2]
+            size = (max(1, round(cols * proxy_scale)), max(1, round(rows * proxy_scale)))
+            self.proxy_base = cv2.resize(base_image, size, interpolation=cv2.INTER_AREA)
+            self.proxy_source = base_image
+            self.proxy_scale = proxy_scale
+        return self.proxy_base
+
+    def stop(self):
+        with self.lock:
+            self.generation += 1
+            self.pending = None
+        self.thread.quit()
+        self.thread.wait()
@@ -0,0 +1,44 @@
+import io
+import os
+
+import cv2
+import numpy as np
+
+from batch import run_batch
+from filter_io import save_filters
+from filters import FilterInvert
+
+
+def make_batch(tmp_path):
+    chain_path = str(tmp_path / "chain.json")
+    save_filters([FilterInvert()], chain_path)
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    images = {}
+    for name in ("a.png", "b.png"):
+        images[name] = np.random.default_rng(len(images)).integers(0, 256, (20, 30, 3), np.uint8)
+        cv2.imwrite(str(input_dir / name), images[name])
+    (input_dir / "notes.txt").write_text("not an image")
+    return chain_path, str(input_dir), str(tmp_path / "output"), images
+
+
+def test_batch_processes_every_image(tmp_path):
+    chain_path, input_dir, output_dir, images = make_batch(tmp_path)
+    stats = run_batch(chain_path, input_dir, output_dir, workers=1, out=io.StringIO())
+    assert stats["processed"] == 2 and stats["skipped"] == 0 and stats["failed"] == 0
+    for name, img in images.items():
+        assert np.array_equal(cv2.imread(os.path.join(output_dir, name)), 255 - img)
+
+
+def test_batch_skips_outputs_newer_than_their_input(tmp_path):
+    chain_path, input_dir, output_dir, images = make_batch(tmp_path)
+    run_batch(chain_path, input_dir, output_dir, workers=1, out=io.StringIO())
+    stats = run_batch(chain_path, input_dir, output_dir, workers=1, out=io.StringIO())
+    assert stats["processed"] == 0 and stats["skipped"] == 2
+    # an input changed after its output is processed again
+    output_time = os.path.getmtime(os.path.join(output_dir, "a.png"))
+    os.utime(os.path.join(input_dir, "a.png"), (output_time + 10, output_time + 10))
+    stats = run_batch(chain_path, input_dir, output_dir, workers=1, out=io.StringIO())
+    assert stats["processed"] == 1 and stats["skipped"] == 1
+    stats = run_batch(chain_path, input_dir, output_dir, workers=1, overwrite=True, out=io.StringIO())
+    assert stats["processed"] == 2 and stats["skipped"] == 0
@@ -0,0 +1,44 @@
+import io
+import json
+
+from benchmark import compare_results, get_case_key, main, run_benchmarks
+
+
+def make_result(filter, ops_per_sec, **params):
+    return {"filter": filter, "params": params, "width": 640, "height": 480, "channels": 3, "ops_per_sec": ops_per_sec}
+
+
+def test_compare_results_finds_regressions():
+    baseline = {"results": [
+        make_result("FilterInvert", 100),
+        make_result("FilterBoxBlur", 100, kernel_width=3),
+        make_result("FilterBoxBlur", 100, kernel_width=31),
+        dict(make_result("FilterMedianBlur", 100), error="unsupported"),
+    ]}
+    results = [
+        make_result("FilterInvert", 95),
+        make_result("FilterBoxBlur", 80, kernel_width=3),
+        make_result("FilterBoxBlur", 200, kernel_width=31),
+        make_result("FilterMedianBlur", 1),
+        make_result("FilterGrayscale", 1),
+    ]
+    regressions = compare_results(baseline, results, 0.1)
+    assert regressions == [(get_case_key(results[1]), 100, 80)]
+    assert len(compare_results(baseline, results, 0.01)) == 2
+    assert compare_results(baseline, results, 0.5) == []
+
+
+def test_benchmark_runs_and_compares_against_its_own_output(tmp_path):
+    results = run_benchmarks(["vga"], [1], ["FilterInvert", "FilterMedianBlur"], min_time=0, out=io.StringIO())
+    assert [result["filter"] for result in results] == ["FilterInvert"] + ["FilterMedianBlur"] * 4
+    assert all(result["runs"] >= 3 and result["ops_per_sec"] > 0 for result in results)
+    output = str(tmp_path / "results.json")
+    assert main(["-s", "vga", "-c", "1", "-f", "FilterInvert", "-t", "0", "-o", output]) == 0
+    with open(output) as file:
+        report = json.load(file)
+    # a baseline far faster than any machine makes every case a regression
+    for result in report["results"]:
+        result["ops_per_sec"] *= 1000
+    with open(output, 'w') as file:
+        json.dump(report, file)
+    assert main(["-s", "vga", "-c", "1", "-f", "FilterInvert", "-t", "0", "--compare", output]) == 1
@@ -0,0 +1,72 @@
+import time
+import cv2
+import numpy as np
+import pytest
+
+import convolution
+from convolution import filter_2d, get_convolution_strategy
+from filters import FilterConvolve
+from pipeline import build_plan, apply_plan
+from tiling import parallelize_plan
+
+
+def make_image(rows, cols):
+    return cv2.blur(np.random.default_rng(0).integers(0, 256, (rows, cols, 3), np.uint8), (5, 5))
+
+
+def test_strategy_follows_calibrated_table(monkeypatch):
+    monkeypatch.setattr(convolution, "calibrated_strategies", {(31, 31): "dft", (13, 13): "direct"})
+    kernel = np.float32(np.random.default_rng(1).normal(0, 1, (31, 31)))
+    assert get_convolution_strategy(kernel) == "dft"
+    assert get_convolution_strategy(kernel[:13, :13]) == "direct"
+    assert get_convolution_strategy(kernel[:5, :5]) == "direct"
+    assert get_convolution_strategy(np.ones((31, 31), np.float32)) == "separable"
+    # shapes not in the table are measured once and kept
+    strategy = get_convolution_strategy(kernel[:9, :11])
+    assert convolution.calibrated_strategies[(9, 11)] == strategy
+
+
+def test_calibration_picks_the_faster_strategy(monkeypatch):
+    def slow_dft_filter_2d(*args):
+        time.sleep(0.05)
+
+    monkeypatch.setattr(convolution, "CALIBRATION_SHAPE", (64, 64))
+    monkeypatch.setattr(convolution, "dft_filter_2d", slow_dft_filter_2d)
+    assert convolution.calibrate_strategy((15, 15)) == "direct"
+    monkeypatch.setattr(convolution, "dft_filter_2d", lambda *args: None)
+    assert convolution.calibrate_strategy((15, 15)) == "dft"
+
+
+@pytest.mark.parametrize("strategy", ["direct", "dft"])
+def test_tiled_matches_whole_image_for_large_kernel(monkeypatch, strategy):
+    monkeypatch.setattr(convolution, "calibrated_strategies", {(31, 31): strategy})
+    img = make_image(600, 800)
+    filter = FilterConvolve()
+    kernel = np.random.default_rng(2).normal(0, 1, (31, 31))
+    filter.kernel.value = kernel / kernel.sum()
+    plan = build_plan([filter])
+    whole = apply_plan(img, plan)
+    tiled = apply_plan(img, parallelize_plan(plan, thread_count=4))
+    assert np.array_equal(whole, tiled)
+
+
+def test_strips_match_whole_image_for_large_kernel(monkeypatch):
+    monkeypatch.setattr(convolution, "calibrated_strategies", {(25, 25): "dft"})
+    img = make_image(400, 500)
+    kernel = np.random.default_rng(3).normal(0, 1, (25, 25))
+    kernel /= kernel.sum()
+    whole = filter_2d(img, kernel, (12, 12), 3, cv2.BORDER_REFLECT_101)
+    strip = filter_2d(img[88:312], kernel, (12, 12), 3, cv2.BORDER_REFLECT_101)
+    assert np.array_equal(strip[12:-12], whole[100:300])
+
+
+def test_anchor_outside_shrunk_kernel_is_center():
+    img = make_image(60, 80)
+    filter = FilterConvolve()
+    filter.anchor_x.value = 4
+    filter.anchor_y.value = 1
+    filter.kernel.value = np.arange(9.0).reshape(3, 3)
+    assert filter.get_anchor() == (1, 1)
+    centered = filter_2d(img, filter.get_kernel(), (1, 1), 0, cv2.BORDER_DEFAULT)
+    assert np.array_equal(filter.apply(img), centered)
+    assert np.array_equal(apply_plan(img, build_plan([filter])), centered)
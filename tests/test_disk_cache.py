@@ -0,0 +1,44 @@
+import os
+import threading
+
+import numpy as np
+
+from disk_cache import DiskCache
+
+
+def test_put_and_get(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    img = np.random.default_rng(0).integers(0, 256, (20, 30, 3), np.uint8)
+    key = cache.get_image_hash(img)
+    assert not cache.contains(key) and cache.get(key) is None
+    cache.put(key, img)
+    assert cache.contains(key) and np.array_equal(cache.get(key), img)
+
+
+def test_threads_writing_the_same_key_leave_one_complete_entry(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    img = np.random.default_rng(0).integers(0, 256, (500, 500, 3), np.uint8)
+    key = cache.get_image_hash(img)
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def put():
+        try:
+            barrier.wait()
+            for attempt in range(5):
+                cache.put(key, img)
+                # the entry is only ever seen complete
+                loaded = cache.get(key)
+                assert loaded is None or np.array_equal(loaded, img)
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=put) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert np.array_equal(cache.get(key), img)
+    file_names = [file_name for directory, subdirectories, file_names in os.walk(str(tmp_path)) for file_name in file_names]
+    assert file_names == [key + ".npy"]
@@ -0,0 +1,69 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+from PyQt5.QtCore import QCoreApplication
+
+import export_queue
+from export_queue import ExportQueue, encoder_presets, get_export_path
+
+
+def wait_for_signals(condition, seconds=5):
+    # the queue's signals reach the GUI thread through its event loop
+    app = QCoreApplication.instance() or QCoreApplication([])
+    deadline = time.perf_counter() + seconds
+    while not condition() and time.perf_counter() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    return condition()
+
+
+def test_export_paths():
+    assert get_export_path("out/image", "JPEG (quality 85)", 1) == "out/image.jpg"
+    assert get_export_path("out/image", "JPEG (quality 85)", 0.5, True) == "out/image_q85_50%.jpg"
+
+
+def test_queue_writes_every_export_and_goes_idle(tmp_path):
+    img = np.random.default_rng(0).integers(0, 256, (20, 30, 3), np.uint8)
+    queue = ExportQueue(2)
+    idle = threading.Event()
+    progress = []
+    queue.idle.connect(idle.set)
+    queue.progressChanged.connect(lambda finished, queued: progress.append((finished, queued)))
+    paths = []
+    for scale in (1, 0.5):
+        path = get_export_path(str(tmp_path / "image"), "PNG (fast)", scale)
+        paths.append(path)
+        queue.add(path, img, encoder_presets["PNG (fast)"][2], scale)
+    assert wait_for_signals(idle.is_set)
+    queue.shutdown()
+    assert queue.pending_count() == 0 and progress[-1] == (2, 2)
+    assert np.array_equal(cv2.imread(paths[0]), img)
+    assert cv2.imread(paths[1]).shape == (10, 15, 3)
+
+
+def test_pending_exports_hold_off_idle(tmp_path, monkeypatch):
+    release = threading.Event()
+    written = []
+
+    def export_image(save_path, img, params=None, scale=1):
+        release.wait(5)
+        if save_path.endswith(".bad"):
+            raise IOError("can't write " + save_path)
+        written.append(save_path)
+
+    monkeypatch.setattr(export_queue, "export_image", export_image)
+    queue = ExportQueue(2)
+    idle = threading.Event()
+    failures = []
+    queue.idle.connect(idle.set)
+    queue.exportFailed.connect(lambda path, error: failures.append(path))
+    queue.add("first.png", None)
+    queue.add("second.bad", None)
+    assert queue.pending_count() == 2 and not idle.is_set()
+    release.set()
+    assert wait_for_signals(idle.is_set)
+    queue.shutdown()
+    assert written == ["first.png"] and failures == ["second.bad"]
+    assert queue.pending_count() == 0
@@ -0,0 +1,92 @@
+import numpy as np
+
+from filter_cache import FilterCache
+from filters import FilterGaussianBlur
+from pipeline import build_plan
+
+
+class CountingStage():
+    # adds value to the image, or passes it through when value is 0, counting its runs
+
+    def __init__(self, value):
+        self.value = value
+        self.runs = 0
+        self.filters = []
+        self.name = "Add " + str(value)
+
+    def get_key(self):
+        return ("CountingStage", self.value)
+
+    def apply(self, img):
+        self.runs += 1
+        return img if self.value == 0 else img + self.value
+
+
+def make_image():
+    return np.zeros((10, 10), np.int64)
+
+
+def test_output_key_matches_only_equal_outputs():
+    img = np.random.default_rng(0).integers(0, 256, (40, 60, 3), np.uint8)
+    filter = FilterGaussianBlur()
+    cache = FilterCache()
+    first = cache.apply(img, build_plan([filter]))
+    first_key = cache.output_key
+    filter.kernel_width.value = 7
+    cache.apply(img, build_plan([filter]))
+    assert cache.output_key != first_key
+    filter.kernel_width.value = 3
+    again = cache.apply(img, build_plan([filter]))
+    assert cache.output_key == first_key and np.array_equal(again, first)
+    cache.apply(img.copy(), build_plan([filter]))
+    assert cache.output_key != first_key
+    cache.apply(img, build_plan([filter]))
+    assert cache.output_key != first_key
+    assert FilterCache().output_key is None
+
+
+def test_editing_a_stage_reruns_only_it_and_the_ones_after():
+    stages = [CountingStage(value) for value in (1, 2, 3, 4)]
+    cache = FilterCache()
+    img = make_image()
+    assert (cache.apply(img, stages) == 10).all()
+    stages[2] = CountingStage(5)
+    assert (cache.apply(img, stages) == 12).all()
+    assert [stage.runs for stage in stages] == [1, 1, 1, 2]
+    assert cache.first_changed_index([stage.get_key() for stage in stages]) == 4
+    # the same chain again only returns the cached output
+    cache.apply(img, stages)
+    assert [stage.runs for stage in stages] == [1, 1, 1, 2]
+
+
+def test_memory_limit_evicts_from_the_front():
+    img = make_image()
+    stages = [CountingStage(value) for value in (1, 2, 3, 4)]
+    cache = FilterCache(memory_limit=2 * img.nbytes)
+    cache.apply(img, stages)
+    assert [stage[1] is not None for stage in cache.stages] == [False, False, True, True]
+    assert cache.memory_usage() == 2 * img.nbytes
+    # editing the last stage resumes from the newest stage still held
+    stages[3] = CountingStage(6)
+    assert (cache.apply(img, stages) == 12).all()
+    assert [stage.runs for stage in stages] == [1, 1, 1, 1]
+    # editing an evicted stage's successor resumes from the last resident one before it
+    stages[1] = CountingStage(7)
+    cache.apply(img, stages)
+    assert [stage.runs for stage in stages] == [2, 1, 2, 2]
+
+
+def test_memory_usage_counts_passed_through_arrays_once():
+    img = make_image()
+    stages = [CountingStage(value) for value in (1, 0, 0, 2)]
+    cache = FilterCache()
+    cache.apply(img, stages)
+    assert cache.memory_usage() == 2 * img.nbytes
+    stages[3] = CountingStage(3)
+    cache.apply(img, stages)
+    assert cache.memory_usage() == 2 * img.nbytes
+    stages[0] = CountingStage(4)
+    cache.apply(img, stages)
+    assert cache.memory_usage() == 2 * img.nbytes
+    cache.invalidate()
+    assert cache.memory_usage() == 0
@@ -0,0 +1,48 @@
+import json
+
+import numpy as np
+import pytest
+
+from filter_io import FORMAT_VERSION, filters_from_json, filters_to_json
+from filters import FilterConvolve, FilterGaussianBlur
+
+
+def make_version_1_convolve(**cells):
+    params = {"active": True, "anchor_x": -1, "anchor_y": -1, "delta": 0, "border_type": "BORDER_DEFAULT"}
+    params.update(cells)
+    return json.dumps({"version": 1, "filters": [{"filter": "FilterConvolve", "params": params}]})
+
+
+def test_version_1_kernel_cells_become_the_kernel():
+    cells = {"M{}{}".format(row, col): (row - 2) * 1.5 + col * 0.25 for row in range(1, 4) for col in range(1, 4)}
+    filter, = filters_from_json(make_version_1_convolve(**cells))
+    assert filter.kernel.value == tuple(tuple(cells["M{}{}".format(row, col)] for col in range(1, 4)) for row in range(1, 4))
+    assert "M11" not in filter.params
+
+
+def test_missing_version_1_cells_keep_their_old_defaults():
+    filter, = filters_from_json(make_version_1_convolve(M12=-3, M32=3))
+    assert filter.kernel.value == ((0, -3, 0), (0, 1, 0), (0, 3, 0))
+
+
+def test_current_version_round_trips():
+    convolve = FilterConvolve()
+    convolve.kernel.value = [[-255, 0.5], [3, 255]]
+    blur = FilterGaussianBlur()
+    blur.sigma_y.value = 4
+    text = filters_to_json([convolve, blur])
+    assert json.loads(text)["version"] == FORMAT_VERSION
+    loaded_convolve, loaded_blur = filters_from_json(text)
+    assert loaded_convolve.get_key() == convolve.get_key() and loaded_blur.get_key() == blur.get_key()
+    img = np.random.default_rng(0).integers(0, 256, (30, 40, 3), np.uint8)
+    assert np.array_equal(loaded_blur.apply(img), blur.apply(img))
+    # sigma_y is passed as sigmaY, no longer taken for the output argument and ignored
+    assert not np.array_equal(blur.apply(img), FilterGaussianBlur().apply(img))
+
+
+def test_cells_are_only_upgraded_in_old_versions():
+    text = make_version_1_convolve(M11=1).replace('"version": 1', '"version": 2')
+    with pytest.raises(ValueError):
+        filters_from_json(text)
+    with pytest.raises(ValueError):
+        filters_from_json(make_version_1_convolve().replace('"version": 1', '"version": 3'))
@@ -0,0 +1,40 @@
+import inspect
+import os
+import subprocess
+import sys
+
+import filters
+from filter_registry import filter_schemas, filter_names, get_filter_class
+
+
+def test_every_filter_class_is_registered():
+    classes = {name for name, cls in inspect.getmembers(filters, inspect.isclass) if issubclass(cls, filters.Filter) and cls is not filters.Filter}
+    assert classes == {class_name for class_name, name in filter_names}
+    assert [type(filter()).__name__ for filter in filters.filter_classes] == [class_name for class_name, name in filter_names]
+
+
+def test_filters_take_name_and_parameters_from_registry():
+    for class_name, name, params in filter_schemas:
+        cls = get_filter_class(class_name)
+        filter = cls()
+        assert cls.name == name
+        assert list(cls.params) == list(params)
+        for param, spec in params.items():
+            value = getattr(filter, param)
+            if spec[0] == "Boolean":
+                assert value is spec[1]
+            elif spec[0] == "RadioSelect":
+                assert list(value.settings)[:len(spec[1])] == spec[1]
+                assert value.value == (spec[2] if len(spec) > 2 else spec[1][0])
+            else:
+                assert (value.value, value.min, value.max) == (spec[1], spec[2], spec[3])
+        # parameters aren't shared between instances
+        assert all(getattr(cls(), param) is not getattr(filter, param) for param, spec in params.items() if spec[0] != "Boolean")
+
+
+def test_window_modules_dont_import_the_pipeline():
+    code = "import sys, main_window, main_controller; print(' '.join(sorted({'filters', 'pipeline', 'convolution', 'tiling', 'morphology'} & set(sys.modules))))"
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
@@ -0,0 +1,59 @@
+import struct
+import numpy as np
+import pytest
+
+from mapped_image import TIFFImage, open_mapped_image
+
+
+def write_tiff(path, pixels, photometric, rows=None):
+    # uncompressed little endian TIFF with one strip, the bits per sample follow the pixels,
+    # rows other than the pixels' describe a truncated file
+    cols, channels = pixels.shape[1:]
+    rows = rows or pixels.shape[0]
+    data = pixels.tobytes()
+    bits_offset = 8 + len(data)
+    bits = struct.pack('<' + 'H' * channels, *[8] * channels)
+    # values of up to 4 bytes are stored in the entry itself
+    bits_value = bits_offset if len(bits) > 4 else struct.unpack('<I', bits.ljust(4, b'\0'))[0]
+    entries = [(256, 4, 1, cols), (257, 4, 1, rows), (258, 3, channels, bits_value),
+        (259, 4, 1, 1), (262, 4, 1, photometric), (273, 4, 1, 8), (277, 4, 1, channels), (278, 4, 1, rows), (279, 4, 1, len(data))]
+    header = struct.pack('<2sHI', b'II', 42, bits_offset + len(bits))
+    directory = struct.pack('<H', len(entries))
+    for tag, field_type, count, value in entries:
+        directory += struct.pack('<HHII', tag, field_type, count, value)
+    with open(path, 'wb') as file:
+        file.write(header + data + bits + directory + struct.pack('<I', 0))
+
+
+@pytest.mark.parametrize("channels, photometric", [(1, 1), (3, 2), (4, 2)])
+def test_tiff_reads_gray_rgb_and_rgba(tmp_path, channels, photometric):
+    pixels = np.random.default_rng(0).integers(0, 256, (5, 7, channels), np.uint8)
+    write_tiff(tmp_path / "image.tif", pixels, photometric)
+    img = TIFFImage(str(tmp_path / "image.tif")).read_rows(0, 5)
+    if channels == 1:
+        assert np.array_equal(img, pixels[:, :, 0])
+    else:
+        assert np.array_equal(img, pixels[:, :, 2::-1])
+
+
+@pytest.mark.parametrize("channels", [2, 5])
+def test_tiff_with_other_samples_per_pixel_is_unsupported(tmp_path, channels):
+    pixels = np.zeros((5, 7, channels), np.uint8)
+    write_tiff(tmp_path / "image.tif", pixels, 1)
+    with pytest.raises(ValueError, match="unsupported TIFF file"):
+        TIFFImage(str(tmp_path / "image.tif"))
+
+
+def test_truncated_files_are_left_to_the_normal_decoder(tmp_path):
+    pixels = np.random.default_rng(0).integers(0, 256, (5, 7, 3), np.uint8)
+    write_tiff(tmp_path / "image.tif", pixels, 2)
+    data = (tmp_path / "image.tif").read_bytes()
+    write_tiff(tmp_path / "pixels.tif", pixels, 2, 20)
+    # header cut inside the directory, and pixels missing with the directory intact
+    (tmp_path / "header.tif").write_bytes(data[:len(data) - 20])
+    (tmp_path / "short.tif").write_bytes(data[:5])
+    (tmp_path / "header.ppm").write_bytes(b"P6\n7 5")
+    (tmp_path / "pixels.ppm").write_bytes(b"P6\n7 5\n255\n" + pixels.tobytes()[:50])
+    for name in ("header.tif", "pixels.tif", "short.tif", "header.ppm", "pixels.ppm"):
+        assert open_mapped_image(str(tmp_path / name)) is None
+    assert open_mapped_image(str(tmp_path / "image.tif")) is not None
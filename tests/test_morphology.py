@@ -0,0 +1,49 @@
+import itertools
+import cv2
+import numpy as np
+import pytest
+
+import morphology
+from filters import FilterErode
+
+
+BORDER_TYPES = [cv2.BORDER_CONSTANT, cv2.BORDER_REPLICATE, cv2.BORDER_REFLECT, cv2.BORDER_REFLECT_101, cv2.BORDER_ISOLATED]
+OPERATIONS = [cv2.MORPH_OPEN, cv2.MORPH_CLOSE, cv2.MORPH_GRADIENT, cv2.MORPH_TOPHAT, cv2.MORPH_BLACKHAT]
+
+
+def make_image(shape, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, shape, np.uint8)
+
+
+@pytest.mark.parametrize("shape", [cv2.MORPH_RECT, cv2.MORPH_CROSS, cv2.MORPH_ELLIPSE])
+def test_exact_paths_match_opencv(monkeypatch, shape):
+    # thresholds lowered so every path runs on small images
+    monkeypatch.setattr(morphology, "MIN_VHGW_SIZE", 2)
+    monkeypatch.setattr(morphology, "MIN_CHORD_PIXELS_PER_ROW", 0)
+    images = [make_image((37, 53)), make_image((29, 47, 3))]
+    sizes = [(1, 1), (4, 7), (8, 2), (15, 15), (1, 13), (13, 1), (40, 60)]
+    for img, (width, height), iterations, border_type in itertools.product(images, sizes, [1, 3], BORDER_TYPES):
+        element = cv2.getStructuringElement(shape, (width, height))
+        assert np.array_equal(morphology.erode(img, shape, width, height, iterations, border_type),
+            cv2.erode(img, element, iterations=iterations, borderType=border_type))
+        assert np.array_equal(morphology.dilate(img, shape, width, height, iterations, border_type),
+            cv2.dilate(img, element, iterations=iterations, borderType=border_type))
+        for operation in OPERATIONS:
+            assert np.array_equal(morphology.morphology_ex(img, operation, shape, width, height, iterations, border_type),
+                cv2.morphologyEx(img, operation, element, iterations=iterations, borderType=border_type))
+
+
+@pytest.mark.parametrize("kernel_type, width, height", [
+    ("MORPH_CROSS", 1, 250), ("MORPH_CROSS", 250, 1), ("MORPH_ELLIPSE", 1, 250), ("MORPH_RECT", 250, 1)])
+@pytest.mark.parametrize("border_type", ["BORDER_REFLECT", "BORDER_REFLECT_101"])
+def test_lines_fold_iterations_like_opencv(kernel_type, width, height, border_type):
+    # OpenCV folds the iterations of elements that are all ones and adds the border once
+    img = make_image((600, 800, 3))
+    filter = FilterErode()
+    filter.kernel_type.value = kernel_type
+    filter.kernel_width.value = width
+    filter.kernel_height.value = height
+    filter.iterations.value = 3
+    filter.border_type.value = border_type
+    element = cv2.getStructuringElement(getattr(cv2, kernel_type), (width, height))
+    assert np.array_equal(filter.apply(img), cv2.erode(img, element, iterations=3, borderType=getattr(cv2, border_type)))
@@ -0,0 +1,137 @@
+import cv2
+import numpy as np
+
+from filters import WarpRotate, FilterInvert, FilterGammaCorrect, FilterThreshold, FilterThresholdToZero, FilterGrayscale, FilterSplitChannel
+from pipeline import WarpStage, LUTStage, build_plan, optimize_chain, apply_plan, compose_linear_kernels
+
+
+def make_image(rows, cols):
+    return cv2.blur(np.random.default_rng(0).integers(0, 256, (rows, cols, 3), np.uint8), (5, 5))
+
+
+def make_rotation(theta):
+    filter = WarpRotate()
+    filter.theta.value = theta
+    return filter
+
+
+def apply_sequentially(img, filters):
+    for filter in filters:
+        img = filter.apply(img)
+    return img
+
+
+def test_warps_run_one_by_one_unless_fused():
+    img = make_image(120, 160)
+    filters = [make_rotation(45), make_rotation(-45)]
+    plan = build_plan(filters)
+    assert not any(isinstance(stage, WarpStage) for stage in plan)
+    sequential = apply_sequentially(img, filters)
+    assert np.array_equal(apply_plan(img, plan), sequential)
+    # the first rotation cropped the corners to black
+    assert not sequential[0, 0].any()
+
+
+def test_fused_warps_keep_what_the_first_warp_moved_out():
+    img = make_image(120, 160)
+    filters = [make_rotation(45), make_rotation(-45)]
+    plan = build_plan(filters, True)
+    assert isinstance(plan[0], WarpStage)
+    fused = apply_plan(img, plan)
+    sequential = apply_sequentially(img, filters)
+    assert np.array_equal(fused, img)
+    assert not np.array_equal(fused, sequential)
+    # inside the circle both rotations keep, fusing only saves one resampling
+    rows, cols = np.ogrid[:120, :160]
+    inside = (rows - 60) ** 2 + (cols - 80) ** 2 < 50 ** 2
+    assert np.abs(fused[inside].astype(int) - sequential[inside]).mean() < 4
+
+
+def test_composed_kernel_is_the_full_convolution():
+    rng = np.random.default_rng(1)
+    for shape_1, shape_2 in [((3, 3), (3, 3)), ((1, 5), (7, 1)), ((2, 9), (13, 4)), ((25, 25), (31, 31))]:
+        kernel_1 = rng.normal(size=shape_1)
+        kernel_2 = rng.normal(size=shape_2)
+        expected = np.zeros((shape_1[0] + shape_2[0] - 1, shape_1[1] + shape_2[1] - 1))
+        for (row, col), value in np.ndenumerate(kernel_2):
+            expected[row:row + shape_1[0], col:col + shape_1[1]] += value * kernel_1
+        kernel, anchor, delta = compose_linear_kernels((kernel_1, (1, 0), 2), (kernel_2, (0, 1), 3))
+        assert np.allclose(kernel, expected, rtol=0, atol=1e-9)
+        assert anchor == (1, 1)
+        assert np.isclose(delta, 2 * kernel_2.sum() + 3)
+
+
+def test_composed_kernel_filters_like_both_kernels():
+    rng = np.random.default_rng(2)
+    img = rng.normal(size=(60, 80))
+    kernel_1 = rng.normal(size=(5, 3))
+    kernel_2 = rng.normal(size=(4, 6))
+    kernel, anchor, delta = compose_linear_kernels((kernel_1, (1, 2), 0), (kernel_2, (3, 1), 0))
+    sequential = cv2.filter2D(cv2.filter2D(img, -1, kernel_1, anchor=(1, 2)), -1, kernel_2, anchor=(3, 1))
+    fused = cv2.filter2D(img, -1, kernel, anchor=anchor)
+    # away from the border, where the intermediate image's border differs
+    assert np.allclose(fused[10:-10, 10:-10], sequential[10:-10, 10:-10])
+
+
+def make_random_filter(rng):
+    # filters that run as lookup tables, some set inactive
+    filter_type = rng.choice([FilterInvert, FilterGammaCorrect, FilterThreshold, FilterThresholdToZero, FilterGrayscale, FilterSplitChannel])
+    filter = filter_type()
+    if filter_type is FilterGammaCorrect:
+        filter.gamma.value = float(rng.uniform(0.2, 3))
+    elif filter_type in (FilterThreshold, FilterThresholdToZero):
+        filter.threshold.value = int(rng.integers(0, 256))
+    elif filter_type is FilterSplitChannel:
+        filter.channel.value = str(rng.choice(["Red", "Green", "Blue"]))
+    filter.active = bool(rng.random() < 0.8)
+    return filter
+
+
+def test_lut_plan_matches_sequential_filters():
+    rng = np.random.default_rng(1)
+    fused = 0
+    for channels in (3, 1):
+        img = make_image(60, 80)
+        if channels == 1:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        for chain in range(30):
+            filters = [make_random_filter(rng) for index in range(int(rng.integers(1, 7)))]
+            plan = build_plan(filters)
+            fused += any(isinstance(stage, LUTStage) for stage in plan)
+            assert np.array_equal(apply_plan(img, plan), apply_sequentially(img, filters))
+    assert fused > 0
+
+
+def make_invert(active=True):
+    filter = FilterInvert()
+    filter.active = active
+    return filter
+
+
+def test_invert_pairs_cancel_out():
+    img = make_image(40, 60)
+    filters = [make_invert(), make_invert(), make_invert(), make_invert(False), make_invert()]
+    kept, removed = optimize_chain(filters)
+    assert kept == []
+    assert sorted(index for index, filter, reason in removed) == [0, 1, 2, 3, 4]
+    assert np.array_equal(apply_plan(img, build_plan(filters)), apply_sequentially(img, filters))
+    # an odd number leaves one
+    kept, removed = optimize_chain(filters[:3])
+    assert kept == [filters[2]]
+
+
+def test_idempotent_repeats_collapse():
+    img = make_image(40, 60)
+    filters = [FilterGrayscale(), FilterGrayscale(), FilterGrayscale()]
+    kept, removed = optimize_chain(filters)
+    assert kept == [filters[0]]
+    assert [reason for index, filter, reason in removed] == ["repeats Grayscale", "repeats Grayscale"]
+    assert np.array_equal(apply_plan(img, build_plan(filters)), apply_sequentially(img, filters))
+    # repeats with different parameters aren't the same filter
+    red, green = FilterSplitChannel(), FilterSplitChannel()
+    green.channel.value = "Green"
+    assert optimize_chain([red, green])[0] == [red, green]
+    # nor are filters that aren't idempotent
+    gammas = [FilterGammaCorrect(), FilterGammaCorrect()]
+    gammas[0].gamma.value = gammas[1].gamma.value = 2
+    assert len(optimize_chain(gammas)[0]) == 2
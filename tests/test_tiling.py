@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+
+from filters import FilterBoxBlur, FilterMedianBlur, FilterGaussianBlur, FilterErode, FilterDilate, FilterThresholdAdaptive, FilterInvert, FilterGammaCorrect, FilterConvolve, WarpRotate
+from pipeline import build_plan, apply_plan
+from tiling import TiledStage, get_strips, parallelize_plan
+
+
+def make_image(rows, cols):
+    return cv2.blur(np.random.default_rng(0).integers(0, 256, (rows, cols, 3), np.uint8), (3, 3))
+
+
+def make_random_filter(rng):
+    filter_type = rng.choice([FilterBoxBlur, FilterMedianBlur, FilterGaussianBlur, FilterErode, FilterDilate, FilterThresholdAdaptive, FilterInvert, FilterGammaCorrect, FilterConvolve])
+    filter = filter_type()
+    size = 2 * int(rng.integers(0, 5)) + 1
+    if filter_type in (FilterBoxBlur, FilterGaussianBlur, FilterErode, FilterDilate):
+        filter.kernel_width.value = size
+        filter.kernel_height.value = 2 * int(rng.integers(0, 5)) + 1
+    elif filter_type is FilterMedianBlur:
+        filter.ksize.value = size
+    elif filter_type is FilterThresholdAdaptive:
+        filter.block_size.value = size + 2
+    elif filter_type is FilterGammaCorrect:
+        filter.gamma.value = float(rng.uniform(0.2, 3))
+    elif filter_type is FilterConvolve:
+        filter.kernel.value = rng.integers(-2, 3, (size, size)).tolist()
+    if filter_type in (FilterErode, FilterDilate):
+        filter.iterations.value = int(rng.integers(1, 3))
+    filter.active = bool(rng.random() < 0.8)
+    return filter
+
+
+def test_strips_cover_every_row_once():
+    strips = get_strips(1000, 10, 8)
+    assert strips[0][0][0] == 0 and strips[-1][0][1] == 1000
+    for (first, first_halo), (second, second_halo) in zip(strips, strips[1:]):
+        assert first[1] == second[0]
+        assert second_halo[0] == second[0] - 10 and first_halo[1] == first[1] + 10
+
+
+def test_tiled_plan_matches_untiled_plan():
+    rng = np.random.default_rng(2)
+    img = make_image(400, 90)
+    tiled = 0
+    for chain in range(30):
+        filters = [make_random_filter(rng) for index in range(int(rng.integers(1, 5)))]
+        fuse_linear = bool(rng.random() < 0.5)
+        plan = build_plan(filters, fuse_linear)
+        expected = apply_plan(img, plan)
+        for group_stages in (False, True):
+            parallel_plan = parallelize_plan(plan, group_stages, thread_count=4)
+            tiled += any(isinstance(stage, TiledStage) for stage in parallel_plan)
+            assert np.array_equal(apply_plan(img, parallel_plan), expected)
+    assert tiled > 0
+
+
+def test_whole_image_stages_are_not_tiled():
+    filter = WarpRotate()
+    filter.theta.value = 30
+    plan = parallelize_plan(build_plan([filter, FilterBoxBlur()]), thread_count=4)
+    assert not isinstance(plan[0], TiledStage) and isinstance(plan[1], TiledStage)
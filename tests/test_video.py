@@ -0,0 +1,55 @@
+import io
+import os
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+from filter_io import save_filters
+from filters import FilterInvert
+from video import StreamStats, put_frame, run_stream
+
+
+def make_sequence(tmp_path, count):
+    chain_path = str(tmp_path / "chain.json")
+    save_filters([FilterInvert()], chain_path)
+    (tmp_path / "frames").mkdir()
+    (tmp_path / "out").mkdir()
+    frames = []
+    for index in range(count):
+        frames.append(np.full((16, 24, 3), index * 10, np.uint8))
+        cv2.imwrite(str(tmp_path / "frames" / "{:03d}.png".format(index)), frames[-1])
+    return chain_path, frames
+
+
+def test_stream_ends_with_the_sequence(tmp_path):
+    chain_path, frames = make_sequence(tmp_path, 5)
+    stats = run_stream(chain_path, str(tmp_path / "frames" / "%03d.png"), str(tmp_path / "out" / "%03d.png"), queue_size=2, out=io.StringIO())
+    assert (stats.decoded, stats.processed, stats.encoded, stats.dropped) == (5, 5, 5, 0)
+    assert sorted(os.listdir(tmp_path / "out")) == ["{:03d}.png".format(index) for index in range(5)]
+    for index, frame in enumerate(frames):
+        assert np.array_equal(cv2.imread(str(tmp_path / "out" / "{:03d}.png".format(index))), 255 - frame)
+
+
+def test_stream_stops_after_max_frames(tmp_path):
+    chain_path, frames = make_sequence(tmp_path, 5)
+    stats = run_stream(chain_path, str(tmp_path / "frames" / "%03d.png"), str(tmp_path / "out" / "%03d.png"), max_frames=3, out=io.StringIO())
+    assert (stats.decoded, stats.encoded) == (3, 3)
+    assert len(os.listdir(tmp_path / "out")) == 3
+
+
+def test_full_queue_drops_or_waits():
+    stats = StreamStats()
+    stop_event = threading.Event()
+    frame_queue = queue.Queue(1)
+    assert put_frame(frame_queue, "first", stats, stop_event, drop=True)
+    assert put_frame(frame_queue, "second", stats, stop_event, drop=True)
+    assert put_frame(frame_queue, "third", stats, stop_event, drop=True)
+    assert stats.dropped == 2 and stats.backpressured == 0
+    assert frame_queue.get_nowait() == "first"
+    # without dropping the frame waits, until the stream is stopped
+    frame_queue.put("first")
+    stop_event.set()
+    assert not put_frame(frame_queue, "second", stats, stop_event)
+    assert stats.dropped == 2 and stats.backpressured == 1
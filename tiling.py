@@ -0,0 +1,91 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import numpy as np
+
+from pipeline import FilterStage
+
+
+# strips thinner than this spend more time on their halo than on their own rows
+MIN_STRIP_ROWS = 64
+# more strips than threads evens out strips that finish early
+STRIPS_PER_THREAD = 2
+
+thread_pool = None
+
+
+def get_thread_pool():
+    # OpenCV releases the GIL, so threads run the strips in parallel
+    global thread_pool
+    if thread_pool is None:
+        thread_pool = ThreadPoolExecutor(os.cpu_count() or 1)
+    return thread_pool
+
+
+def get_strips(rows, halo, strip_count, min_strip_rows=MIN_STRIP_ROWS):
+    # (start, end) of every strip, and (start, end) of the strip with its halo
+    strip_rows = max(min_strip_rows, 2 * halo, -(-rows // strip_count))
+    strips = []
+    for start in range(0, rows, strip_rows):
+        end = min(rows, start + strip_rows)
+        strips.append(((start, end), (max(0, start - halo), min(rows, end + halo))))
+    return strips
+
+
+def apply_stages(img, stages):
+    for stage in stages:
+        img = stage.apply(img)
+    return img
+
+
+class TiledStage(FilterStage):
+    # runs local stages on horizontal strips in parallel, each strip is extended by the
+    # sum of the stages' footprints so its own rows come out exactly as on the full image
+
+    def __init__(self, stages, thread_count=None, min_strip_rows=MIN_STRIP_ROWS):
+        self.stages = stages
+        self.filters = [filter for stage in stages for filter in stage.filters]
+        self.name = " | ".join(stage.name for stage in stages) + " (tiled)"
+        self.thread_count = thread_count or os.cpu_count() or 1
+        self.min_strip_rows = min_strip_rows
+
+    def get_key(self):
+        return (type(self).__name__,) + tuple(stage.get_key() for stage in self.stages)
+
+    def get_footprint(self):
+        return sum(stage.get_footprint() for stage in self.stages)
+
+    def apply(self, img):
+        strips = get_strips(img.shape[0], self.get_footprint(), self.thread_count * STRIPS_PER_THREAD, self.min_strip_rows)
+        if len(strips) < 2:
+            return apply_stages(img, self.stages)
+
+        def apply_strip(strip):
+            (start, end), (halo_start, halo_end) = strip
+            result = apply_stages(img[halo_start:halo_end], self.stages)
+            return result[start-halo_start:end-halo_start]
+
+        return np.concatenate(list(get_thread_pool().map(apply_strip, strips)), axis=0)
+
+
+def parallelize_plan(plan, group_stages=False, thread_count=None):
+    # wraps the stages that only depend on nearby pixels in TiledStages, one per stage so
+    # every stage output can still be cached, or one per run of them when group_stages is set
+    thread_count = thread_count or os.cpu_count() or 1
+    if thread_count < 2:
+        return plan
+    parallel_plan = []
+    run = []
+    for stage in plan + [None]:
+        # inactive filters pass their input through, splitting them would only copy it
+        if stage is not None and stage.get_footprint() is not None and any(filter.active for filter in stage.filters):
+            if group_stages:
+                run.append(stage)
+            else:
+                parallel_plan.append(TiledStage([stage], thread_count))
+            continue
+        if len(run) > 0:
+            parallel_plan.append(TiledStage(run, thread_count))
+            run = []
+        if stage is not None:
+            parallel_plan.append(stage)
+    return parallel_plan
@@ -0,0 +1,229 @@
+import argparse
+import queue
+import sys
+import threading
+import time
+
+import cv2
+
+from filter_io import load_filters
+from pipeline import build_plan, apply_plan, describe_plan, optimize_chain
+from tiling import parallelize_plan
+from image_io import write_image
+
+
+# frames waiting between two stages, bounds memory for any clip length
+DEFAULT_QUEUE_SIZE = 8
+DEFAULT_FPS = 30
+# seconds between progress lines
+REPORT_INTERVAL = 1.0
+
+codecs = {"avi": "MJPG", "mp4": "mp4v", "mkv": "XVID", "mov": "mp4v"}
+
+
+class StreamStats():
+    # counters shared by the decode, process and encode threads
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.decoded = 0
+        self.processed = 0
+        self.encoded = 0
+        # frames thrown away because processing couldn't keep up with a live source
+        self.dropped = 0
+        # times a stage had to wait for the next one to take a frame, and for how long
+        self.backpressured = 0
+        self.backpressure_seconds = 0
+        self.start_time = time.perf_counter()
+
+    def add(self, counter, amount=1):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def get_fps(self):
+        elapsed = time.perf_counter() - self.start_time
+        return self.encoded / elapsed if elapsed > 0 else 0
+
+    def describe(self):
+        return "{} decoded, {} processed, {} encoded, {} dropped, {} backpressured ({:.2f} s), {:.1f} fps".format(
+            self.decoded, self.processed, self.encoded, self.dropped, self.backpressured, self.backpressure_seconds, self.get_fps())
+
+
+def put_frame(frame_queue, item, stats, stop_event, drop=False):
+    # hands a frame to the next stage, False once the stream is stopping
+    try:
+        frame_queue.put_nowait(item)
+        return True
+    except queue.Full:
+        if drop:
+            stats.add("dropped")
+            return True
+    stats.add("backpressured")
+    start = time.perf_counter()
+    while not stop_event.is_set():
+        try:
+            frame_queue.put(item, timeout=0.1)
+            stats.add("backpressure_seconds", time.perf_counter() - start)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def get_frame(frame_queue, stop_event):
+    while not stop_event.is_set():
+        try:
+            return frame_queue.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return None
+
+
+def open_capture(source):
+    # camera index, video file or numbered image sequence like frames/%05d.png
+    if source.isdigit():
+        return cv2.VideoCapture(int(source)), True
+    return cv2.VideoCapture(source), False
+
+
+class SequenceWriter():
+    # writes frames to a numbered image sequence like out/%05d.png
+
+    def __init__(self, pattern, first_index=0):
+        self.pattern = pattern
+        self.index = first_index
+
+    def write(self, frame):
+        write_image(self.pattern % self.index, frame)
+        self.index += 1
+
+    def release(self):
+        pass
+
+
+def create_writer(output, fps, frame, codec=None):
+    if '%' in output:
+        return SequenceWriter(output)
+    codec = codec or codecs.get(output.split('.')[-1].lower(), "MJPG")
+    writer = cv2.VideoWriter(output, cv2.VideoWriter_fourcc(*codec), fps, (frame.shape[1], frame.shape[0]), frame.ndim == 3)
+    if not writer.isOpened():
+        raise IOError("Error: file " + output + " failed to open for writing with codec " + codec)
+    return writer
+
+
+def decode_frames(capture, output_queue, stats, stop_event, drop, max_frames):
+    while not stop_event.is_set() and (max_frames is None or stats.decoded < max_frames):
+        success, frame = capture.read()
+        if not success:
+            break
+        stats.add("decoded")
+        if not put_frame(output_queue, frame, stats, stop_event, drop):
+            break
+
+
+def process_frames(plan, input_queue, output_queue, stats, stop_event):
+    while True:
+        frame = get_frame(input_queue, stop_event)
+        if frame is None:
+            break
+        frame = apply_plan(frame, plan)
+        stats.add("processed")
+        if not put_frame(output_queue, frame, stats, stop_event):
+            break
+
+
+def encode_frames(output, fps, codec, input_queue, stats, stop_event, errors):
+    writer = None
+    try:
+        while True:
+            frame = get_frame(input_queue, stop_event)
+            if frame is None:
+                break
+            if writer is None:
+                writer = create_writer(output, fps, frame, codec)
+            writer.write(frame)
+            stats.add("encoded")
+    except Exception as error:
+        errors.append(error)
+        stop_event.set()
+    finally:
+        if writer is not None:
+            writer.release()
+
+
+def run_stream(chain_path, source, output, fps=None, codec=None, queue_size=DEFAULT_QUEUE_SIZE, drop=None,
+        max_frames=None, fuse_linear=False, out=sys.stdout):
+    plan = parallelize_plan(build_plan(load_filters(chain_path), fuse_linear))
+    capture, live = open_capture(source)
+    if not capture.isOpened():
+        raise IOError("Error: " + source + " failed to open")
+    fps = fps or capture.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+    # a live source can't wait for processing, its frames are dropped instead
+    drop = live if drop is None else drop
+
+    stats = StreamStats()
+    stop_event = threading.Event()
+    errors = []
+    decoded_queue = queue.Queue(queue_size)
+    processed_queue = queue.Queue(queue_size)
+
+    def run_stage(target, *args, output_queue=None):
+        # end of stream is passed on as None, a failing stage stops the others
+        try:
+            target(*args)
+        except Exception as error:
+            errors.append(error)
+            stop_event.set()
+        finally:
+            if output_queue is not None:
+                put_frame(output_queue, None, stats, stop_event)
+
+    threads = [
+        threading.Thread(target=run_stage, name="decode",
+            args=(decode_frames, capture, decoded_queue, stats, stop_event, drop, max_frames), kwargs={"output_queue": decoded_queue}),
+        threading.Thread(target=run_stage, name="process",
+            args=(process_frames, plan, decoded_queue, processed_queue, stats, stop_event), kwargs={"output_queue": processed_queue}),
+        threading.Thread(target=encode_frames, name="encode",
+            args=(output, fps, codec, processed_queue, stats, stop_event, errors)),
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        while threads[-1].is_alive():
+            threads[-1].join(REPORT_INTERVAL)
+            print(stats.describe(), file=out)
+    except KeyboardInterrupt:
+        stop_event.set()
+    for thread in threads:
+        thread.join()
+    capture.release()
+    if errors:
+        raise errors[0]
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a saved filter chain to a video, camera or numbered image sequence.")
+    parser.add_argument("chain", help="filter chain saved from File > Save Filters")
+    parser.add_argument("input", help="video file, camera index or image sequence like frames/%%05d.png")
+    parser.add_argument("output", help="video file or image sequence like out/%%05d.png")
+    parser.add_argument("--fps", type=float, help="output frame rate, defaults to the input's")
+    parser.add_argument("--codec", help="four character code of the output codec, defaults by extension")
+    parser.add_argument("-q", "--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="frames buffered between stages")
+    parser.add_argument("--drop", action="store_true", default=None, help="drop frames instead of waiting when processing falls behind, the default for cameras")
+    parser.add_argument("-n", "--max-frames", type=int, help="stop after this many frames")
+    parser.add_argument("--fuse-linear", action="store_true", help="convolve adjacent linear filters into one kernel and resample adjacent warps once, changes the result")
+    args = parser.parse_args(argv)
+
+    print("Execution plan:")
+    filters = load_filters(args.chain)
+    for line in describe_plan(build_plan(filters, args.fuse_linear), optimize_chain(filters)[1]):
+        print("    " + line)
+    stats = run_stream(args.chain, args.input, args.output, args.fps, args.codec, args.queue_size, args.drop, args.max_frames, args.fuse_linear)
+    print("Done: " + stats.describe())
+    return 0
+
+
+if __name__ == '__main__':
+
+    sys.exit(main())
@@ -0,0 +1,21 @@
+from PyQt5.QtWidgets import QMenu, QAction
+
+
+class ViewMenu(QMenu):
+
+    def __init__(self, parent, main_controller):
+        super(QMenu, self).__init__(parent)
+        self.main_controller = main_controller
+
+        self.setTitle("&View")
+
+        self.histogram_action = QAction("&Histogram", self)
+        self.histogram_action.setCheckable(True)
+
+        self.histogram_action.toggled.connect(self.show_histogram)
+
+        self.addAction(self.histogram_action)
+
+
+    def show_histogram(self, checked):
+        self.main_controller.histogram_panel.setVisible(checked)
@@ -0,0 +1,89 @@
+import threading
+import cv2
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+
+def downscale_half(img):
+    # averages 2x2 blocks, unlike pyrDown odd sizes don't leave a shifted border
+    size = (max(1, (img.shape[1] + 1) // 2), max(1, (img.shape[0] + 1) // 2))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+
+class ZoomPyramid(QObject):
+    # the image at 1, 1/2, 1/4 ... resolution for drawing zoomed out views, levels are
+    # built in the background the first time a zoom needs them and kept until the image changes
+
+    # generation of the image the new level belongs to
+    levelBuilt = pyqtSignal(int)
+    buildRequested = pyqtSignal()
+
+    def __init__(self):
+        super(QObject, self).__init__()
+        self.lock = threading.Lock()
+        self.image = None
+        # render key of the image, None when it doesn't have one
+        self.key = None
+        # levels[0] is the image itself, each next one half its size
+        self.levels = []
+        self.requested_level = 0
+        self.generation = 0
+
+        self.thread = QThread()
+        self.moveToThread(self.thread)
+        self.buildRequested.connect(self.build_pending)
+        self.thread.start()
+
+    def set_image(self, image, key=None):
+        # returns True when the image changed and the levels were dropped
+        if image is self.image:
+            return False
+        with self.lock:
+            # a new render with the same output, e.g. a parameter moved back, keeps its levels,
+            # known from the render key so the pixels aren't compared on the GUI thread
+            if key is not None and key == self.key:
+                self.image = image
+                self.levels[0] = image
+                return False
+            self.generation += 1
+            self.image = image
+            self.key = key
+            self.levels = [image]
+            self.requested_level = 0
+        return True
+
+    def get_level(self, scale):
+        # scale is the displayed size over the image size, returns the smallest level that is
+        # still at least that size, or the closest one built so far while it is being built
+        level = 0
+        while 0.5 ** (level + 1) >= scale and max(self.image.shape[:2]) >> (level + 1) > 0:
+            level += 1
+        with self.lock:
+            if level < len(self.levels):
+                return self.levels[level]
+            if level > self.requested_level:
+                self.requested_level = level
+                self.buildRequested.emit()
+            return self.levels[-1]
+
+    def build_pending(self):
+        with self.lock:
+            generation = self.generation
+            img = self.levels[-1]
+            count = len(self.levels)
+            level = self.requested_level
+        while count <= level:
+            img = downscale_half(img)
+            with self.lock:
+                # the image was replaced while this level was built
+                if generation != self.generation:
+                    return
+                self.levels.append(img)
+                count = len(self.levels)
+                level = self.requested_level
+            self.levelBuilt.emit(generation)
+
+    def stop(self):
+        with self.lock:
+            self.generation += 1
+        self.thread.quit()
+        self.thread.wait()